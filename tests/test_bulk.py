@@ -0,0 +1,143 @@
+#!/usr/bin/env python
+#
+# Unit tests of zabbix_cli.bulk
+#
+# Run from the top directory of the repository:
+# python -m unittest discover -s tests -t .
+#
+
+import os
+import json
+import shutil
+import tempfile
+import unittest
+
+from zabbix_cli.bulk import BulkJournal, iter_command_runs, scan_names
+
+
+class IterCommandRunsTest(unittest.TestCase):
+
+    def test_runs(self):
+        commands = [(1, 'create_host a Linux .+ 0'),
+                    (2, 'create_host b Linux .+ 0'),
+                    (4, 'remove_host c'),
+                    (5, 'create_host d Linux .+ 0')]
+
+        runs = list(iter_command_runs(commands))
+
+        self.assertEqual(runs, [('create_host', commands[0:2]),
+                                ('remove_host', commands[2:3]),
+                                ('create_host', commands[3:4])])
+
+    def test_no_commands(self):
+        self.assertEqual(list(iter_command_runs([])), [])
+
+
+class ScanNamesTest(unittest.TestCase):
+
+    def test_names(self):
+        commands = [(1, 'add_host_to_hostgroup host1,host2 Linux'),
+                    (2, 'link_template_to_host "Template OS Linux" host3'),
+                    (3, 'create_host host4 Linux,10 .+ 0'),
+                    (4, 'show_hosts')]
+
+        names = scan_names(commands)
+
+        self.assertEqual(names, {'host': set(['host1', 'host2', 'host3', 'host4']),
+                                 'hostgroup': set(['Linux']),
+                                 'template': set(['Template OS Linux']),
+                                 'proxy': set(['.+'])})
+
+    def test_defaults(self):
+        commands = [(1, 'create_host host1')]
+
+        names = scan_names(commands, {'create_host': {'hostgroup': ['All-hosts']}})
+
+        self.assertEqual(names, {'host': set(['host1']),
+                                 'hostgroup': set(['All-hosts'])})
+
+    def test_wrong_quoting(self):
+        self.assertEqual(scan_names([(1, 'remove_host "host1')]), {})
+
+
+class BulkJournalTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.filename = os.path.join(self.directory, 'input.txt.journal')
+
+        self.commands = [(1, 'create_hostgroup Linux'),
+                         (2, 'create_host host1 Linux .+ 0'),
+                         (3, 'create_host host2 Linux .+ 0')]
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_resume(self):
+        journal = BulkJournal(self.filename)
+        journal.record(1, 'create_hostgroup Linux', 0)
+        journal.record(2, 'create_host host1 Linux .+ 0', 1)
+        journal.close()
+
+        journal = BulkJournal(self.filename, resume=True)
+
+        # Commands with errors are executed again
+        self.assertEqual(journal.pending(self.commands), self.commands[1:])
+        journal.close()
+
+    def test_failed_again(self):
+        journal = BulkJournal(self.filename)
+        journal.record(1, 'create_hostgroup Linux', 0)
+        journal.record(1, 'create_hostgroup Linux', 1)
+        journal.close()
+
+        journal = BulkJournal(self.filename, resume=True)
+        self.assertEqual(journal.pending(self.commands), self.commands)
+        journal.close()
+
+    def test_changed_command(self):
+        journal = BulkJournal(self.filename)
+        journal.record(2, 'create_host other Linux .+ 0', 0)
+        journal.close()
+
+        journal = BulkJournal(self.filename, resume=True)
+        self.assertEqual(journal.pending(self.commands), self.commands)
+        journal.close()
+
+    def test_incomplete_entry(self):
+        journal = BulkJournal(self.filename)
+        journal.record(1, 'create_hostgroup Linux', 0)
+        journal.close()
+
+        with open(self.filename, 'a') as file:
+            file.write('{"line": 2, "comm')
+
+        journal = BulkJournal(self.filename, resume=True)
+        self.assertEqual(journal.pending(self.commands), self.commands[1:])
+
+        journal.record(2, 'create_host host1 Linux .+ 0', 0)
+        journal.close()
+
+        # The new entry is not appended to the incomplete one
+        journal = BulkJournal(self.filename, resume=True)
+        self.assertEqual(journal.pending(self.commands), self.commands[2:])
+        journal.close()
+
+    def test_rotate(self):
+        journal = BulkJournal(self.filename)
+        journal.record(1, 'create_hostgroup Linux', 0)
+        journal.close()
+
+        journal = BulkJournal(self.filename)
+        journal.close()
+
+        self.assertTrue(journal.rotated_file is not None)
+
+        with open(journal.rotated_file) as file:
+            self.assertEqual(json.loads(file.readline())['line'], 1)
+
+        self.assertEqual(os.path.getsize(self.filename), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
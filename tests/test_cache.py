@@ -0,0 +1,121 @@
+#!/usr/bin/env python
+#
+# Unit tests of zabbix_cli.cache
+#
+# Run from the top directory of the repository:
+# python -m unittest discover -s tests -t .
+#
+
+import os
+import stat
+import shutil
+import tempfile
+import unittest
+
+from zabbix_cli.cache import EntityCache, EntityStore
+
+
+class EntityCacheTest(unittest.TestCase):
+
+    def test_lookups(self):
+        cache = EntityCache('hostgroup')
+        cache.add(2, 'Linux')
+        cache.add('3', 'Windows')
+
+        self.assertEqual(cache.get_id('Linux'), '2')
+        self.assertEqual(cache.get_name(3), 'Windows')
+        self.assertEqual(cache.get_id('Solaris'), None)
+        self.assertEqual(sorted(cache.items()), [('2', 'Linux'), ('3', 'Windows')])
+        self.assertEqual(len(cache), 2)
+
+    def test_rename(self):
+        cache = EntityCache('hostgroup')
+        cache.add('2', 'Linux')
+        cache.add('2', 'Linux servers')
+
+        self.assertEqual(cache.get_id('Linux'), None)
+        self.assertEqual(cache.get_id('Linux servers'), '2')
+        self.assertEqual(len(cache), 1)
+
+    def test_labels(self):
+        cache = EntityCache('host')
+        cache.add('10', 'host1.example.org', 'Host 1')
+        cache.add('11', None, 'Host 2')
+
+        self.assertEqual(cache.get_label('10'), 'Host 1')
+        self.assertEqual(cache.get_label('11'), 'Host 2')
+        self.assertEqual(cache.get_id('Host 1'), None)
+        self.assertEqual(len(cache), 2)
+
+        # A label without a name does not change the name index
+        cache.add('10', None, 'Host one')
+
+        self.assertEqual(cache.get_id('host1.example.org'), '10')
+        self.assertEqual(cache.get_name('10'), 'host1.example.org')
+        self.assertEqual(cache.get_label('10'), 'Host one')
+
+    def test_label_falls_back_to_name(self):
+        cache = EntityCache('host')
+        cache.add('10', 'host1.example.org')
+
+        self.assertEqual(cache.get_label('10'), 'host1.example.org')
+
+    def test_remove(self):
+        cache = EntityCache('host')
+        cache.add('10', 'host1.example.org', 'Host 1')
+        cache.remove(10)
+
+        self.assertEqual(cache.get_id('host1.example.org'), None)
+        self.assertEqual(cache.get_label('10'), None)
+        self.assertEqual(len(cache), 0)
+
+        # Removing an unknown object is not an error
+        cache.remove('99')
+
+    def test_name_reused(self):
+        cache = EntityCache('user')
+        cache.add('1', 'joe')
+        cache.add('2', 'joe')
+        cache.remove('1')
+
+        # The name belongs to the new object now
+        self.assertEqual(cache.get_id('joe'), '2')
+
+    def test_size(self):
+        cache = EntityCache('user')
+        empty_size = cache.size()
+        cache.add('1', 'joe')
+
+        self.assertTrue(cache.size() > empty_size)
+
+
+class EntityStoreTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.filename = os.path.join(self.directory, 'entities.db')
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_permissions(self):
+        old_umask = os.umask(0)
+
+        try:
+            EntityStore(self.filename, 'system', None)
+        finally:
+            os.umask(old_umask)
+
+        self.assertEqual(stat.S_IMODE(os.stat(self.filename).st_mode), 0600)
+
+    def test_permissions_existing_file(self):
+        open(self.filename, 'w').close()
+        os.chmod(self.filename, 0644)
+
+        EntityStore(self.filename, 'system', None)
+
+        self.assertEqual(stat.S_IMODE(os.stat(self.filename).st_mode), 0600)
+
+
+if __name__ == '__main__':
+    unittest.main()
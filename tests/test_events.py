@@ -0,0 +1,91 @@
+#!/usr/bin/env python
+#
+# Unit tests of zabbix_cli.events
+#
+# Run from the top directory of the repository:
+# python -m unittest discover -s tests -t .
+#
+
+import os
+import json
+import shutil
+import tempfile
+import unittest
+
+from zabbix_cli.events import (get_last_eventids_in_file, read_events_cursor,
+                               remove_incomplete_line, save_events_cursor)
+
+
+class EventsFilesTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.output_file = os.path.join(self.directory, 'events.json')
+        self.cursor_file = os.path.join(self.directory, 'cursor')
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def write_events(self, eventids, tail=''):
+        with open(self.output_file, 'w') as file:
+            for eventid in eventids:
+                file.write(json.dumps({'eventid': str(eventid), 'status': 'PROBLEM'}) + '\n')
+
+            file.write(tail)
+
+    def test_last_eventids(self):
+        self.write_events([5, 7, 6, 8])
+
+        self.assertEqual(get_last_eventids_in_file(self.output_file, 2), [6, 8])
+        self.assertEqual(get_last_eventids_in_file(self.output_file, 10), [5, 7, 6, 8])
+
+    def test_last_eventids_incomplete_line(self):
+        self.write_events([5, 6], '{"eventid": "7", "sta')
+
+        self.assertEqual(get_last_eventids_in_file(self.output_file, 5), [5, 6])
+
+    def test_last_eventids_small_blocks(self):
+        self.write_events(range(1, 101))
+
+        # The first line of a block can be incomplete
+        self.assertEqual(get_last_eventids_in_file(self.output_file, 3, block_size=50), [98, 99, 100])
+
+    def test_last_eventids_no_file(self):
+        self.assertEqual(get_last_eventids_in_file(self.output_file, 5), [])
+        self.write_events([1])
+        self.assertEqual(get_last_eventids_in_file(self.output_file, 0), [])
+
+    def test_remove_incomplete_line(self):
+        self.write_events([5, 6], '{"eventid": "7", "sta')
+
+        with open(self.output_file, 'a+') as file:
+            remove_incomplete_line(file)
+
+        self.assertEqual(get_last_eventids_in_file(self.output_file, 5), [5, 6])
+
+        with open(self.output_file) as file:
+            self.assertTrue(file.read().endswith('}\n'))
+
+    def test_cursor(self):
+        self.assertEqual(read_events_cursor(self.cursor_file), (0, set()))
+
+        save_events_cursor(self.cursor_file, 100, set([103, 101]))
+
+        self.assertEqual(read_events_cursor(self.cursor_file), (100, set([101, 103])))
+        self.assertFalse(os.path.exists(self.cursor_file + '.tmp'))
+
+    def test_old_cursor(self):
+        with open(self.cursor_file, 'w') as file:
+            file.write('1234\n')
+
+        self.assertEqual(read_events_cursor(self.cursor_file), (1234, set()))
+
+    def test_invalid_cursor(self):
+        with open(self.cursor_file, 'w') as file:
+            file.write('{"eventid": ')
+
+        self.assertRaises(Exception, read_events_cursor, self.cursor_file)
+
+
+if __name__ == '__main__':
+    unittest.main()
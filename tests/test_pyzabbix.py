@@ -0,0 +1,615 @@
+#!/usr/bin/env python
+#
+# Unit tests of zabbix_cli.pyzabbix
+#
+# Run from the top directory of the repository:
+# python -m unittest discover -s tests -t .
+#
+
+import json
+import threading
+import time
+import unittest
+
+from zabbix_cli.pyzabbix import (ZabbixAPI, ZabbixAPICache, ZabbixAPIException, ZabbixAPIResponseStream,
+                                 ZabbixAPIStats)
+
+
+class FakeZabbixAPI(ZabbixAPI):
+    '''
+    ZabbixAPI answering iter_request() from a list of objects instead
+    of sending HTTP requests
+    '''
+
+    def __init__(self, object_type, objects):
+        ZabbixAPI.__init__(self, 'http://zabbix.example.org')
+
+        self.object_type = object_type
+        self.objects = objects
+        self.requests = []
+
+    def iter_request(self, method, params=None, chunk_size=65536):
+        self.requests.append((method, dict(params)))
+
+        id_field = self.OBJECT_IDS[self.object_type]
+        ids = params.get(id_field + 's')
+
+        for item in self.objects:
+            if ids is None or item[id_field] in ids:
+                yield dict((key, value) for key, value in item.items()
+                           if params['output'] == 'extend' or key in params['output'])
+
+
+class FakeServerError(Exception):
+
+    def __init__(self, code, message, data):
+        Exception.__init__(self, message)
+        self.error = {'code': code, 'message': message, 'data': data}
+
+
+class FakeServer(object):
+    '''
+    JSON-RPC server answering the calls with the functions in
+    methods {method: function(params)}. A function raises
+    FakeServerError to answer with an error object.
+    '''
+
+    def __init__(self, methods):
+        self.methods = methods
+        self.requests = []
+
+    def answer(self, request_json):
+        self.requests.append(request_json)
+
+        if isinstance(request_json, list):
+            return [self.answer_call(call) for call in request_json]
+
+        return self.answer_call(request_json)
+
+    def answer_call(self, call):
+        response = {'jsonrpc': '2.0', 'id': call['id']}
+
+        try:
+            response['result'] = self.methods[call['method']](call['params'])
+
+        except FakeServerError as e:
+            response['error'] = e.error
+
+        return response
+
+
+class FakeResponse(object):
+
+    def __init__(self, content, chunk_size=None):
+        self.content = content
+        self.text = content.decode('utf-8')
+        self.status_code = 200
+        self.headers = {}
+        self.chunk_size = chunk_size
+
+    def raise_for_status(self):
+        pass
+
+    def iter_content(self, chunk_size):
+        chunk_size = self.chunk_size or chunk_size
+
+        for index in range(0, len(self.content), chunk_size):
+            yield self.content[index:index + chunk_size]
+
+    def close(self):
+        pass
+
+
+class FakeSession(object):
+    '''
+    requests.Session sending the requests to a FakeServer (or to
+    a function returning the response object) instead of the network
+    '''
+
+    def __init__(self, server, chunk_size=None):
+        self.server = server
+        self.chunk_size = chunk_size
+        self.headers = {}
+        self.auth = None
+        self.verify = True
+        self.cert = None
+        self.proxies = {}
+        self.trust_env = True
+
+    def mount(self, prefix, adapter):
+        pass
+
+    def post(self, url, data=None, headers=None, timeout=None, stream=False):
+        response_json = self.server(json.loads(data))
+
+        if not isinstance(response_json, bytes):
+            response_json = json.dumps(response_json).encode('utf-8')
+
+        return FakeResponse(response_json, self.chunk_size)
+
+
+class FakeSessionZabbixAPI(ZabbixAPI):
+    '''
+    ZabbixAPI sending its requests to a FakeServer. All the threads
+    share the same FakeSession.
+    '''
+
+    def __init__(self, server, chunk_size=None, **kwargs):
+        ZabbixAPI.__init__(self, 'http://zabbix.example.org',
+                           session=FakeSession(server, chunk_size),
+                           stats=ZabbixAPIStats(), **kwargs)
+
+    def new_session(self):
+        return self._session
+
+
+class IterGetTest(unittest.TestCase):
+
+    def test_shards(self):
+        hosts = [{'hostid': str(id), 'host': 'host%d' % id} for id in range(1, 8)]
+        zapi = FakeZabbixAPI('host', hosts)
+
+        result = list(zapi.iter_get('host', shard_size=3, output=['hostid', 'host'],
+                                    selectGroups=['name'], limit=100))
+
+        self.assertEqual(result, hosts)
+
+        # One request for the IDs and one per shard
+        self.assertEqual(len(zapi.requests), 4)
+
+        (method, id_params) = zapi.requests[0]
+        self.assertEqual(method, 'host.get')
+        self.assertEqual(id_params['output'], ['hostid'])
+        self.assertEqual(id_params['sortfield'], 'hostid')
+        self.assertEqual(id_params['limit'], 100)
+        self.assertFalse('selectGroups' in id_params)
+
+        shards = [params['hostids'] for (method, params) in zapi.requests[1:]]
+        self.assertEqual(shards, [['1', '2', '3'], ['4', '5', '6'], ['7']])
+
+        for (method, params) in zapi.requests[1:]:
+            self.assertEqual(params['selectGroups'], ['name'])
+            self.assertFalse('limit' in params)
+
+    def test_sort_field(self):
+        templates = [{'templateid': '10', 'host': 'Template A'}]
+        zapi = FakeZabbixAPI('template', templates)
+
+        list(zapi.iter_get('template', output=['host']))
+
+        # template.get does not accept templateid as sortfield
+        self.assertEqual(zapi.requests[0][1]['sortfield'], 'hostid')
+
+    def test_sort_field_given(self):
+        hosts = [{'hostid': '1', 'name': 'b'}, {'hostid': '2', 'name': 'a'}]
+        zapi = FakeZabbixAPI('host', hosts)
+
+        list(zapi.iter_get('host', output=['name'], sortfield='name'))
+
+        for (method, params) in zapi.requests:
+            self.assertEqual(params['sortfield'], 'name')
+
+    def test_not_sortable(self):
+        maps = [{'sysmapid': id} for id in ['12', '3', '7', '20']]
+        zapi = FakeZabbixAPI('map', maps)
+
+        result = list(zapi.iter_get('map', shard_size=2, output='extend'))
+
+        # map.get cannot sort by ID, the IDs are sorted locally
+        for (method, params) in zapi.requests:
+            self.assertFalse('sortfield' in params)
+
+        shards = [params['sysmapids'] for (method, params) in zapi.requests[1:]]
+        self.assertEqual(shards, [['3', '7'], ['12', '20']])
+        self.assertEqual(len(result), 4)
+
+    def test_no_objects(self):
+        zapi = FakeZabbixAPI('host', [])
+
+        self.assertEqual(list(zapi.iter_get('host', output=['host'])), [])
+        self.assertEqual(len(zapi.requests), 1)
+
+
+class BatchTest(unittest.TestCase):
+
+    def setUp(self):
+        def get_host(params):
+            return [{'hostid': '1', 'host': params['filter']['host']}]
+
+        def create_host(params):
+            if params['host'] == 'duplicate':
+                raise FakeServerError(-32602, 'Invalid params.', 'Host "duplicate" already exists.')
+
+            return {'hostids': ['2']}
+
+        self.server = FakeServer({'host.get': get_host,
+                                  'host.create': create_host,
+                                  'apiinfo.version': lambda params: '3.0.0'})
+
+        self.zapi = FakeSessionZabbixAPI(self.server.answer)
+
+    def test_results(self):
+        with self.zapi.batch():
+            host = self.zapi.host.get(filter={'host': 'a'})
+            created = self.zapi.host.create(host='b')
+            version = self.zapi.apiinfo.version()
+
+            self.assertFalse(host.done())
+            self.assertRaises(ZabbixAPIException, host.result)
+
+        # One HTTP request for the three calls
+        self.assertEqual(len(self.server.requests), 1)
+        self.assertEqual(len(self.server.requests[0]), 3)
+
+        self.assertEqual(host.result(), [{'hostid': '1', 'host': 'a'}])
+        self.assertEqual(created.result(), {'hostids': ['2']})
+        self.assertEqual(version.result(), '3.0.0')
+
+    def test_responses_out_of_order(self):
+        zapi = FakeSessionZabbixAPI(lambda request_json: list(reversed(self.server.answer(request_json))))
+
+        with zapi.batch():
+            hosts = [zapi.host.get(filter={'host': name}) for name in ['a', 'b', 'c']]
+
+        self.assertEqual([host.result()[0]['host'] for host in hosts], ['a', 'b', 'c'])
+
+    def test_call_error(self):
+        with self.zapi.batch():
+            duplicate = self.zapi.host.create(host='duplicate')
+            created = self.zapi.host.create(host='b')
+
+        # Only the failed call gets the error
+        self.assertTrue(duplicate.done())
+        self.assertTrue(isinstance(duplicate.exception(), ZabbixAPIException))
+        self.assertTrue('already exists' in str(duplicate.exception()))
+        self.assertRaises(ZabbixAPIException, duplicate.result)
+
+        self.assertEqual(created.exception(), None)
+        self.assertEqual(created.result(), {'hostids': ['2']})
+
+    def test_missing_response(self):
+        zapi = FakeSessionZabbixAPI(lambda request_json: self.server.answer(request_json)[1:])
+
+        with zapi.batch():
+            first = zapi.host.get(filter={'host': 'a'})
+            second = zapi.host.get(filter={'host': 'b'})
+
+        self.assertRaises(ZabbixAPIException, first.result)
+        self.assertEqual(second.result(), [{'hostid': '1', 'host': 'b'}])
+
+    def test_batch_error(self):
+        error = {'jsonrpc': '2.0', 'id': None,
+                 'error': {'code': -32600, 'message': 'Invalid Request.', 'data': 'Invalid JSON-RPC request.'}}
+
+        zapi = FakeSessionZabbixAPI(lambda request_json: error)
+
+        with zapi.batch():
+            calls = [zapi.host.get(filter={'host': name}) for name in ['a', 'b']]
+
+        for call in calls:
+            self.assertRaises(ZabbixAPIException, call.result)
+
+    def test_max_size(self):
+        with self.zapi.batch(max_size=2):
+            hosts = [self.zapi.host.get(filter={'host': str(index)}) for index in range(5)]
+
+        self.assertEqual([len(request_json) for request_json in self.server.requests], [2, 2, 1])
+        self.assertEqual([host.result()[0]['host'] for host in hosts], ['0', '1', '2', '3', '4'])
+
+    def test_unique_ids(self):
+        with self.zapi.batch():
+            for index in range(3):
+                self.zapi.host.get(filter={'host': str(index)})
+
+        ids = [call['id'] for call in self.server.requests[0]]
+        self.assertEqual(len(set(ids)), 3)
+
+    def test_exception_in_block(self):
+        def fail():
+            with self.zapi.batch():
+                self.zapi.host.create(host='b')
+                raise ValueError('aborted')
+
+        self.assertRaises(ValueError, fail)
+
+        # Nothing is sent and the calls are not batched any more
+        self.assertEqual(self.server.requests, [])
+        self.assertEqual(self.zapi.host.get(filter={'host': 'a'}), [{'hostid': '1', 'host': 'a'}])
+
+
+def split_chunks(data, size):
+    return [data[index:index + size] for index in range(0, len(data), size)]
+
+
+class ResponseStreamTest(unittest.TestCase):
+
+    RESULT = [{'hostid': '10084', 'host': u'H\u00f6st 1', 'groups': [{'groupid': '4'}]},
+              12345678, -1.5e3, True, None, 'a "quoted" string, with [brackets]', [], {}]
+
+    def decode(self, response, size):
+        stream = ZabbixAPIResponseStream(split_chunks(response, size))
+        return (list(stream.iter_result()), stream)
+
+    def test_chunk_boundaries(self):
+        response = json.dumps({'jsonrpc': '2.0', 'result': self.RESULT, 'id': 7},
+                              indent=1, ensure_ascii=False).encode('utf-8')
+
+        # Every value, number and UTF-8 character is split at some size
+        for size in range(1, 40):
+            (result, stream) = self.decode(response, size)
+
+            self.assertEqual(result, self.RESULT)
+            self.assertEqual(stream.members, {'jsonrpc': '2.0', 'id': 7})
+            self.assertEqual(stream.bytes_received, len(response))
+
+    def test_empty_result(self):
+        for response in [b'{"jsonrpc": "2.0", "result": [], "id": 1}', b'{}']:
+            for size in [1, 3, 100]:
+                self.assertEqual(self.decode(response, size)[0], [])
+
+    def test_not_array_result(self):
+        (result, stream) = self.decode(b'{"jsonrpc":"2.0","result":"3.0.0","id":1}', 4)
+
+        self.assertEqual(result, ['3.0.0'])
+
+    def test_error(self):
+        error = {'code': -32602, 'message': 'Invalid params.', 'data': 'No permissions to referred object.'}
+        response = json.dumps({'jsonrpc': '2.0', 'error': error, 'id': 3}).encode('utf-8')
+
+        for size in [1, 5, 1000]:
+            (result, stream) = self.decode(response, size)
+
+            self.assertEqual(result, [])
+            self.assertEqual(stream.members['error'], error)
+
+    def test_truncated(self):
+        response = json.dumps({'jsonrpc': '2.0', 'result': self.RESULT, 'id': 7}).encode('utf-8')
+
+        for end in [1, 30, len(response) - 1]:
+            stream = ZabbixAPIResponseStream(split_chunks(response[:end], 8))
+            self.assertRaises(ZabbixAPIException, list, stream.iter_result())
+
+    def test_not_json(self):
+        stream = ZabbixAPIResponseStream([b'<html>Internal Server Error</html>'])
+        self.assertRaises(ZabbixAPIException, list, stream.iter_result())
+
+    def test_iter_request(self):
+        hosts = [{'hostid': str(hostid)} for hostid in range(50)]
+        server = FakeServer({'host.get': lambda params: hosts})
+        zapi = FakeSessionZabbixAPI(server.answer, chunk_size=16)
+
+        self.assertEqual(list(zapi.iter_request('host.get', {'output': ['hostid']})), hosts)
+
+    def test_iter_request_error(self):
+        def get_host(params):
+            raise FakeServerError(-32500, 'Application error.', 'No permissions.')
+
+        zapi = FakeSessionZabbixAPI(FakeServer({'host.get': get_host}).answer, chunk_size=16)
+
+        self.assertRaises(ZabbixAPIException, list, zapi.iter_request('host.get', {}))
+        self.assertEqual(zapi.stats.methods['host.get'].errors, 1)
+
+
+def wait_until(condition, timeout=5):
+    deadline = time.time() + timeout
+
+    while not condition():
+        if time.time() > deadline:
+            raise AssertionError('Timeout waiting for a condition')
+
+        time.sleep(0.01)
+
+
+class CoalesceReadsTest(unittest.TestCase):
+    '''
+    The first host.get waits in the fake server until self.release is
+    set, so other calls can be made while it is in flight.
+    '''
+
+    def setUp(self):
+        self.hosts = [{'hostid': '1', 'host': 'old'}]
+        self.release = threading.Event()
+        self.blocked = []
+        self.get_error = None
+
+        def get_host(params):
+            hosts = [dict(host) for host in self.hosts]
+
+            if self.blocked == []:
+                self.blocked.append(True)
+                self.release.wait(5)
+
+            if self.get_error is not None:
+                raise self.get_error
+
+            return hosts
+
+        def update_host(params):
+            self.hosts = [{'hostid': '1', 'host': params['host']}]
+            return {'hostids': ['1']}
+
+        self.server = FakeServer({'host.get': get_host, 'host.update': update_host})
+
+    def tearDown(self):
+        self.release.set()
+
+    def zapi(self, **kwargs):
+        return FakeSessionZabbixAPI(self.server.answer, thread_safe=True, **kwargs)
+
+    def start_read(self, zapi, results):
+        def read():
+            try:
+                results.append(zapi.host.get(output=['host']))
+            except Exception as e:
+                results.append(e)
+
+        thread = threading.Thread(target=read)
+        thread.daemon = True
+        thread.start()
+
+        return thread
+
+    def count_gets(self):
+        return len([request_json for request_json in self.server.requests if request_json['method'] == 'host.get'])
+
+    def test_coalesce(self):
+        zapi = self.zapi()
+        results = []
+
+        threads = [self.start_read(zapi, results)]
+        wait_until(lambda: self.blocked != [])
+
+        threads += [self.start_read(zapi, results) for index in range(3)]
+        wait_until(lambda: zapi.coalesced_calls == 3)
+
+        self.release.set()
+
+        for thread in threads:
+            thread.join(5)
+
+        # One request, every caller gets its own copy of the result
+        self.assertEqual(self.count_gets(), 1)
+        self.assertEqual(results, [[{'hostid': '1', 'host': 'old'}]] * 4)
+        self.assertEqual(len(set(id(result) for result in results)), 4)
+        self.assertEqual(zapi._inflight, {})
+
+    def test_different_params(self):
+        zapi = self.zapi()
+        results = []
+
+        thread = self.start_read(zapi, results)
+        wait_until(lambda: self.blocked != [])
+
+        zapi.host.get(output=['hostid'])
+        self.release.set()
+        thread.join(5)
+
+        self.assertEqual(self.count_gets(), 2)
+        self.assertEqual(zapi.coalesced_calls, 0)
+
+    def test_error(self):
+        zapi = self.zapi()
+        results = []
+        self.get_error = FakeServerError(-32500, 'Application error.', 'No permissions.')
+
+        threads = [self.start_read(zapi, results)]
+        wait_until(lambda: self.blocked != [])
+
+        threads.append(self.start_read(zapi, results))
+        wait_until(lambda: zapi.coalesced_calls == 1)
+
+        self.release.set()
+
+        for thread in threads:
+            thread.join(5)
+
+        self.assertEqual(len(results), 2)
+
+        for result in results:
+            self.assertTrue(isinstance(result, ZabbixAPIException))
+
+    def test_no_coalescing_across_writes(self):
+        zapi = self.zapi()
+        results = []
+
+        thread = self.start_read(zapi, results)
+        wait_until(lambda: self.blocked != [])
+
+        # A read sent after a write must see the write
+        zapi.host.update(hostid='1', host='new')
+
+        self.assertEqual(zapi.host.get(output=['host']), [{'hostid': '1', 'host': 'new'}])
+        self.assertEqual(zapi.coalesced_calls, 0)
+
+        self.release.set()
+        thread.join(5)
+
+        self.assertEqual(results, [[{'hostid': '1', 'host': 'old'}]])
+        self.assertEqual(self.count_gets(), 2)
+
+    def test_no_caching_across_writes(self):
+        zapi = self.zapi(cache_ttl=60)
+        results = []
+
+        thread = self.start_read(zapi, results)
+        wait_until(lambda: self.blocked != [])
+
+        zapi.host.update(hostid='1', host='new')
+        self.release.set()
+        thread.join(5)
+
+        # The result of the read started before the write is not cached
+        self.assertEqual(results, [[{'hostid': '1', 'host': 'old'}]])
+        self.assertEqual(zapi.host.get(output=['host']), [{'hostid': '1', 'host': 'new'}])
+        self.assertEqual(self.count_gets(), 2)
+
+    def test_not_thread_safe(self):
+        zapi = FakeSessionZabbixAPI(self.server.answer)
+        self.release.set()
+
+        zapi.host.get(output=['host'])
+        zapi.host.get(output=['host'])
+
+        self.assertEqual(self.count_gets(), 2)
+        self.assertEqual(zapi._inflight, {})
+
+
+class ZabbixAPICacheTest(unittest.TestCase):
+
+    def test_lookup(self):
+        cache = ZabbixAPICache(ttl=60, size=10)
+        cache.store('key', 'host.get', {}, [{'hostid': '1'}])
+
+        self.assertEqual(cache.lookup('key'), (True, [{'hostid': '1'}]))
+        self.assertEqual(cache.lookup('other'), (False, None))
+
+        # The cached result is not modified by the callers
+        cache.lookup('key')[1].append('x')
+        self.assertEqual(cache.lookup('key'), (True, [{'hostid': '1'}]))
+
+    def test_expiration(self):
+        cache = ZabbixAPICache(ttl=-1, size=10)
+        cache.store('key', 'host.get', {}, [])
+
+        self.assertEqual(cache.lookup('key'), (False, None))
+        self.assertEqual(len(cache.entries), 0)
+
+    def test_least_recently_used(self):
+        cache = ZabbixAPICache(ttl=60, size=3)
+
+        for key in range(3):
+            cache.store(key, 'host.get', {}, key)
+
+        cache.lookup(0)
+        cache.store(2, 'host.get', {}, 2)
+        cache.store(3, 'host.get', {}, 3)
+
+        self.assertEqual(sorted(cache.entries), [0, 2, 3])
+
+        cache.store(4, 'host.get', {}, 4)
+        cache.store(5, 'host.get', {}, 5)
+
+        self.assertEqual(sorted(cache.entries), [3, 4, 5])
+
+    def test_invalidate(self):
+        cache = ZabbixAPICache(ttl=60, size=10)
+        cache.store('hosts', 'host.get', {}, [])
+        cache.store('groups', 'hostgroup.get', {'selectHosts': ['host']}, [])
+        cache.store('users', 'user.get', {}, [])
+
+        cache.invalidate('host.get')
+        self.assertEqual(len(cache.entries), 3)
+
+        cache.invalidate('host.create')
+        self.assertEqual(list(cache.entries), ['users'])
+
+        cache.invalidate('configuration.import')
+        self.assertEqual(cache.entries, {})
+
+        # The recency list is empty too
+        cache.store('hosts', 'host.get', {}, [])
+        self.assertEqual(cache.lookup('hosts'), (True, []))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,142 @@
+#!/usr/bin/env python
+#
+# Authors:
+# rafael@postgresql.org.es / http://www.postgresql.org.es/
+#
+# Copyright (c) 2014-2015 USIT-University of Oslo
+#
+# This file is part of Zabbix-CLI
+# https://github.com/rafaelma/zabbix-cli
+#
+# Zabbix-CLI is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Zabbix-CLI is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Zabbix-CLI.  If not, see <http://www.gnu.org/licenses/>.
+
+import os
+import sys
+import getpass
+
+
+# ############################################
+# Function get_credentials
+# ############################################
+
+def get_credentials(conf, logs):
+    '''
+    Return the (username, password, auth_token) used to login into
+    the Zabbix-API. Used by zabbix-cli and
+    zabbix-cli-bulk-execution.
+    '''
+
+    #
+    # Non-interactive authentication procedure
+    # 
+    # If the file .zabbix_cli_auth exists at $HOME, use the
+    # information in this file to authenticate into Zabbix API
+    #
+    # Format:
+    # <Zabbix username>::<password>
+    #
+    # Use .zabbix-cli_auth_token if it exists and .zabbix_cli_auth
+    # does not exist.
+    #
+    # Format:
+    # <Zabbix username>::<API-token>
+    #
+
+    auth_token = ''
+    username = ''
+    password = ''
+
+    zabbix_auth_file = os.getenv('HOME') + '/.zabbix-cli_auth'
+    zabbix_auth_token_file = os.getenv('HOME') + '/.zabbix-cli_auth_token'
+
+    if os.path.isfile(zabbix_auth_file):
+
+        try:
+            os.chmod(zabbix_auth_file,0400)
+        
+            with open(zabbix_auth_file,'r') as file:
+                for line in file:
+                    (username, password) = line.split('::')
+
+            password = password.replace('\n','')
+            
+            if conf.logging == 'ON':
+                logs.logger.debug('File %s exists. Using this file to get authentication information',zabbix_auth_file)
+
+        except Exception as e:
+            print '\n[ERROR]: %s\n',e
+
+            if conf.logging == 'ON':
+                logs.logger.error('Problems using file %s - %s',zabbix_auth_file,e)
+
+    elif os.path.isfile(zabbix_auth_token_file):
+
+        try:
+            os.chmod(zabbix_auth_token_file,0600)
+        
+            with open(zabbix_auth_token_file,'r') as file:
+                for line in file:
+                    (username, auth_token) = line.split('::')
+            
+            if conf.logging == 'ON':
+                logs.logger.info('File %s exists. Using this file to get authentication token information',zabbix_auth_token_file)
+
+        except Exception as e:
+            print '\n[ERROR]: %s\n',e
+
+            if conf.logging == 'ON':
+                logs.logger.error('Problems using file %s - %s',zabbix_auth_token_file,e)
+
+
+    #
+    # Interactive authentication procedure
+    #
+
+    else:
+
+        default_user = getpass.getuser()
+        
+        print '-------------------------'
+        print 'Zabbix-CLI authentication'
+        print '-------------------------'
+    
+        try:
+            username = raw_input('# Username[' + default_user +']: ')
+            password = getpass.getpass('# Password: ')
+        
+        except Exception as e:
+            print '\n[Aborted]'
+            sys.exit(0)
+
+        if username == '':
+            username = default_user
+
+
+    #
+    # Check that username and password have some values if the
+    # API-auth-token is empty ($HOME/.zabbix-cli_auth_token does
+    # not exist)
+    #
+    
+    if auth_token == '':
+
+        if username == '' or password == '':
+            print '\n[ERROR]: Username or password is empty\n'
+                                
+            if conf.logging == 'ON':
+                logs.logger.error('Username or password is empty')
+            
+            sys.exit(1)
+
+    return (username, password, auth_token)
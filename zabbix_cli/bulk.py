@@ -0,0 +1,518 @@
+#!/usr/bin/env python
+#
+# Authors:
+# rafael@postgresql.org.es / http://www.postgresql.org.es/
+#
+# Copyright (c) 2014-2015 USIT-University of Oslo
+#
+# This file is part of Zabbix-CLI
+# https://github.com/rafaelma/zabbix-cli
+#
+# Zabbix-CLI is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Zabbix-CLI is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Zabbix-CLI.  If not, see <http://www.gnu.org/licenses/>.
+
+import os
+import sys
+import json
+import time
+import shlex
+import threading
+
+from multiprocessing.pool import ThreadPool
+
+
+# ############################################
+# Function read_commands
+# ############################################
+
+def read_commands(input_file):
+    '''
+    Return a list of (line number, command) with the zabbix-cli
+    commands in input_file. Empty lines and comment lines (with #)
+    are not considered.
+    '''
+
+    commands = []
+
+    with open(input_file, 'r') as file:
+
+        for line_number, line in enumerate(file, 1):
+
+            if line.find('#', 0) == -1 and line.strip() != '':
+                commands.append((line_number, line.strip()))
+
+    return commands
+
+
+#
+# command: [(argument position, object type), ...]
+#
+# Arguments with the name of Zabbix objects that the command
+# resolves to IDs. Arguments can have several names in a comma
+# separated list.
+#
+
+PREFETCH_ARGUMENTS = {
+    'add_host_to_hostgroup': [(0, 'host'), (1, 'hostgroup')],
+    'remove_host_from_hostgroup': [(0, 'host'), (1, 'hostgroup')],
+    'link_template_to_host': [(0, 'template'), (1, 'host')],
+    'unlink_template_from_host': [(0, 'template'), (1, 'host')],
+    'add_user_to_usergroup': [(0, 'user'), (1, 'usergroup')],
+    'remove_user_from_usergroup': [(0, 'user'), (1, 'usergroup')],
+    'add_usergroup_permissions': [(0, 'usergroup'), (1, 'hostgroup')],
+    'update_usergroup_permissions': [(0, 'usergroup'), (1, 'hostgroup')],
+    'create_host': [(0, 'host'), (1, 'hostgroup'), (2, 'proxy')],
+    'create_host_interface': [(0, 'host')],
+    'create_user': [(7, 'usergroup')],
+    'define_host_monitoring_status': [(0, 'host')],
+    'define_host_usermacro': [(0, 'host')],
+    'load_balance_proxy_hosts': [(0, 'proxy')],
+    'move_proxy_hosts': [(0, 'proxy'), (1, 'proxy')],
+    'remove_host': [(0, 'host')],
+    'remove_user': [(0, 'user')],
+    'show_host_usermacros': [(0, 'host')],
+    'update_host_inventory': [(0, 'host')],
+    'update_host_proxy': [(0, 'host'), (1, 'proxy')],
+}
+
+
+# ############################################
+# Function scan_names
+# ############################################
+
+def scan_names(commands, defaults=None):
+    '''
+    Return a dictionary {object type: set(names)} with the names of
+    the Zabbix objects used by the commands in commands [(line
+    number, command), ...].
+
+    defaults {command: {object type: [names]}} has the names used
+    by a command when they are not given as arguments (e.g. the
+    default hostgroup of create_host).
+    '''
+
+    names = {}
+
+    if defaults is None:
+        defaults = {}
+
+    for (line_number, command) in commands:
+
+        try:
+            arg_list = shlex.split(command)
+        except ValueError:
+            continue
+
+        command_name = arg_list[0]
+
+        for object_type, default_names in defaults.get(command_name, {}).iteritems():
+            names.setdefault(object_type, set()).update(default_names)
+
+        for (position, object_type) in PREFETCH_ARGUMENTS.get(command_name, []):
+
+            if position + 1 >= len(arg_list):
+                continue
+
+            for name in arg_list[position + 1].split(','):
+                name = name.strip()
+
+                # IDs are not resolved
+                if name != '' and not name.isdigit():
+                    names.setdefault(object_type, set()).add(name)
+
+    return names
+
+
+# ############################################
+# Function iter_command_runs
+# ############################################
+
+def iter_command_runs(commands):
+    '''
+    Generator with the runs of consecutive commands with the same
+    name in commands [(line number, command), ...]. Every run is
+    returned as (command name, [(line number, command), ...]).
+    '''
+
+    run_name = None
+    run = []
+
+    for (line_number, command) in commands:
+
+        command_name = command.split(None, 1)[0]
+
+        if command_name != run_name and run != []:
+            yield (run_name, run)
+            run = []
+
+        run_name = command_name
+        run.append((line_number, command))
+
+    if run != []:
+        yield (run_name, run)
+
+
+# ############################################
+# class BulkJournal
+# ############################################
+
+class BulkJournal(object):
+    '''
+    Append-only journal of the commands of a bulk execution file
+    that have been executed, one JSON document per line:
+
+    {"line": 31, "command": "create_host ...", "status": 0, "time": ...}
+
+    Every entry is flushed when it is written, so the journal is
+    complete up to the last executed command if zabbix-cli dies.
+
+    With resume=True, the entries of a previous execution are loaded
+    and the commands that were executed without errors are skipped.
+    A command is only skipped if the line number and the command in
+    the journal are the same as in the file.
+
+    Without resume, an existing journal is not overwritten. It is
+    renamed to <filename>.<timestamp> (rotated_file).
+    '''
+
+    def __init__(self, filename, resume=False):
+
+        self.filename = filename
+        self.completed = {}
+        self.complete_lines = True
+        self.rotated_file = None
+
+        if resume and os.path.exists(filename):
+            self.load()
+            mode = 'a'
+
+        else:
+            if os.path.exists(filename):
+                self.rotate()
+
+            mode = 'w'
+
+        self.file = open(filename, mode)
+
+        # New entries must not be appended to an incomplete one
+        if not self.complete_lines:
+            self.file.write('\n')
+
+
+    # ############################################
+    # Method rotate
+    # ############################################
+
+    def rotate(self):
+        '''
+        Rename the journal of a previous execution
+        '''
+
+        rotated_file = self.filename + '.' + time.strftime('%Y%m%d%H%M%S')
+        index = 1
+
+        while os.path.exists(rotated_file):
+            rotated_file = self.filename + '.' + time.strftime('%Y%m%d%H%M%S') + '.' + str(index)
+            index += 1
+
+        os.rename(self.filename, rotated_file)
+        self.rotated_file = rotated_file
+
+
+    # ############################################
+    # Method load
+    # ############################################
+
+    def load(self):
+        '''
+        Load the commands executed without errors by a previous
+        execution
+        '''
+
+        with open(self.filename, 'r') as file:
+
+            for line in file:
+
+                self.complete_lines = line.endswith('\n')
+
+                # The last entry can be incomplete if we died
+                # while writing it.
+
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    continue
+
+                if entry.get('status') == 0:
+                    self.completed[entry['line']] = entry['command']
+                else:
+                    self.completed.pop(entry.get('line'), None)
+
+
+    # ############################################
+    # Method pending
+    # ############################################
+
+    def pending(self, commands):
+        '''
+        Return the commands in commands [(line number, command),
+        ...] not executed yet
+        '''
+
+        return [(line_number, command) for (line_number, command) in commands
+                if self.completed.get(line_number) != command]
+
+
+    # ############################################
+    # Method record
+    # ############################################
+
+    def record(self, line_number, command, status):
+        '''
+        Register an executed command
+        '''
+
+        self.file.write(json.dumps({'line': line_number,
+                                    'command': command,
+                                    'status': status,
+                                    'time': int(time.time())}) + '\n')
+        self.file.flush()
+
+
+    # ############################################
+    # Method close
+    # ############################################
+
+    def close(self):
+        self.file.close()
+
+
+# ############################################
+# class ThreadLocalOutput
+# ############################################
+
+class ThreadLocalOutput(object):
+    '''
+    File-like object used as sys.stdout while commands run in
+    several threads. The output of a thread is saved in its own
+    buffer between capture() and release(). Threads without a
+    buffer write to the original stream.
+
+    The softspace flag of the print statement is kept per thread
+    too, a print in one thread must not change the output of the
+    others.
+    '''
+
+    def __init__(self, stream):
+        self.stream = stream
+        self.local = threading.local()
+
+    def capture(self):
+        self.local.buffer = []
+
+    def release(self):
+        buffer = self.local.buffer
+        self.local.buffer = None
+
+        return ''.join(buffer)
+
+    def write(self, data):
+        buffer = getattr(self.local, 'buffer', None)
+
+        if buffer is None:
+            self.stream.write(data)
+
+        else:
+            if isinstance(data, unicode):
+                data = data.encode('utf-8')
+
+            buffer.append(data)
+
+    def flush(self):
+        if getattr(self.local, 'buffer', None) is None:
+            self.stream.flush()
+
+    def get_softspace(self):
+        return getattr(self.local, 'softspace', 0)
+
+    def set_softspace(self, value):
+        self.local.softspace = value
+
+    softspace = property(get_softspace, set_softspace)
+
+    def __getattr__(self, name):
+        return getattr(self.stream, name)
+
+
+# ############################################
+# class BulkCommandResult
+# ############################################
+
+class BulkCommandResult(object):
+    '''
+    Result of a command executed by BulkExecutor
+    '''
+
+    def __init__(self, line_number, command, status, output, elapsed):
+        self.line_number = line_number
+        self.command = command
+        self.status = status
+        self.output = output
+        self.elapsed = elapsed
+
+
+# ############################################
+# class BulkExecutor
+# ############################################
+
+class BulkExecutor(object):
+    '''
+    Execute zabbix-cli commands with one zabbixcli instance and a
+    pool of worker threads.
+
+    The zabbixcli instance (and its ZabbixAPI client) is shared by
+    all the workers, so we login and populate the caches only once.
+    The output of every command is captured per thread. The exit
+    status is the one the command would have with 'zabbix-cli -C',
+    or 1 if its feedback was an error. The return code of the
+    feedback is kept per thread by zabbixcli.
+
+    The commands run concurrently when workers > 1, so the order
+    between them is not guaranteed (e.g. a create_hostgroup and a
+    create_host using this hostgroup should not be in the same run).
+    '''
+
+    def __init__(self, cli, workers=1, logs=None):
+
+        self.cli = cli
+        self.workers = max(1, workers)
+        self.logs = logs
+
+        self.executed = 0
+        self.errors = 0
+        self.elapsed = 0.0
+        self.lock = threading.Lock()
+
+
+    # ############################################
+    # Method run_command
+    # ############################################
+
+    def run_command(self, item):
+        '''
+        Execute one command in the calling thread and return a
+        BulkCommandResult
+        '''
+
+        (line_number, command) = item
+
+        status = 0
+        start_time = time.time()
+
+        sys.stdout.capture()
+
+        self.cli.reset_return_code()
+
+        try:
+            self.cli.onecmd(command)
+
+            if self.cli.get_return_code() == 'error':
+                status = 1
+
+        except SystemExit as e:
+
+            if e.code is None:
+                status = 0
+            elif isinstance(e.code, int):
+                status = e.code
+            else:
+                status = 1
+
+        except Exception as e:
+            status = 1
+            print '\n[ERROR]: ' + str(e) + '\n'
+
+        finally:
+            output = sys.stdout.release()
+
+        elapsed = time.time() - start_time
+
+        with self.lock:
+            self.executed += 1
+
+            if status != 0:
+                self.errors += 1
+
+        if self.logs != None:
+
+            if status == 0:
+                self.logs.logger.info('Zabbix-cli command [%s] executed',command)
+            else:
+                self.logs.logger.error('Zabbix-cli command [%s] could not be executed',command)
+
+        return BulkCommandResult(line_number, command, status, output, elapsed)
+
+
+    # ############################################
+    # Method run
+    # ############################################
+
+    def run(self, commands):
+        '''
+        Generator with the BulkCommandResult of every command in
+        commands [(line number, command), ...], in the same order
+        as commands.
+        '''
+
+        stdout = sys.stdout
+        stdin = sys.stdin
+
+        #
+        # Commands asking for missing parameters get EOF instead of
+        # waiting for input.
+        #
+
+        sys.stdout = ThreadLocalOutput(stdout)
+        sys.stdin = open(os.devnull, 'r')
+
+        pool = ThreadPool(self.workers)
+        start_time = time.time()
+
+        try:
+            for result in pool.imap(self.run_command, commands):
+                yield result
+
+        finally:
+            self.elapsed = time.time() - start_time
+
+            pool.terminate()
+            pool.join()
+
+            sys.stdin.close()
+            sys.stdout = stdout
+            sys.stdin = stdin
+
+
+    # ############################################
+    # Method throughput
+    # ############################################
+
+    def throughput(self):
+        '''
+        Commands executed per second
+        '''
+
+        if self.elapsed > 0:
+            return self.executed / self.elapsed
+
+        return 0.0
@@ -0,0 +1,471 @@
+#!/usr/bin/env python
+#
+# Authors:
+# rafael@postgresql.org.es / http://www.postgresql.org.es/
+#
+# Copyright (c) 2014-2015 USIT-University of Oslo
+#
+# This file is part of Zabbix-CLI
+# https://github.com/rafaelma/zabbix-cli
+#
+# Zabbix-CLI is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Zabbix-CLI is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Zabbix-CLI.  If not, see <http://www.gnu.org/licenses/>.
+
+import os
+import sys
+import time
+import sqlite3
+import threading
+
+
+# ############################################
+# class EntityCache
+# ############################################
+
+class EntityCache(object):
+    '''
+    In memory ID<->name index of the Zabbix objects of one type
+    (host, proxy, hostgroup, template, usergroup or user).
+
+    Lookups by ID and by name are dictionary lookups. Hosts also
+    have a label (the visible name) per ID, used when showing
+    hosts.
+
+    'complete' is True when the cache has all the objects of the
+    system, False when it only has the objects used so far.
+
+    'prefetched' has the names looked up in the Zabbix-API when the
+    cache was filled (see zabbixcli.prefetch_names()). A prefetched
+    name without an ID did not exist then.
+    '''
+
+    def __init__(self, object_type, complete=False):
+
+        self.object_type = object_type
+        self.complete = complete
+
+        self.names = {}
+        self.ids = {}
+        self.labels = {}
+        self.prefetched = set()
+
+        self.lock = threading.RLock()
+
+
+    # ############################################
+    # Method add
+    # ############################################
+
+    def add(self, objectid, name, label=None):
+        '''
+        Add or update an object
+        '''
+
+        objectid = str(objectid)
+
+        with self.lock:
+
+            if name is not None:
+
+                # A renamed object must not be found with the old name
+                old_name = self.names.get(objectid)
+
+                if old_name is not None and old_name != name and self.ids.get(old_name) == objectid:
+                    del self.ids[old_name]
+
+                self.names[objectid] = name
+                self.ids[name] = objectid
+
+            if label is not None:
+                self.labels[objectid] = label
+
+
+    # ############################################
+    # Method remove
+    # ############################################
+
+    def remove(self, objectid):
+        '''
+        Remove a deleted object
+        '''
+
+        objectid = str(objectid)
+
+        with self.lock:
+            name = self.names.pop(objectid, None)
+            self.labels.pop(objectid, None)
+
+            if name is not None and self.ids.get(name) == objectid:
+                del self.ids[name]
+
+
+    # ############################################
+    # Method get_id
+    # ############################################
+
+    def get_id(self, name):
+        return self.ids.get(name)
+
+
+    # ############################################
+    # Method get_name
+    # ############################################
+
+    def get_name(self, objectid):
+        return self.names.get(str(objectid))
+
+
+    # ############################################
+    # Method get_label
+    # ############################################
+
+    def get_label(self, objectid):
+        '''
+        Return the label of an object, its name if it does not have
+        a label
+        '''
+
+        objectid = str(objectid)
+
+        with self.lock:
+            label = self.labels.get(objectid)
+
+            if label is None:
+                label = self.names.get(objectid)
+
+            return label
+
+
+    # ############################################
+    # Method items
+    # ############################################
+
+    def items(self):
+        '''
+        Return a list of (ID, name) with all the objects in the cache
+        '''
+
+        with self.lock:
+            return self.names.items()
+
+
+    # ############################################
+    # Method size
+    # ############################################
+
+    def size(self):
+        '''
+        Approximate memory used by the cache, in bytes
+        '''
+
+        with self.lock:
+            size = 0
+
+            for index in (self.names, self.ids, self.labels):
+                size += sys.getsizeof(index)
+
+                for key, value in index.iteritems():
+                    size += sys.getsizeof(key) + sys.getsizeof(value)
+
+            return size
+
+
+    def __len__(self):
+        # Number of objects, with a name and/or a label
+        with self.lock:
+            return len(set(self.names) | set(self.labels))
+
+
+# ############################################
+# class EntityStore
+# ############################################
+
+class EntityStore(object):
+    '''
+    Persistent ID<->name maps of Zabbix objects (hosts, proxies,
+    hostgroups, templates, usergroups and users) saved in a SQLite
+    file, so they can be shared between zabbix-cli invocations.
+
+    The maps of every Zabbix system (system_id) are saved
+    separately. The freshness policy of a map is:
+
+    * Younger than ttl seconds: used as it is, no API calls.
+
+    * Older than ttl seconds: incremental refresh. Only the IDs of
+      the objects are fetched from the API, the names of new objects
+      are fetched and deleted objects are removed.
+
+    * Older than full_refresh seconds (or empty): the complete map
+      is fetched again. This is the only way to find out about
+      renamed objects.
+    '''
+
+    #
+    # object type: (ID field, name field, extra get parameters)
+    #
+
+    ENTITIES = {
+        'host': ('hostid', 'name', {'monitored_hosts': True}),
+        'proxy': ('proxyid', 'host', {}),
+        'hostgroup': ('groupid', 'name', {}),
+        'template': ('templateid', 'host', {}),
+        'usergroup': ('usrgrpid', 'name', {}),
+        'user': ('userid', 'alias', {}),
+    }
+
+    # Object types fetched with ZabbixAPI.iter_get() because they can be big
+    SHARDED = ('host',)
+
+    def __init__(self, filename, system_id, zapi, ttl=300, full_refresh=86400, shard_size=1000, workers=1):
+
+        self.filename = filename
+        self.system_id = system_id
+        self.zapi = zapi
+        self.ttl = ttl
+        self.full_refresh = full_refresh
+        self.shard_size = shard_size
+        self.workers = workers
+
+        # The connection is shared by all the threads using the store
+        self.lock = threading.RLock()
+
+        # The file has the names of all the objects in the system,
+        # only the owner can read it. It is created before sqlite
+        # opens it, with the process umask it would be readable by
+        # others until the chmod.
+        os.close(os.open(filename, os.O_WRONLY | os.O_CREAT, 0600))
+        os.chmod(filename, 0600)
+
+        self.connection = sqlite3.connect(filename, timeout=30, check_same_thread=False)
+        self.connection.text_factory = unicode
+
+        with self.connection:
+            self.connection.execute('CREATE TABLE IF NOT EXISTS entity ('
+                                    'system_id TEXT NOT NULL, '
+                                    'object_type TEXT NOT NULL, '
+                                    'id TEXT NOT NULL, '
+                                    'name TEXT NOT NULL, '
+                                    'PRIMARY KEY (system_id, object_type, id))')
+
+            self.connection.execute('CREATE TABLE IF NOT EXISTS refresh ('
+                                    'system_id TEXT NOT NULL, '
+                                    'object_type TEXT NOT NULL, '
+                                    'last_refresh REAL NOT NULL, '
+                                    'last_full_refresh REAL NOT NULL, '
+                                    'PRIMARY KEY (system_id, object_type))')
+
+
+    # ############################################
+    # Method get_map
+    # ############################################
+
+    def get_map(self, object_type):
+        '''
+        Return a dictionary {ID:name} with all the objects of
+        object_type, refreshing the saved map first if it is not
+        fresh enough.
+        '''
+
+        with self.lock:
+            now = time.time()
+            (last_refresh, last_full_refresh) = self.get_refresh_times(object_type)
+
+            if now - last_full_refresh >= self.full_refresh:
+                self.refresh_full(object_type, now)
+
+            elif now - last_refresh >= self.ttl:
+                self.refresh_incremental(object_type, now)
+
+            return self.load(object_type)
+
+
+    # ############################################
+    # Method get_refresh_times
+    # ############################################
+
+    def get_refresh_times(self, object_type):
+        '''
+        Return the times of the last refresh and last full refresh
+        of object_type, (0, 0) if it has never been fetched.
+        '''
+
+        row = self.connection.execute('SELECT last_refresh, last_full_refresh FROM refresh '
+                                      'WHERE system_id = ? AND object_type = ?',
+                                      (self.system_id, object_type)).fetchone()
+
+        if row is None:
+            return (0, 0)
+
+        return row
+
+
+    # ############################################
+    # Method load
+    # ############################################
+
+    def load(self, object_type):
+        '''
+        Return the saved {ID:name} map of object_type
+        '''
+
+        rows = self.connection.execute('SELECT id, name FROM entity '
+                                       'WHERE system_id = ? AND object_type = ?',
+                                       (self.system_id, object_type))
+
+        return dict(rows)
+
+
+    # ############################################
+    # Method fetch
+    # ############################################
+
+    def fetch(self, object_type, output, **params):
+        '''
+        Generator with the objects of object_type from the Zabbix-API
+        '''
+
+        (id_field, name_field, extra_params) = self.ENTITIES[object_type]
+        params.update(extra_params)
+
+        # A list with only the IDs is cheap, iter_get() would fetch
+        # the IDs twice.
+
+        if object_type in self.SHARDED and output != [id_field]:
+            return self.zapi.iter_get(object_type,
+                                      shard_size=self.shard_size,
+                                      workers=self.workers,
+                                      output=output,
+                                      **params)
+
+        return getattr(self.zapi, object_type).get(output=output, **params)
+
+
+    # ############################################
+    # Method refresh_full
+    # ############################################
+
+    def refresh_full(self, object_type, now):
+        '''
+        Replace the saved map of object_type with the objects in
+        the Zabbix-API
+        '''
+
+        (id_field, name_field, extra_params) = self.ENTITIES[object_type]
+
+        rows = [(self.system_id, object_type, item[id_field], item[name_field])
+                for item in self.fetch(object_type, [id_field, name_field])]
+
+        with self.connection:
+            self.connection.execute('DELETE FROM entity WHERE system_id = ? AND object_type = ?',
+                                    (self.system_id, object_type))
+
+            self.connection.executemany('INSERT OR REPLACE INTO entity VALUES (?, ?, ?, ?)', rows)
+            self.save_refresh_times(object_type, now, now)
+
+
+    # ############################################
+    # Method refresh_incremental
+    # ############################################
+
+    def refresh_incremental(self, object_type, now):
+        '''
+        Update the saved map of object_type with the objects
+        created and deleted since the last refresh. Only the IDs of
+        all the objects and the names of the new ones are fetched.
+        '''
+
+        (id_field, name_field, extra_params) = self.ENTITIES[object_type]
+
+        current_ids = set(item[id_field] for item in self.fetch(object_type, [id_field]))
+        saved_ids = set(self.load(object_type))
+
+        new_ids = list(current_ids - saved_ids)
+        deleted_ids = list(saved_ids - current_ids)
+
+        rows = []
+
+        if new_ids:
+            rows = [(self.system_id, object_type, item[id_field], item[name_field])
+                    for item in self.fetch(object_type, [id_field, name_field], **{id_field + 's': new_ids})]
+
+        (last_refresh, last_full_refresh) = self.get_refresh_times(object_type)
+
+        with self.connection:
+            self.connection.executemany('DELETE FROM entity WHERE system_id = ? AND object_type = ? AND id = ?',
+                                        [(self.system_id, object_type, objectid) for objectid in deleted_ids])
+
+            self.connection.executemany('INSERT OR REPLACE INTO entity VALUES (?, ?, ?, ?)', rows)
+            self.save_refresh_times(object_type, now, last_full_refresh)
+
+
+    # ############################################
+    # Method save_refresh_times
+    # ############################################
+
+    def save_refresh_times(self, object_type, last_refresh, last_full_refresh):
+
+        self.connection.execute('INSERT OR REPLACE INTO refresh VALUES (?, ?, ?, ?)',
+                                (self.system_id, object_type, last_refresh, last_full_refresh))
+
+
+    # ############################################
+    # Method store
+    # ############################################
+
+    def store(self, object_type, objectid, name):
+        '''
+        Save an object created by zabbix-cli
+        '''
+
+        with self.lock:
+            with self.connection:
+                self.connection.execute('INSERT OR REPLACE INTO entity VALUES (?, ?, ?, ?)',
+                                        (self.system_id, object_type, objectid, name))
+
+
+    # ############################################
+    # Method remove
+    # ############################################
+
+    def remove(self, object_type, objectid):
+        '''
+        Remove an object deleted by zabbix-cli
+        '''
+
+        with self.lock:
+            with self.connection:
+                self.connection.execute('DELETE FROM entity WHERE system_id = ? AND object_type = ? AND id = ?',
+                                        (self.system_id, object_type, objectid))
+
+
+    # ############################################
+    # Method clear
+    # ############################################
+
+    def clear(self):
+        '''
+        Remove all the saved maps of this system
+        '''
+
+        with self.lock:
+            with self.connection:
+                self.connection.execute('DELETE FROM entity WHERE system_id = ?', (self.system_id,))
+                self.connection.execute('DELETE FROM refresh WHERE system_id = ?', (self.system_id,))
+
+
+    # ############################################
+    # Method close
+    # ############################################
+
+    def close(self):
+        self.connection.close()
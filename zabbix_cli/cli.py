@@ -38,6 +38,7 @@ import json
 import xml.dom.minidom
 import glob
 import re
+import threading
 
 from zabbix_cli.config import *
 from zabbix_cli.logs import *
@@ -45,7 +46,9 @@ from zabbix_cli.logs import *
 from zabbix_cli.prettytable import *
 import zabbix_cli.version
 
-from zabbix_cli.pyzabbix import ZabbixAPI, ZabbixAPIException
+from zabbix_cli.pyzabbix import ZabbixAPI, ZabbixAPIException, api_stats
+from zabbix_cli.cache import EntityCache, EntityStore
+from zabbix_cli.events import read_events_cursor, save_events_cursor, get_last_eventids_in_file, remove_incomplete_line
 
 
 # ############################################
@@ -102,6 +105,14 @@ class zabbixcli(cmd.Cmd):
             
             # Bulk execution of commands (True|False)
             self.bulk_execution = False
+
+            # Journal of the bulk execution (BulkJournal|None)
+            self.journal = None
+
+            # Return code of the last feedback (done|warning|error|None).
+            # Kept per thread, the bulk executor runs commands in
+            # several threads with this instance.
+            self.feedback_state = threading.local()
             
             # SystemID show in prompt text
             self.system_id = self.conf.system_id
@@ -118,7 +129,16 @@ class zabbixcli(cmd.Cmd):
 
             zabbix_auth_token_file = os.getenv('HOME') + '/.zabbix-cli_auth_token'
 
-            self.zapi = ZabbixAPI(self.conf.zabbix_api_url)
+            self.zapi = ZabbixAPI(self.conf.zabbix_api_url,
+                                  thread_safe=True,
+                                  cache_ttl=self.conf.cache_ttl,
+                                  cache_size=self.conf.cache_size,
+                                  pool_connections=self.conf.pool_connections,
+                                  pool_maxsize=self.conf.pool_maxsize,
+                                  keep_alive=(self.conf.keep_alive == 'ON'),
+                                  compress_responses=(self.conf.compress_responses == 'ON'),
+                                  compress_requests=(self.conf.compress_requests == 'ON'),
+                                  compress_min_size=self.conf.compress_min_size)
             self.zapi.session.verify = True
 
             self.api_auth_token = self.zapi.login(self.api_username,self.api_password,self.api_auth_token)
@@ -143,25 +163,42 @@ class zabbixcli(cmd.Cmd):
                     self.logs.logger.info('API-auth-token file created.')
 
             #
-            # Populate the dictionary used as a cache with hostid and
-            # hostname data
+            # Open the persistent entity cache. The caches below are
+            # read from this file instead of the Zabbix-API when it
+            # is fresh enough. We continue without it if the file
+            # cannot be used.
             #
 
-            self.hostid_cache = self.populate_hostid_cache()
+            self.entity_store = None
 
-            #
-            # Populate the dictionary used as a cache with proxyid and
-            # proxy name data
-            #
+            if self.conf.entity_cache == 'ON':
+
+                try:
+                    self.entity_store = EntityStore(self.conf.entity_cache_file,
+                                                    self.system_id,
+                                                    self.zapi,
+                                                    ttl=self.conf.entity_cache_ttl,
+                                                    full_refresh=self.conf.entity_cache_full_refresh,
+                                                    shard_size=self.conf.get_shard_size,
+                                                    workers=self.conf.get_workers)
+
+                except Exception as e:
 
-            self.proxyid_cache = self.populate_proxyid_cache()
+                    if self.conf.logging == 'ON':
+                        self.logs.logger.error('Problems opening the entity cache %s - %s',self.conf.entity_cache_file,e)
 
             #
-            # Populate the dictionary used as a cache with hostgroupname and
-            # hostgroupid
+            # The caches (EntityCache) of hosts, proxies, hostgroups,
+            # ... are populated the first time they are used. See
+            # get_cache().
             #
 
-            self.hostgroupname_cache = self.populate_hostgroupname_cache()
+            self.caches = {}
+            self.cache_lock = threading.RLock()
+
+            # One lock per object type, held while its cache is
+            # populated
+            self.populate_locks = {}
 
         except Exception as e:        
             print '\n[ERROR]: ',e
@@ -469,60 +506,63 @@ class zabbixcli(cmd.Cmd):
         # Get result from Zabbix API
         #
 
-        try:
-            result = self.zapi.host.get(**query)
-        
-            if self.conf.logging == 'ON':
-                self.logs.logger.info('Command show_host executed.')
-
-        except Exception as e:
-
-            if self.conf.logging == 'ON':
-                self.logs.logger.error('Problems getting host information - %s',e)
-
-            self.generate_feedback('Error','Problems getting host information')
-            return False   
-
         #
-        # Get the columns we want to show from result 
+        # The hosts are fetched in shards and decoded host by host
+        # from the response stream, so we get the columns we want to
+        # show while we read them.
         #
 
-        for host in result:
+        try:
+            result = self.zapi.iter_get('host',
+                                        shard_size=self.conf.get_shard_size,
+                                        workers=self.conf.get_workers,
+                                        **query)
+
+            for host in result:
         
-            if self.output_format == 'json':
-                result_columns [result_columns_key] = {'hostid':host['hostid'],
-                                                       'host':host['host'],
-                                                       'groups':host['groups'],
-                                                       'templates':host['parentTemplates'],
-                                                       'zabbix_agent':self.get_zabbix_agent_status(int(host['available'])),
-                                                       'maintenance_status':self.get_maintenance_status(int(host['maintenance_status'])),
-                                                       'status':self.get_monitoring_status(int(host['status']))}
+                if self.output_format == 'json':
+                    result_columns [result_columns_key] = {'hostid':host['hostid'],
+                                                           'host':host['host'],
+                                                           'groups':host['groups'],
+                                                           'templates':host['parentTemplates'],
+                                                           'zabbix_agent':self.get_zabbix_agent_status(int(host['available'])),
+                                                           'maintenance_status':self.get_maintenance_status(int(host['maintenance_status'])),
+                                                           'status':self.get_monitoring_status(int(host['status']))}
 
-            else:
+                else:
                 
-                hostgroup_list = []
-                template_list = []
+                    hostgroup_list = []
+                    template_list = []
                 
-                host['groups'].sort()
-                host['parentTemplates'].sort()
+                    host['groups'].sort()
+                    host['parentTemplates'].sort()
                 
-                for hostgroup in host['groups']:
-                    hostgroup_list.append(hostgroup['name'])
+                    for hostgroup in host['groups']:
+                        hostgroup_list.append(hostgroup['name'])
                     
-                for template in host['parentTemplates']:
-                    template_list.append(template['name'])
+                    for template in host['parentTemplates']:
+                        template_list.append(template['name'])
                         
-                result_columns [result_columns_key] = {'1':host['hostid'],
-                                                       '2':host['host'],
-                                                       '3':'\n'.join(hostgroup_list),
-                                                       '4':'\n'.join(template_list),
-                                                       '5':self.get_zabbix_agent_status(int(host['available'])),
-                                                       '6':self.get_maintenance_status(int(host['maintenance_status'])),
-                                                       '7':self.get_monitoring_status(int(host['status']))}
+                    result_columns [result_columns_key] = {'1':host['hostid'],
+                                                           '2':host['host'],
+                                                           '3':'\n'.join(hostgroup_list),
+                                                           '4':'\n'.join(template_list),
+                                                           '5':self.get_zabbix_agent_status(int(host['available'])),
+                                                           '6':self.get_maintenance_status(int(host['maintenance_status'])),
+                                                           '7':self.get_monitoring_status(int(host['status']))}
 
+                result_columns_key = result_columns_key + 1
 
+            if self.conf.logging == 'ON':
+                self.logs.logger.info('Command show_host executed.')
 
-            result_columns_key = result_columns_key + 1
+        except Exception as e:
+
+            if self.conf.logging == 'ON':
+                self.logs.logger.error('Problems getting host information - %s',e)
+
+            self.generate_feedback('Error','Problems getting host information')
+            return False   
 
         #
         # Generate output
@@ -1050,6 +1090,7 @@ class zabbixcli(cmd.Cmd):
                     [filters]
                     [hostgroups]
                     [Last event unacknowledged]                    
+                    [--watch <seconds>]
 
         [description]
         -------------
@@ -1094,12 +1135,23 @@ class zabbixcli(cmd.Cmd):
 
         show_alarms *disk* "'host':'host.example.org','priority':'4'" * true
 
+
+        [--watch <seconds>]
+        -------------------
+        Show the alarms and keep watching them. The alarms are
+        checked every <seconds> seconds and only the new, changed
+        and cleared alarms are shown. With the JSON output format,
+        every change is printed as a JSON document in one line.
+
+        Only the triggers that changed since the last check are
+        fetched from the Zabbix-API. Press Ctrl-C to stop.
+
         '''
 
         result_columns = {}
         result_columns_key = 0
         filters = ''
-        hostgroup_list = []
+        watch_interval = 0
 
         try: 
             arg_list = shlex.split(args)
@@ -1108,6 +1160,26 @@ class zabbixcli(cmd.Cmd):
             print '\n[ERROR]: ',e,'\n'
             return False
 
+        #
+        # Watch mode
+        #
+
+        if '--watch' in arg_list:
+
+            index = arg_list.index('--watch')
+
+            try:
+                watch_interval = int(arg_list[index + 1])
+
+                if watch_interval <= 0:
+                    raise ValueError
+
+            except (IndexError, ValueError):
+                self.generate_feedback('Error','The --watch value must be a number of seconds > 0')
+                return False
+
+            del arg_list[index:index + 2]
+
         #
         # Command without parameters
         #
@@ -1147,73 +1219,17 @@ class zabbixcli(cmd.Cmd):
             return False
 
 
-        #
-        # Sanity check
-        #
-
-        if ack_filter in ['','true']:
-            ack_filter = ",'withLastEventUnacknowledged':'True'"
-        elif ack_filter in ['*','false']:
-            ack_filter = ""
-        else:
-            ack_filter = ",'withLastEventUnacknowledged':'True'"
-
-        if filters == '*':
-            filters = ''
-
-        if filters != '':
-            filters = ',' + filters
-
-        if hostgroups == '' or hostgroups == '*':
-            groupids = ''
-
-        else:
-        
-            #
-            # Generate a list with all hostgroupsIDs from the defined
-            # hostgroups
-            #
-    
-            for hostgroup in hostgroups.split(','):
-                
-                if hostgroup.isdigit() == True:
-                    hostgroup_list.append(hostgroup)
-                else:
-                    try:
-                        hostgroup_list.append(self.get_hostgroup_id(hostgroup.strip()))
-                    
-                    except Exception as e:
-            
-                        if self.conf.logging == 'ON':
-                            self.logs.logger.error('Problems getting the hostgroupID for %s - %s',hostgroup,e)
-
-                        self.generate_feedback('Error','Problems getting the hostgroupID for [' + hostgroup + ']')
-                        return False
-                    
-            groupids = "'groupids':['" + "','".join(hostgroup_list) + "']"
-        
-        #
-        # Generate query
-        #
-
-        try:
-            query=ast.literal_eval("{'selectHosts':'host'" + ack_filter + ",'search':{'description':'" + description + "'},'skipDependent':1,'monitored':1,'active':1,'output':'extend','expandDescription':1,'sortfield':'lastchange','sortorder':'DESC','searchWildcardsEnabled':'True','filter':{'value':'1'" + filters + "}," + groupids + "}")
-
-
-        except Exception as e:
-            
-            if self.conf.logging == 'ON':
-                self.logs.logger.error('Problems generating show_alarms query - %s',e)
+        query = self.get_alarms_query(description,filters,hostgroups,ack_filter,'show_alarms')
 
-            self.generate_feedback('Error','Problems generating show_alarms query')
+        if query == None:
             return False
 
 
-
         #
         # Get result from Zabbix API
         #
         try:
+            query_time = int(time.time())
             result = self.zapi.trigger.get(**query)
 
             if self.conf.logging == 'ON':
@@ -1228,17 +1244,32 @@ class zabbixcli(cmd.Cmd):
             return False   
 
         #
-        # Get the columns we want to show from result 
+        # With the JSON output format, the watch mode prints the
+        # alarms as changes, one JSON document per line.
+        #
+
+        if watch_interval > 0 and self.output_format == 'json':
+            return self.watch_alarms(query,result,query_time,watch_interval)
+
+        #
+        # Get the columns we want to show from result. The host
+        # names come with the triggers (selectHosts), we do not need
+        # an extra API call or the host cache for them.
         #
         for trigger in result:
 
             lastchange = datetime.datetime.fromtimestamp(int(trigger['lastchange']))
             age = datetime.datetime.now() - lastchange
 
+            if trigger['hosts'] != []:
+                hostname = trigger['hosts'][0]['name']
+            else:
+                hostname = ''
+
             if self.output_format == 'json':
 
                 result_columns [result_columns_key] = {'triggerid':trigger['triggerid'],
-                                                       'hostname':self.get_host_name(trigger['hosts'][0]['hostid']),
+                                                       'hostname':hostname,
                                                        'description':trigger['description'],
                                                        'severity':self.get_trigger_severity(int(trigger['priority'])),
                                                        'lastchange':str(lastchange),
@@ -1277,7 +1308,7 @@ class zabbixcli(cmd.Cmd):
                     ansi_end = ''
 
                 result_columns [result_columns_key] = {'1':trigger['triggerid'],
-                                                       '2':self.get_host_name(trigger['hosts'][0]['hostid']),
+                                                       '2':hostname,
                                                        '3':'\n  '.join(textwrap.wrap("* " + trigger['description'],62)),
                                                        '4':ansi_code + self.get_trigger_severity(int(trigger['priority'])).upper() + ansi_end,
                                                        '5':str(lastchange),
@@ -1294,31 +1325,215 @@ class zabbixcli(cmd.Cmd):
                              ['TriggerID'],
                              FRAME)
 
+        if watch_interval > 0:
+            return self.watch_alarms(query,result,query_time,watch_interval)
+
 
     # ############################################
-    # Method do_add_host_to_hostgroup
+    # Method watch_alarms
     # ############################################
 
-    def do_add_host_to_hostgroup(self,args):
+    def watch_alarms(self,query,result,query_time,watch_interval):
         '''
         DESCRIPTION:
-        This command adds one/several hosts to
-        one/several hostgroups
+        Watch mode of show_alarms. Poll the Zabbix-API every
+        watch_interval seconds for the triggers changed since the
+        last poll and print the new, changed and cleared alarms.
+
+        query is the trigger.get query of show_alarms, result the
+        alarms already shown and query_time the time of this query.
+        '''
+
+        #
+        # The triggers changed since the last poll are fetched with
+        # lastChangeSince. We ask from one second before the most
+        # recent change we have seen (the watermark): a trigger can
+        # change in the same second after we polled. The triggers
+        # we have already seen are recognized by (triggerID, last
+        # change) and ignored.
+        #
+        # The first watermark is the time of the show_alarms query,
+        # nothing older than that has to be fetched again even if
+        # there were no alarms.
+        #
+        # Cleared alarms (trigger value OK) have to be returned too,
+        # so the delta query does not filter by trigger value. The
+        # filter on the last event being unacknowledged is applied
+        # here, with the lastEvent of the triggers.
+        #
+        # Alarms acknowledged, disabled or deleted without a change
+        # of the trigger state are not detected.
+        #
+
+        alarms = {}
+        seen = set()
+        watermark = query_time
+
+        for trigger in result:
+            alarms[trigger['triggerid']] = trigger
+            seen.add((trigger['triggerid'],trigger['lastchange']))
+            watermark = max(watermark,int(trigger['lastchange']))
+
+        if self.output_format == 'json':
+
+            for trigger in sorted(result,key=lambda trigger: int(trigger['lastchange'])):
+                self.print_alarm_change('new',trigger)
+
+        unacknowledged_only = 'withLastEventUnacknowledged' in query
+
+        delta_query = dict(query)
+        delta_query.pop('withLastEventUnacknowledged',None)
+        delta_query['filter'] = dict(query.get('filter',{}))
+        delta_query['filter'].pop('value',None)
+        delta_query['output'] = list(query['output']) + ['value']
+        delta_query['sortfield'] = 'lastchange'
+        delta_query['sortorder'] = 'ASC'
+
+        if unacknowledged_only:
+            delta_query['selectLastEvent'] = ['acknowledged']
+
+        try:
+            while True:
+
+                time.sleep(watch_interval)
+
+                delta_query['lastChangeSince'] = watermark - 1
+
+                #
+                # do_request() bypasses the read cache of the API
+                # client, every poll has to reach the frontend.
+                #
+
+                try:
+                    data = self.zapi.do_request('trigger.get',delta_query)['result']
+
+                except Exception as e:
+
+                    if self.conf.logging == 'ON':
+                        self.logs.logger.error('Problems getting alarm changes - %s',e)
+
+                    if self.output_format != 'json':
+                        print '[Error]: Problems getting alarm changes - ' + str(e)
+
+                    continue
+
+                for trigger in data:
+
+                    key = (trigger['triggerid'],trigger['lastchange'])
+
+                    if key in seen:
+                        continue
+
+                    seen.add(key)
+                    watermark = max(watermark,int(trigger['lastchange']))
+
+                    problem = trigger['value'] == '1'
+
+                    if problem and unacknowledged_only and trigger.get('lastEvent'):
+                        problem = trigger['lastEvent'].get('acknowledged') != '1'
+
+                    if problem:
+
+                        if trigger['triggerid'] in alarms:
+                            change = 'changed'
+                        else:
+                            change = 'new'
+
+                        alarms[trigger['triggerid']] = trigger
+
+                    elif trigger['triggerid'] in alarms:
+                        change = 'cleared'
+                        del alarms[trigger['triggerid']]
+
+                    else:
+                        continue
+
+                    self.print_alarm_change(change,trigger)
+
+                # Only the changes around the watermark can come again
+                seen = set(key for key in seen if int(key[1]) >= watermark - 1)
+
+                sys.stdout.flush()
+
+        except KeyboardInterrupt:
+
+            if self.output_format != 'json':
+                print '\n[Done]: Watching alarms stopped. ' + str(len(alarms)) + ' active alarms.\n'
+
+
+    # ############################################
+    # Method print_alarm_change
+    # ############################################
+
+    def print_alarm_change(self,change,trigger):
+        '''
+        DESCRIPTION:
+        Print a change of an alarm in the watch mode of show_alarms
+        '''
+
+        lastchange = datetime.datetime.fromtimestamp(int(trigger['lastchange']))
+
+        if trigger['hosts'] != []:
+            hostname = trigger['hosts'][0]['name']
+        else:
+            hostname = ''
+
+        if self.output_format == 'json':
+            print json.dumps({'change':change,
+                              'triggerid':trigger['triggerid'],
+                              'hostname':hostname,
+                              'description':trigger['description'],
+                              'severity':self.get_trigger_severity(int(trigger['priority'])),
+                              'lastchange':str(lastchange)},
+                             sort_keys=True)
+
+        else:
+            print '[' + change.title() + '] ' + str(lastchange) + ' | ' + trigger['triggerid'] + ' | ' + hostname + ' | ' + self.get_trigger_severity(int(trigger['priority'])).upper() + ' | ' + trigger['description']
+
+
+    # ############################################
+    # Method do_acknowledge_alarms
+    # ############################################
+
+    def do_acknowledge_alarms(self,args):
+        '''
+        DESCRIPTION:
+        This command acknowledges the last event of all the active
+        alarms selected with the same parameters as show_alarms.
+        Only alarms with the last event unacknowledged are
+        considered.
 
         COMMAND:
-        add_host_to_hostgroup [hostnames]
-                              [hostgroups]
+        acknowledge_alarms [description]
+                           [filters]
+                           [hostgroups]
+                           [message]
 
+        [description]
+        -------------
+        Type of alarm description to search for. Leave this parameter
+        empty to search for all descriptions. One can also use wildcards.
 
-        [hostnames]
-        -----------
-        Hostnames or IDs.
-        One can define several values in a comma separated list.
+        [filters]
+        ---------
+        One can filter the alarms by host and priority. No wildcards 
+        can be used. See show_alarms.
 
         [hostgroups]
-        ------------
-        Hostgroup names or IDs.
-        One can define several values in a comma separated list.
+        -----------
+        One can filter the alarms from a particular hostgroup or
+        group og hostgroups. One can define several values in a
+        comma separated list.
+
+        [message]
+        ---------
+        Text of the acknowledgement.
+
+
+        e.g.: Acknowledge all the alarms from the hostgroup 'Linux'
+              that contain the word 'unreachable' in the description
+
+        acknowledge_alarms *unreachable* * Linux "Network outage in DC1"
 
         '''
 
@@ -1337,8 +1552,10 @@ class zabbixcli(cmd.Cmd):
 
             try:
                 print '--------------------------------------------------------'
-                hostnames = raw_input('# Hostnames: ').strip()
-                hostgroups = raw_input('# Hostgroups: ').strip()
+                description = raw_input('# Description []: ').strip()
+                filters = raw_input('# Filter []: ').strip()
+                hostgroups = raw_input('# Hostgroups []: ').strip()
+                message = raw_input('# Message []: ').strip()
                 print '--------------------------------------------------------'
 
             except Exception as e:
@@ -1350,10 +1567,12 @@ class zabbixcli(cmd.Cmd):
         # Command without filters attributes
         #
 
-        elif len(arg_list) == 2:
+        elif len(arg_list) == 4:
 
-            hostnames = arg_list[0].strip()
-            hostgroups = arg_list[1].strip()
+            description = arg_list[0].strip()
+            filters = arg_list[1].strip()
+            hostgroups = arg_list[2].strip()
+            message = arg_list[3].strip()
 
         #
         # Command with the wrong number of parameters
@@ -1367,230 +1586,225 @@ class zabbixcli(cmd.Cmd):
         # Sanity check
         #
 
-        if hostgroups == '':
-            self.generate_feedback('Error','Hostgroups information is empty')
+        if message == '':
+            self.generate_feedback('Error','Message value is empty')
             return False
 
-        if hostnames == '':
-            self.generate_feedback('Error','Hostnames information is empty')
+        query = self.get_alarms_query(description,filters,hostgroups,'true','acknowledge_alarms')
+
+        if query == None:
             return False
-        
+
+        #
+        # We only need the last event of every alarm. The triggers
+        # are fetched in shards, an alert storm can have thousands
+        # of them.
+        #
+
+        query.pop('selectHosts',None)
+        query.pop('expandDescription',None)
+        query.pop('sortfield',None)
+        query.pop('sortorder',None)
+
+        query['output'] = ['triggerid']
+        query['selectLastEvent'] = ['eventid','acknowledged']
+
         try:
-            
-            #
-            # Generate hosts and hostgroups IDs
-            #
-        
-            hostgroups_list = []
-            hostnames_list = []
-            hostgroup_ids = ''
-            host_ids = ''
-            
-            for hostgroup in hostgroups.split(','):
+            eventids = set()
 
-                if hostgroup.isdigit():
-                    hostgroups_list.append('{"groupid":"' + str(hostgroup).strip() + '"}')
-                else:
-                    hostgroups_list.append('{"groupid":"' + str(self.get_hostgroup_id(hostgroup.strip())) + '"}')
+            for trigger in self.zapi.iter_get('trigger',
+                                              shard_size=self.conf.get_shard_size,
+                                              workers=self.conf.get_workers,
+                                              **query):
 
-            hostgroup_ids = ','.join(hostgroups_list)
+                event = trigger.get('lastEvent')
 
-            for hostname in hostnames.split(','):
+                if event and event.get('acknowledged') != '1':
+                    eventids.add(event['eventid'])
 
-                if hostname.isdigit():
-                    hostnames_list.append('{"hostid":"' + str(hostname).strip() + '"}')
-                else:
-                    hostnames_list.append('{"hostid":"' + str(self.get_host_id(hostname.strip())) + '"}')
-        
-            host_ids = ','.join(hostnames_list)
+        except Exception as e:
 
-            #
-            # Generate zabbix query
-            #
-   
-            query=ast.literal_eval("{\"groups\":[" + hostgroup_ids + "],\"hosts\":[" + host_ids + "]}")
-   
-            #
-            # Add hosts to hostgroups
-            #
-
-            result = self.zapi.hostgroup.massadd(**query)
+            if self.conf.logging == 'ON':
+                self.logs.logger.error('Problems getting alarm information - %s',e)
 
-            self.generate_feedback('Done','Hosts ' + hostnames + ' (' + host_ids + ') added to these groups: ' + hostgroups + ' (' + hostgroup_ids + ')')
+            self.generate_feedback('Error','Problems getting alarm information')
+            return False   
 
-            if self.conf.logging == 'ON':
-                self.logs.logger.info('Hosts: %s (%s) added to these groups: %s (%s)',hostnames,host_ids,hostgroups,hostgroup_ids)
+        eventids = sorted(eventids,key=int)
 
-        except Exception as e:
+        if eventids == []:
+            self.generate_feedback('Done','No alarms to acknowledge')
+            return True
 
-            if self.conf.logging == 'ON':
-                    self.logs.logger.error('Problems adding hosts %s (%s) to groups %s (%s) - %s',hostnames,host_ids,hostgroups,hostgroup_ids,e)
-           
-            self.generate_feedback('Error','Problems adding hosts ' + hostnames + ' (' + host_ids + ') to groups ' + hostgroups + ' (' + hostgroup_ids + ')')
-            return False   
-            
+        #
+        # The events are acknowledged with one event.acknowledge
+        # call per bulk_chunk_size events. A chunk that fails is
+        # reported and we continue with the next one.
+        #
 
-    # ############################################
-    # Method do_remove_host_from_hostgroup
-    # ############################################
+        chunk_size = max(1,self.conf.bulk_chunk_size)
+        acknowledged = 0
+        failed = 0
+        start_time = time.time()
 
-    def do_remove_host_from_hostgroup(self,args):
-        '''
-        DESCRIPTION:
-        This command removes one/several hosts from
-        one/several hostgroups
+        for index in range(0,len(eventids),chunk_size):
 
-        COMMAND:
-        remove_host_from_hostgroup [hostnames]
-                                   [hostgroups]
+            chunk = eventids[index:index + chunk_size]
 
-        [hostnames]
-        -----------
-        Hostnames or IDs.
-        One can define several values in a comma separated list.
+            try:
+                self.zapi.event.acknowledge(eventids=chunk,message=message)
+                acknowledged = acknowledged + len(chunk)
 
-        [hostgroups]
-        ------------
-        Hostgroup names or IDs.
-        One can define several values in a comma separated list.
+            except Exception as e:
+                failed = failed + len(chunk)
 
-        '''
+                if self.conf.logging == 'ON':
+                    self.logs.logger.error('Problems acknowledging events %s-%s - %s',chunk[0],chunk[-1],e)
 
-        try: 
-            arg_list = shlex.split(args)
-            
-        except ValueError as e:
-            print '\n[ERROR]: ',e,'\n'
-            return False
+                if self.output_format == 'table':
+                    print '[Error]: Problems acknowledging events ' + chunk[0] + '-' + chunk[-1] + ' - ' + str(e)
 
-        #
-        # Command without parameters
-        #
+            elapsed = time.time() - start_time
 
-        if len(arg_list) == 0:
+            if self.output_format == 'table':
+                print '[OK] ' + str(acknowledged + failed) + '/' + str(len(eventids)) + ' events processed (' + '%.1f' % (acknowledged / max(elapsed,0.001)) + ' events/s)'
+                sys.stdout.flush()
 
-            try:
-                print '--------------------------------------------------------'
-                hostnames = raw_input('# Hostnames: ').strip()
-                hostgroups = raw_input('# Hostgroups: ').strip()
-                print '--------------------------------------------------------'
+        elapsed = time.time() - start_time
 
-            except Exception as e:
-                print '\n--------------------------------------------------------' 
-                print '\n[Aborted] Command interrupted by the user.\n'
-                return False   
+        if self.conf.logging == 'ON':
+            self.logs.logger.info('%s events acknowledged (%s failed) in %.1f seconds',acknowledged,failed,elapsed)
 
-        #
-        # Command with parameters
-        #
+        if failed > 0:
+            self.generate_feedback('Error',str(acknowledged) + ' events acknowledged, ' + str(failed) + ' events could not be acknowledged')
+            return False
 
-        elif len(arg_list) == 2:
+        self.generate_feedback('Done',str(acknowledged) + ' events acknowledged in ' + '%.1f' % elapsed + ' seconds (' + '%.1f' % (acknowledged / max(elapsed,0.001)) + ' events/s)')
 
-            hostnames = arg_list[0].strip()
-            hostgroups = arg_list[1].strip()
 
-        #
-        # Command with the wrong number of parameters
-        #
+    # ############################################
+    # Method get_alarms_query
+    # ############################################
 
-        else:
-            self.generate_feedback('ERROR',' Wrong number of parameters used.\n          Type help or \? to list commands')
-            return False
+    def get_alarms_query(self,description,filters,hostgroups,ack_filter,command):
+        '''
+        DESCRIPTION:
+        Return the trigger.get query of the active alarms selected
+        by the description, filters, hostgroups and 'last event
+        unacknowledged' parameters of show_alarms. Return None if
+        the query cannot be generated (the error feedback has been
+        generated).
+        '''
 
         #
         # Sanity check
         #
 
-        if hostgroups == '':
-            
-            self.generate_feedback('Error','Hostgroups information is empty')
-            return False
-
-        if hostnames == '':
-            self.generate_feedback('Error','Hostnames information is empty')
-            return False
-        
-        try:
-
-            #
-            # Generate hosts and hostgroups IDs
-            #
-        
-            hostgroups_list = []
-            hostnames_list = []
-            hostgroup_ids = ''
-            host_ids = ''
-
-            for hostgroup in hostgroups.split(','):
+        hostgroup_list = []
 
-                if hostgroup.isdigit():
-                    hostgroups_list.append(str(hostgroup).strip())
-                else:
-                    hostgroups_list.append(str(self.get_hostgroup_id(hostgroup.strip())))
+        if ack_filter in ['','true']:
+            ack_filter = ",'withLastEventUnacknowledged':'True'"
+        elif ack_filter in ['*','false']:
+            ack_filter = ""
+        else:
+            ack_filter = ",'withLastEventUnacknowledged':'True'"
 
-            hostgroup_ids = ','.join(hostgroups_list)
+        if filters == '*':
+            filters = ''
 
-            for hostname in hostnames.split(','):
+        if filters != '':
+            filters = ',' + filters
 
-                if hostname.isdigit():
-                    hostnames_list.append(str(hostname).strip())
-                else:
-                    hostnames_list.append(str(self.get_host_id(hostname.strip())))
-        
-            host_ids = ','.join(hostnames_list)
+        if hostgroups == '' or hostgroups == '*':
+            groupids = ''
 
-            #
-            # Generate zabbix query
-            #
-            query=ast.literal_eval("{\"groupids\":[" + hostgroup_ids + "],\"hostids\":[" + host_ids + "]}")
+        else:
         
             #
-            # Remove hosts from hostgroups
+            # Generate a list with all hostgroupsIDs from the defined
+            # hostgroups
             #
+    
+            try:
+                hostgroup_list = self.resolve_ids('hostgroup',hostgroups.split(','),accept_ids=True)
+                    
+            except Exception as e:
             
-            result = self.zapi.hostgroup.massremove(**query)
+                if self.conf.logging == 'ON':
+                    self.logs.logger.error('Problems getting the hostgroupIDs for %s - %s',hostgroups,e)
 
-            if self.conf.logging == 'ON':
-                self.logs.logger.info('Hosts: %s (%s) removed from these groups: %s (%s)',hostnames,host_ids,hostgroups,hostgroup_ids)
+                self.generate_feedback('Error','Problems getting the hostgroupIDs for [' + hostgroups + '] - ' + str(e))
+                return None
+                    
+            groupids = "'groupids':['" + "','".join(hostgroup_list) + "']"
+        
+        #
+        # Generate query
+        #
+
+        try:
+            query=ast.literal_eval("{'selectHosts':['hostid','host','name']" + ack_filter + ",'search':{'description':'" + description + "'},'skipDependent':1,'monitored':1,'active':1,'output':['triggerid','description','priority','lastchange'],'expandDescription':1,'sortfield':'lastchange','sortorder':'DESC','searchWildcardsEnabled':'True','filter':{'value':'1'" + filters + "}," + groupids + "}")
 
-            self.generate_feedback('Done','Hosts ' + hostnames + ' (' + host_ids + ') removed from these groups: ' + hostgroups + ' (' + hostgroup_ids + ')')
 
         except Exception as e:
-           
+            
             if self.conf.logging == 'ON':
-                    self.logs.logger.error('Problems removing hosts %s (%s) from groups %s (%s) - %s',hostnames,host_ids,hostgroups,hostgroup_ids,e)
+                self.logs.logger.error('Problems generating %s query - %s',command,e)
 
-            self.generate_feedback('Error','Problems removing hosts ' + hostnames + ' (' + host_ids + ') from groups (' + hostgroups + ' (' + hostgroup_ids + ')' )
-            return False   
+            self.generate_feedback('Error','Problems generating ' + command + ' query')
+            return None
+
+        return query
 
 
     # ############################################
-    # Method do_add_user_to_usergroup
+    # Method do_tail_events
     # ############################################
 
-    def do_add_user_to_usergroup(self,args):
+    def do_tail_events(self,args):
         '''
         DESCRIPTION:
-        This command adds one/several users to
-        one/several usergroups
+        This command shows the trigger events generated since the
+        last time it was executed, one JSON document per event and
+        line (NDJSON).
+
+        The events shown are saved in a cursor file, the next
+        execution continues after them. The first execution (without
+        a cursor file) starts after the most recent event in the
+        system.
+
+        The events of the last events_settle_time seconds are read
+        again, the Zabbix server can make an event visible after
+        events with a higher ID.
 
         COMMAND:
-        add_user_to_usergroup [usernames]
-                              [usergroups]
+        tail_events [cursor file]
+                    [output file]
+                    [interval]
 
+        [cursor file]
+        -------------
+        File with the events shown. Default: the
+        value of events_cursor_file in zabbix-cli.conf.
 
-        [usernames]
-        -----------
-        Usernames or IDs.
-        One can define several values in a comma separated list.
+        [output file]
+        -------------
+        File where the events are appended. Default: '-' (standard
+        output).
 
-        [usergroups]
-        ------------
-        Usergroup names or IDs.
-        One can define several values in a comma separated list.
+        [interval]
+        ----------
+        0 (default): Show the new events and exit. 
+
+        > 0: Keep checking for new events every [interval]
+        seconds. Press Ctrl-C to stop.
 
         '''
 
+        cursor_file = ''
+        output_file = '-'
+        interval = '0'
+
         try: 
             arg_list = shlex.split(args)
             
@@ -1598,257 +1812,300 @@ class zabbixcli(cmd.Cmd):
             print '\n[ERROR]: ',e,'\n'
             return False
 
-        #
-        # Command without parameters
-        #
+        if len(arg_list) > 3:
+            self.generate_feedback('Error',' Wrong number of parameters used.\n          Type help or \? to list commands')
+            return False
 
-        if len(arg_list) == 0:
+        if len(arg_list) > 0:
+            cursor_file = arg_list[0].strip()
 
-            try:
-                print '--------------------------------------------------------'
-                usernames = raw_input('# Usernames: ').strip()
-                usergroups = raw_input('# Usergroups: ').strip()
-                print '--------------------------------------------------------'
+        if len(arg_list) > 1:
+            output_file = arg_list[1].strip()
 
-            except Exception as e:
-                print '\n--------------------------------------------------------' 
-                print '\n[Aborted] Command interrupted by the user.\n'
-                return False   
+        if len(arg_list) > 2:
+            interval = arg_list[2].strip()
 
         #
-        # Command without filters attributes
+        # Sanity check
         #
 
-        elif len(arg_list) == 2:
-
-            usernames = arg_list[0].strip()
-            usergroups = arg_list[1].strip()
+        if cursor_file == '':
+            cursor_file = self.conf.events_cursor_file
 
-        #
-        # Command with the wrong number of parameters
-        #
+        if output_file == '':
+            output_file = '-'
 
-        else:
-            self.generate_feedback('Error',' Wrong number of parameters used.\n          Type help or \? to list commands')
+        if interval.isdigit() == False:
+            self.generate_feedback('Error','Interval value is not valid')
             return False
 
+        interval = int(interval)
+
         #
-        # Sanity check
+        # Where to start: after the event in the cursor file. The
+        # events written to the output file after the cursor was
+        # saved for the last time (we died before saving it) are
+        # not written again. They are at most one page.
         #
 
-        if usergroups == '':
-            
-            self.generate_feedback('Error','Usergroups value is empty')
-            return False
-
-        if usernames == '':
-            self.generate_feedback('Error','Usernames value is empty')
-            return False
-        
         try:
-            
-            #
-            # Generate users and usergroups IDs
-            #
-        
-            usergroups_list = []
-            usernames_list = []
-            
-            for usergroup in usergroups.split(','):
+            (last_eventid,seen) = read_events_cursor(cursor_file)
 
-                if usergroup.isdigit():
-                    usergroups_list.append(str(usergroup).strip())
-                else:
-                    usergroups_list.append(str(self.get_usergroup_id(usergroup.strip())))
+            if output_file != '-':
+                file_eventids = get_last_eventids_in_file(output_file,self.conf.get_shard_size)
 
-            for username in usernames.split(','):
+                if last_eventid == 0 and file_eventids != []:
+                    last_eventid = max(file_eventids)
 
-                if username.isdigit():
-                    usernames_list.append(str(username).strip())
-                else:
-                    usernames_list.append(str(self.get_user_id(username.strip())))
-        
+                seen.update(eventid for eventid in file_eventids if eventid > last_eventid)
 
-            #
-            # Add users to usergroups
-            #
+            if last_eventid == 0:
 
-            result = self.zapi.usergroup.massadd(usrgrpids=usergroups_list,userids=usernames_list)
+                data = self.zapi.do_request('event.get',{'output':['eventid'],
+                                                         'source':0,
+                                                         'object':0,
+                                                         'sortfield':'eventid',
+                                                         'sortorder':'DESC',
+                                                         'limit':1})['result']
 
-            self.generate_feedback('Done','Users ' + usernames + ' added to these usergroups: ' + usergroups)
+                if data != []:
+                    last_eventid = int(data[0]['eventid'])
 
-            if self.conf.logging == 'ON':
-                self.logs.logger.info('Users: %s added to these usergroups: %s',usernames,usergroups)
+                save_events_cursor(cursor_file,last_eventid,seen)
 
         except Exception as e:
 
             if self.conf.logging == 'ON':
-                    self.logs.logger.error('Problems adding users %s to usergroups %s - %s',usernames,usergroups,e)
-           
-            self.generate_feedback('Error','Problems adding users ' + usernames + ' to usergroups ' + usergroups)
-            return False   
+                self.logs.logger.error('Problems getting the last event shown - %s',e)
 
+            self.generate_feedback('Error','Problems getting the last event shown - ' + str(e))
+            return False
 
-    # ############################################
-    # Method do_add_user_to_usergroup
-    # ############################################
+        if output_file == '-':
+            output = sys.stdout
+        else:
+            output = open(output_file,'a+')
 
-    def do_remove_user_from_usergroup(self,args):
-        '''
-        DESCRIPTION:
-        This command removes an user from
-        one/several usergroups
+            # An incomplete event at the end of the file is written
+            # again.
+            remove_incomplete_line(output)
 
-        COMMAND:
-        add_user_to_usergroup [username]
-                              [usergroups]
+        total_events = 0
+        newest_eventid = max([last_eventid] + list(seen))
 
+        try:
+            while True:
 
-        [username]
-        -----------
-        Username to remove
+                try:
+                    (events,last_eventid,seen) = self.tail_events_poll(last_eventid,seen,output,cursor_file)
 
-        [usergroups]
-        ------------
-        Usergroup names from where the username will be removed.  One
-        can define several values in a comma separated list.
+                    total_events = total_events + events
+                    newest_eventid = max([newest_eventid] + list(seen))
 
-        '''
+                except Exception as e:
 
-        try: 
-            arg_list = shlex.split(args)
-            
-        except ValueError as e:
-            print '\n[ERROR]: ',e,'\n'
+                    if self.conf.logging == 'ON':
+                        self.logs.logger.error('Problems getting events after eventID %s - %s',last_eventid,e)
+
+                    if interval == 0:
+                        raise
+
+                if interval == 0:
+                    break
+
+                time.sleep(interval)
+
+        except KeyboardInterrupt:
+            pass
+
+        except Exception as e:
+
+            if output_file != '-':
+                output.close()
+
+            self.generate_feedback('Error','Problems getting events after eventID ' + str(last_eventid) + ' - ' + str(e))
             return False
 
-        #
-        # Command without parameters
-        #
+        if self.conf.logging == 'ON':
+            self.logs.logger.info('%s events shown, last eventID: %s',total_events,newest_eventid)
 
-        if len(arg_list) == 0:
+        if output_file != '-':
+            output.close()
+            self.generate_feedback('Done',str(total_events) + ' events written to ' + output_file + '. Last eventID: ' + str(newest_eventid))
 
-            try:
-                print '--------------------------------------------------------'
-                username = raw_input('# Username: ').strip()
-                usergroups = raw_input('# Usergroups: ').strip()
-                print '--------------------------------------------------------'
 
-            except Exception as e:
-                print '\n--------------------------------------------------------' 
-                print '\n[Aborted] Command interrupted by the user.\n'
-                return False   
+    # ############################################
+    # Method tail_events_poll
+    # ############################################
+
+    def tail_events_poll(self,last_eventid,seen,output,cursor_file):
+        '''
+        DESCRIPTION:
+        Write to output the trigger events after last_eventid that
+        are not in seen, and save the cursor. Return (number of
+        events written, new last_eventid, new seen).
+        '''
 
         #
-        # Command without filters attributes
+        # Events are not committed in eventID order by the Zabbix
+        # server (history syncers work in parallel), an event can
+        # become visible after events with a higher ID. We read
+        # again all the events after last_eventid and only write the
+        # ones not seen yet.
+        #
+        # last_eventid only moves forward to the events older than
+        # events_settle_time seconds (compared to the newest event),
+        # so this window is small.
         #
 
-        elif len(arg_list) == 2:
+        eventid_from = last_eventid + 1
+        events = []
+        written = 0
 
-            username = arg_list[0].strip()
-            usergroups = arg_list[1].strip()
+        while True:
 
-        #
-        # Command with the wrong number of parameters
-        #
+            # do_request() bypasses the read cache of the API client.
 
-        else:
-            self.generate_feedback('Error',' Wrong number of parameters used.\n          Type help or \? to list commands')
-            return False
+            data = self.zapi.do_request('event.get',{'output':['eventid','clock','value','acknowledged','objectid'],
+                                                     'source':0,
+                                                     'object':0,
+                                                     'eventid_from':eventid_from,
+                                                     'sortfield':'eventid',
+                                                     'sortorder':'ASC',
+                                                     'limit':self.conf.get_shard_size,
+                                                     'selectHosts':['hostid'],
+                                                     'selectRelatedObject':['description','priority']})['result']
+
+            lines = []
+
+            for event in data:
+
+                eventid = int(event['eventid'])
+                events.append((eventid,int(event['clock'])))
+
+                if eventid in seen:
+                    continue
+
+                lines.append(self.format_event(event))
+                seen.add(eventid)
+
+            if lines != []:
+                output.write(''.join(lines))
+                output.flush()
+
+                if output != sys.stdout:
+                    os.fsync(output.fileno())
+
+                save_events_cursor(cursor_file,last_eventid,seen)
+                written = written + len(lines)
+
+            #
+            # A full page means there are more events waiting
+            #
+
+            if len(data) < self.conf.get_shard_size:
+                break
+
+            eventid_from = int(data[-1]['eventid']) + 1
 
         #
-        # Sanity check
+        # All the events after last_eventid have been read, the ones
+        # old enough are settled.
         #
 
-        if usergroups == '':
-            
-            self.generate_feedback('Error','Usergroups value is empty')
-            return False
+        if events != []:
+            newest_clock = max(clock for (eventid,clock) in events)
+            settled = [eventid for (eventid,clock) in events if clock <= newest_clock - self.conf.events_settle_time]
 
-        if username == '':
-            self.generate_feedback('Error','Username value is empty')
-            return False
-        
-        user_to_remove = []
-        user_to_remove.append(username)
+            if settled != []:
+                last_eventid = max(settled)
+                seen = set(eventid for eventid in seen if eventid > last_eventid)
 
-        try:
-            
-            for usergroup in usergroups.split(','):
-                
-                usergroup = usergroup.strip()
-                usernames_list_orig = []
-                usernames_list_final = []
-                usernameids_list_final = []
+        save_events_cursor(cursor_file,last_eventid,seen)
 
-                #
-                # Get list with users to keep in this  usergroup
-                #
+        return (written,last_eventid,seen)
 
-                result = self.zapi.usergroup.get(output='extend',
-                                                 search={'name':usergroup},
-                                                 searchWildcardsEnabled=True,
-                                                 sortfield='name',
-                                                 sortorder='ASC',
-                                                 selectUsers=['alias'])
 
-                for users in result:
-                    for alias in users['users']:
-                        usernames_list_orig.append(alias['alias'])
-                    
-                usernames_list_final = list(set(usernames_list_orig) - set(user_to_remove))
-                
-                #
-                # Update usergroup with the new users list  
-                #
+    # ############################################
+    # Method format_event
+    # ############################################
 
-                usergroupid = self.get_usergroup_id(usergroup)
+    def format_event(self,event):
+        '''
+        DESCRIPTION:
+        Return an event from event.get as a JSON document in one
+        line
+        '''
+
+        #
+        # Host names from the host cache, only the hosts not in the
+        # cache cost an API call.
+        #
 
-                for user in usernames_list_final:
-                    usernameids_list_final.append(self.get_user_id(user))
+        hostids = [host['hostid'] for host in event.get('hosts',[])]
+        hostnames = []
+
+        for hostid in hostids:
+            try:
+                hostnames.append(self.get_host_name(hostid))
+
+            except Exception as e:
 
-                result = self.zapi.usergroup.update(usrgrpid=usergroupid,userids=usernameids_list_final)
-                
-                self.generate_feedback('Done','User ' + username + ' removed from this usergroup: ' + usergroup)
-                
                 if self.conf.logging == 'ON':
-                    self.logs.logger.info('User: %s removed from this usergroup: %s',username,usergroup)
+                    self.logs.logger.error('Problems getting the host name of hostID %s - %s',hostid,e)
 
-        except Exception as e:
+                hostnames.append('')
 
-            if self.conf.logging == 'ON':
-                    self.logs.logger.error('Problems removing user %s from usergroups %s - %s',username,usergroups,e)
-           
-            self.generate_feedback('Error','Problems removing user ' + username + ' from usergroups ' + usergroups)
-            return False   
+        trigger = event.get('relatedObject') or {}
+
+        if trigger.get('priority') != None:
+            severity = self.get_trigger_severity(int(trigger['priority']))
+        else:
+            severity = 'Unknown'
+
+        if event['value'] == '1':
+            status = 'PROBLEM'
+        else:
+            status = 'OK'
+
+        return json.dumps({'eventid':event['eventid'],
+                           'clock':int(event['clock']),
+                           'time':str(datetime.datetime.fromtimestamp(int(event['clock']))),
+                           'status':status,
+                           'acknowledged':event.get('acknowledged') == '1',
+                           'triggerid':event['objectid'],
+                           'description':trigger.get('description',''),
+                           'severity':severity,
+                           'hostids':hostids,
+                           'hostnames':hostnames},
+                          sort_keys=True) + '\n'
 
-            
 
     # ############################################
-    # Method do_link_template_to_host
+    # Method do_add_host_to_hostgroup
     # ############################################
 
-    def do_link_template_to_host(self,args):
+    def do_add_host_to_hostgroup(self,args):
         '''
         DESCRIPTION:
-        This command links one/several templates to
-        one/several hosts
+        This command adds one/several hosts to
+        one/several hostgroups
 
         COMMAND:
-        link_template_to_host [templates]
-                              [hostnames]
-
+        add_host_to_hostgroup [hostnames]
+                              [hostgroups]
 
-        [templates]
-        ------------
-        Template names or IDs.
-        One can define several values in a comma separated list.
 
         [hostnames]
         -----------
         Hostnames or IDs.
         One can define several values in a comma separated list.
 
+        [hostgroups]
+        ------------
+        Hostgroup names or IDs.
+        One can define several values in a comma separated list.
+
         '''
 
         try: 
@@ -1866,8 +2123,8 @@ class zabbixcli(cmd.Cmd):
 
             try:
                 print '--------------------------------------------------------'
-                templates = raw_input('# Templates: ').strip()
                 hostnames = raw_input('# Hostnames: ').strip()
+                hostgroups = raw_input('# Hostgroups: ').strip()
                 print '--------------------------------------------------------'
 
             except Exception as e:
@@ -1881,23 +2138,23 @@ class zabbixcli(cmd.Cmd):
 
         elif len(arg_list) == 2:
 
-            templates = arg_list[0].strip()
-            hostnames = arg_list[1].strip()
+            hostnames = arg_list[0].strip()
+            hostgroups = arg_list[1].strip()
 
         #
         # Command with the wrong number of parameters
         #
 
         else:
-            self.generate_feedback('ERROR',' Wrong number of parameters used.\n          Type help or \? to list commands')
+            self.generate_feedback('Error',' Wrong number of parameters used.\n          Type help or \? to list commands')
             return False
 
         #
         # Sanity check
         #
 
-        if templates == '':            
-            self.generate_feedback('Error','Templates information is empty')
+        if hostgroups == '':
+            self.generate_feedback('Error','Hostgroups information is empty')
             return False
 
         if hostnames == '':
@@ -1905,84 +2162,76 @@ class zabbixcli(cmd.Cmd):
             return False
         
         try:
-
+            
             #
-            # Generate templates and hosts IDs
+            # Generate hosts and hostgroups IDs
             #
-
-            templates_list = []
+        
+            hostgroups_list = []
             hostnames_list = []
-            template_ids = ''
+            hostgroup_ids = ''
             host_ids = ''
             
-            for template in templates.split(','):
-
-                if template.isdigit():
-                    templates_list.append('{"templateid":"' + str(template).strip() + '"}')
-                else:
-                    templates_list.append('{"templateid":"' + str(self.get_template_id(template.strip())) + '"}')
+            for hostgroupid in self.resolve_ids('hostgroup',hostgroups.split(','),accept_ids=True):
+                hostgroups_list.append('{"groupid":"' + hostgroupid + '"}')
 
-            template_ids = ','.join(templates_list)
-
-            for hostname in hostnames.split(','):
+            hostgroup_ids = ','.join(hostgroups_list)
 
-                if hostname.isdigit():
-                    hostnames_list.append('{"hostid":"' + str(hostname).strip() + '"}')
-                else:
-                    hostnames_list.append('{"hostid":"' + str(self.get_host_id(hostname.strip())) + '"}')
+            for hostid in self.resolve_ids('host',hostnames.split(','),accept_ids=True):
+                hostnames_list.append('{"hostid":"' + hostid + '"}')
         
             host_ids = ','.join(hostnames_list)
-            
+
             #
             # Generate zabbix query
             #
-
-            query=ast.literal_eval("{\"templates\":[" + template_ids + "],\"hosts\":[" + host_ids + "]}")
-        
+   
+            query=ast.literal_eval("{\"groups\":[" + hostgroup_ids + "],\"hosts\":[" + host_ids + "]}")
+   
             #
-            # Link templates to hosts
+            # Add hosts to hostgroups
             #
 
-            result = self.zapi.template.massadd(**query)
+            result = self.zapi.hostgroup.massadd(**query)
 
-            if self.conf.logging == 'ON':
-                self.logs.logger.info('Templates: %s (%s) linked to these hosts: %s (%s)',templates,template_ids,hostnames,host_ids)
+            self.generate_feedback('Done','Hosts ' + hostnames + ' (' + host_ids + ') added to these groups: ' + hostgroups + ' (' + hostgroup_ids + ')')
 
-            self.generate_feedback('Done','Templates ' + templates + ' (' + template_ids + ') linked to these hosts: ' + hostnames + ' (' + host_ids + ')')
+            if self.conf.logging == 'ON':
+                self.logs.logger.info('Hosts: %s (%s) added to these groups: %s (%s)',hostnames,host_ids,hostgroups,hostgroup_ids)
 
         except Exception as e:
 
             if self.conf.logging == 'ON':
-                    self.logs.logger.error('Problems linking templates %s (%s) to hosts %s (%s) - %s',templates,template_ids,hostnames,host_ids,e)
+                    self.logs.logger.error('Problems adding hosts %s (%s) to groups %s (%s) - %s',hostnames,host_ids,hostgroups,hostgroup_ids,e)
            
-            self.generate_feedback('Error','Problems linking templates ' + templates + ' (' + template_ids + ') to hosts ' + hostnames + ' (' + host_ids + ')')
+            self.generate_feedback('Error','Problems adding hosts ' + hostnames + ' (' + host_ids + ') to groups ' + hostgroups + ' (' + hostgroup_ids + ') - ' + str(e))
             return False   
-
+            
 
     # ############################################
-    # Method do_unlink_template_from_host
+    # Method do_remove_host_from_hostgroup
     # ############################################
 
-    def do_unlink_template_from_host(self,args):
+    def do_remove_host_from_hostgroup(self,args):
         '''
         DESCRIPTION:
-        This command unlink one/several templates from
-        one/several hosts
+        This command removes one/several hosts from
+        one/several hostgroups
 
         COMMAND:
-        unlink_template_from_host [templates]
-                                  [hostnames]
-
-        [templates]
-        ------------
-        Templates names or IDs.
-        One can define several values in a comma separated list.
+        remove_host_from_hostgroup [hostnames]
+                                   [hostgroups]
 
         [hostnames]
         -----------
         Hostnames or IDs.
         One can define several values in a comma separated list.
 
+        [hostgroups]
+        ------------
+        Hostgroup names or IDs.
+        One can define several values in a comma separated list.
+
         '''
 
         try: 
@@ -2000,8 +2249,8 @@ class zabbixcli(cmd.Cmd):
 
             try:
                 print '--------------------------------------------------------'
-                templates = raw_input('# Templates: ').strip()
                 hostnames = raw_input('# Hostnames: ').strip()
+                hostgroups = raw_input('# Hostgroups: ').strip()
                 print '--------------------------------------------------------'
 
             except Exception as e:
@@ -2010,127 +2259,103 @@ class zabbixcli(cmd.Cmd):
                 return False   
 
         #
-        # Command without filters attributes
+        # Command with parameters
         #
 
         elif len(arg_list) == 2:
 
-            templates = arg_list[0].strip()
-            hostnames = arg_list[1].strip()
+            hostnames = arg_list[0].strip()
+            hostgroups = arg_list[1].strip()
 
         #
         # Command with the wrong number of parameters
         #
 
         else:
-            self.generate_feedback('Error',' Wrong number of parameters used.\n          Type help or \? to list commands')
+            self.generate_feedback('ERROR',' Wrong number of parameters used.\n          Type help or \? to list commands')
             return False
 
         #
         # Sanity check
         #
 
-        if templates == '':
-            self.generate_feedback('Error','Templates information is empty')
+        if hostgroups == '':
+            
+            self.generate_feedback('Error','Hostgroups information is empty')
             return False
 
         if hostnames == '':
             self.generate_feedback('Error','Hostnames information is empty')
             return False
-
-
+        
         try:
 
             #
-            # Generate templates and hosts IDs
+            # Generate hosts and hostgroups IDs
             #
-
-            templates_list = []
+        
+            hostgroups_list = []
             hostnames_list = []
-            template_ids = ''
+            hostgroup_ids = ''
             host_ids = ''
 
-            for template in templates.split(','):
-
-                if template.isdigit():
-                    templates_list.append(str(template).strip())
-                else:
-                    templates_list.append(str(self.get_template_id(template.strip())))
-
-            template_ids = ','.join(templates_list)
-
-
-            for hostname in hostnames.split(','):
+            hostgroups_list = self.resolve_ids('hostgroup',hostgroups.split(','),accept_ids=True)
+            hostgroup_ids = ','.join(hostgroups_list)
 
-                if hostname.isdigit():
-                    hostnames_list.append(str(hostname).strip())
-                else:
-                    hostnames_list.append(str(self.get_host_id(hostname.strip())))
-        
+            hostnames_list = self.resolve_ids('host',hostnames.split(','),accept_ids=True)
             host_ids = ','.join(hostnames_list)
 
             #
             # Generate zabbix query
             #
-            
-            query=ast.literal_eval("{\"hostids\":[" + host_ids + "],\"templateids_clear\":[" + template_ids + "]}")
+            query=ast.literal_eval("{\"groupids\":[" + hostgroup_ids + "],\"hostids\":[" + host_ids + "]}")
         
             #
-            # Unlink templates from hosts
+            # Remove hosts from hostgroups
             #
-
-            result = self.zapi.host.massremove(**query)
+            
+            result = self.zapi.hostgroup.massremove(**query)
 
             if self.conf.logging == 'ON':
-                self.logs.logger.info('Templates: %s (%s) unlinked and cleared from these hosts: %s (%s)',templates,template_ids,hostnames,host_ids)
+                self.logs.logger.info('Hosts: %s (%s) removed from these groups: %s (%s)',hostnames,host_ids,hostgroups,hostgroup_ids)
 
-            self.generate_feedback('Done','Templates ' + templates + ' (' + template_ids + ') unlinked and cleared from these hosts: ' + hostnames + ' (' + host_ids + ')')
+            self.generate_feedback('Done','Hosts ' + hostnames + ' (' + host_ids + ') removed from these groups: ' + hostgroups + ' (' + hostgroup_ids + ')')
 
         except Exception as e:
-            
-            if self.conf.logging == 'ON':
-                    self.logs.logger.error('Problems unlinking and clearing templates %s (%s) from hosts %s (%s) - %s',templates,template_ids,hostnames,host_ids,e)
            
-            self.generate_feedback('Error','Problems unlinking and clearing templates ' + templates + ' (' + template_ids + ') from hosts ' + hostnames + ' (' + host_ids + ')')
+            if self.conf.logging == 'ON':
+                    self.logs.logger.error('Problems removing hosts %s (%s) from groups %s (%s) - %s',hostnames,host_ids,hostgroups,hostgroup_ids,e)
+
+            self.generate_feedback('Error','Problems removing hosts ' + hostnames + ' (' + host_ids + ') from groups (' + hostgroups + ' (' + hostgroup_ids + ') - ' + str(e))
             return False   
-            
+
 
     # ############################################
-    # Method do_create_usergroup
+    # Method do_add_user_to_usergroup
     # ############################################
 
-    def do_create_usergroup(self,args):
+    def do_add_user_to_usergroup(self,args):
         '''
         DESCRIPTION:
-        This command creates an usergroup.
+        This command adds one/several users to
+        one/several usergroups
 
         COMMAND:
-        create_usergroup [group name]
-                         [GUI access]
-                         [Status]
+        add_user_to_usergroup [usernames]
+                              [usergroups]
 
-        [group name]
-        ------------
-        Usergroup name
 
-        [GUI access]
-        ------------
-        0:'System default' [*]
-        1:'Internal'
-        2:'Disable'        
+        [usernames]
+        -----------
+        Usernames or IDs.
+        One can define several values in a comma separated list.
 
-        [Status]
-        --------
-        0:'Enable' [*]
-        1:'Disable'
+        [usergroups]
+        ------------
+        Usergroup names or IDs.
+        One can define several values in a comma separated list.
 
         '''
-        
-        # Default 0: System default
-        gui_access_default = '0'
-        
-        # Default 0: Enable
-        users_status_default = '0'
 
         try: 
             arg_list = shlex.split(args)
@@ -2147,9 +2372,8 @@ class zabbixcli(cmd.Cmd):
 
             try:
                 print '--------------------------------------------------------'
-                groupname = raw_input('# Name: ').strip()
-                gui_access = raw_input('# GUI access ['+ gui_access_default + ']: ').strip()
-                users_status = raw_input('# Status ['+ users_status_default + ']: ').strip()
+                usernames = raw_input('# Usernames: ').strip()
+                usergroups = raw_input('# Usergroups: ').strip()
                 print '--------------------------------------------------------'
 
             except Exception as e:
@@ -2161,11 +2385,10 @@ class zabbixcli(cmd.Cmd):
         # Command without filters attributes
         #
 
-        elif len(arg_list) == 3:
+        elif len(arg_list) == 2:
 
-            groupname = arg_list[0].strip()
-            gui_access = arg_list[1].strip()
-            users_status = arg_list[2].strip()
+            usernames = arg_list[0].strip()
+            usergroups = arg_list[1].strip()
 
         #
         # Command with the wrong number of parameters
@@ -2175,317 +2398,1242 @@ class zabbixcli(cmd.Cmd):
             self.generate_feedback('Error',' Wrong number of parameters used.\n          Type help or \? to list commands')
             return False
 
-
         #
         # Sanity check
         #
 
-        if gui_access == '' or gui_access not in ('0','1','2'):
-            gui_access = gui_access_default
-
-        if users_status == '' or users_status not in ('0','1'):
-            users_status = users_status_default
-
-        #
-        # Check if usergroup exists
-        #
+        if usergroups == '':
+            
+            self.generate_feedback('Error','Usergroups value is empty')
+            return False
 
+        if usernames == '':
+            self.generate_feedback('Error','Usernames value is empty')
+            return False
+        
         try:
             
-            result = self.usergroup_exists(groupname)
+            #
+            # Generate users and usergroups IDs
+            #
+        
+            usergroups_list = []
+            usernames_list = []
+            
+            usergroups_list = self.resolve_ids('usergroup',usergroups.split(','),accept_ids=True)
+            usernames_list = self.resolve_ids('user',usernames.split(','),accept_ids=True)
+        
+
+            #
+            # Add users to usergroups
+            #
+
+            result = self.zapi.usergroup.massadd(usrgrpids=usergroups_list,userids=usernames_list)
+
+            self.generate_feedback('Done','Users ' + usernames + ' added to these usergroups: ' + usergroups)
 
             if self.conf.logging == 'ON':
-                self.logs.logger.debug('Cheking if usergroup (%s) exists',groupname)
+                self.logs.logger.info('Users: %s added to these usergroups: %s',usernames,usergroups)
 
         except Exception as e:
 
             if self.conf.logging == 'ON':
-                self.logs.logger.error('Problems checking if usergroup (%s) exists - %s',groupname,e)
-                
-            self.generate_feedback('Error','Problems checking if usergroup (' + groupname + ') exists')
+                    self.logs.logger.error('Problems adding users %s to usergroups %s - %s',usernames,usergroups,e)
+           
+            self.generate_feedback('Error','Problems adding users ' + usernames + ' to usergroups ' + usergroups + ' - ' + str(e))
             return False   
-        
+
+
+    # ############################################
+    # Method do_add_user_to_usergroup
+    # ############################################
+
+    def do_remove_user_from_usergroup(self,args):
+        '''
+        DESCRIPTION:
+        This command removes an user from
+        one/several usergroups
+
+        COMMAND:
+        add_user_to_usergroup [username]
+                              [usergroups]
+
+
+        [username]
+        -----------
+        Username to remove
+
+        [usergroups]
+        ------------
+        Usergroup names from where the username will be removed.  One
+        can define several values in a comma separated list.
+
+        '''
+
+        try: 
+            arg_list = shlex.split(args)
+            
+        except ValueError as e:
+            print '\n[ERROR]: ',e,'\n'
+            return False
+
         #
-        # Create usergroup if it does not exist
+        # Command without parameters
         #
 
-        try:
+        if len(arg_list) == 0:
 
-            if result == True:
-                
-                if self.conf.logging == 'ON':
-                    self.logs.logger.debug('Usergroup (%s) already exists',groupname)
+            try:
+                print '--------------------------------------------------------'
+                username = raw_input('# Username: ').strip()
+                usergroups = raw_input('# Usergroups: ').strip()
+                print '--------------------------------------------------------'
 
-                self.generate_feedback('Warning','This usergroup (' + groupname + ') already exists.')
+            except Exception as e:
+                print '\n--------------------------------------------------------' 
+                print '\n[Aborted] Command interrupted by the user.\n'
                 return False   
+
+        #
+        # Command without filters attributes
+        #
+
+        elif len(arg_list) == 2:
+
+            username = arg_list[0].strip()
+            usergroups = arg_list[1].strip()
+
+        #
+        # Command with the wrong number of parameters
+        #
+
+        else:
+            self.generate_feedback('Error',' Wrong number of parameters used.\n          Type help or \? to list commands')
+            return False
+
+        #
+        # Sanity check
+        #
+
+        if usergroups == '':
+            
+            self.generate_feedback('Error','Usergroups value is empty')
+            return False
+
+        if username == '':
+            self.generate_feedback('Error','Username value is empty')
+            return False
+        
+        user_to_remove = []
+        user_to_remove.append(username)
+
+        try:
+            
+            for usergroup in usergroups.split(','):
                 
-            elif result == False:
-                result = self.zapi.usergroup.create(name=groupname,
-                                                    gui_access=gui_access,
-                                                    users_status=users_status)
+                usergroup = usergroup.strip()
+                usernames_list_orig = []
+                usernames_list_final = []
+                usernameids_list_final = []
+
+                #
+                # Get list with users to keep in this  usergroup
+                #
+
+                result = self.zapi.usergroup.get(output='extend',
+                                                 search={'name':usergroup},
+                                                 searchWildcardsEnabled=True,
+                                                 sortfield='name',
+                                                 sortorder='ASC',
+                                                 selectUsers=['alias'])
+
+                for users in result:
+                    for alias in users['users']:
+                        usernames_list_orig.append(alias['alias'])
+                    
+                usernames_list_final = list(set(usernames_list_orig) - set(user_to_remove))
                 
+                #
+                # Update usergroup with the new users list  
+                #
+
+                usergroupid = self.get_usergroup_id(usergroup)
+                usernameids_list_final = self.resolve_ids('user',usernames_list_final)
 
+                result = self.zapi.usergroup.update(usrgrpid=usergroupid,userids=usernameids_list_final)
+                
+                self.generate_feedback('Done','User ' + username + ' removed from this usergroup: ' + usergroup)
+                
                 if self.conf.logging == 'ON':
-                    self.logs.logger.info('Usergroup (%s) with ID: %s created',groupname,str(result['usrgrpids'][0]))
+                    self.logs.logger.info('User: %s removed from this usergroup: %s',username,usergroup)
 
-                self.generate_feedback('Done','Usergroup (' + groupname + ') with ID: ' + str(result['usrgrpids'][0]) + ' created.')
-        
         except Exception as e:
 
             if self.conf.logging == 'ON':
-                    self.logs.logger.error('Problems creating Usergroup (%s) - %s',groupname,e)
-
-            self.generate_feedback('Error','Problems creating usergroup (' + groupname + ')')
+                    self.logs.logger.error('Problems removing user %s from usergroups %s - %s',username,usergroups,e)
+           
+            self.generate_feedback('Error','Problems removing user ' + username + ' from usergroups ' + usergroups + ' - ' + str(e))
             return False   
+
             
 
     # ############################################
-    # Method do_create_host
+    # Method do_link_template_to_host
     # ############################################
 
-    def do_create_host(self,args):
+    def do_link_template_to_host(self,args):
         '''
         DESCRIPTION:
-        This command creates a host.
+        This command links one/several templates to
+        one/several hosts
 
         COMMAND:
-        create_host [hostname]
-                    [hostgroups]
-                    [proxy]
-                    [status]
+        link_template_to_host [templates]
+                              [hostnames]
 
-        [hostname]
-        ----------
-        Hostname
 
-        [hostgroups]
+        [templates]
         ------------
-        Hostgroup names or IDs. One can define several values in a
-        comma separated list.
+        Template names or IDs.
+        One can define several values in a comma separated list.
 
-        Remember that the host will get added to all hostgroups
-        defined with the parameter 'default_hostgroup' in the
-        zabbix-cli configuration file 'zabbix-cli.conf'
+        [hostnames]
+        -----------
+        Hostnames or IDs.
+        One can define several values in a comma separated list.
 
-        This command will fail if both 'default_hostgroup' and
-        [hostgroups] are empty.
+        '''
 
-        [proxy] 
-        ------- 
-        Proxy server used to monitor this host. One can use regular
-        expressions to define a group of proxy servers from where the
-        system will choose a random proxy.
+        try: 
+            arg_list = shlex.split(args)
+            
+        except ValueError as e:
+            print '\n[ERROR]: ',e,'\n'
+            return False
 
-        If this parameter is not defined, the system will assign a
-        random proxy from the list of all available proxies.
+        #
+        # Command without parameters
+        #
 
-        If the system does not have proxy servers defined, the new
-        host will be monitor by the Zabbix-server.
+        if len(arg_list) == 0:
 
-        e.g. Some regular expressions that can be used:
+            try:
+                print '--------------------------------------------------------'
+                templates = raw_input('# Templates: ').strip()
+                hostnames = raw_input('# Hostnames: ').strip()
+                print '--------------------------------------------------------'
+
+            except Exception as e:
+                print '\n--------------------------------------------------------' 
+                print '\n[Aborted] Command interrupted by the user.\n'
+                return False   
+
+        #
+        # Command without filters attributes
+        #
+
+        elif len(arg_list) == 2:
+
+            templates = arg_list[0].strip()
+            hostnames = arg_list[1].strip()
+
+        #
+        # Command with the wrong number of parameters
+        #
+
+        else:
+            self.generate_feedback('ERROR',' Wrong number of parameters used.\n          Type help or \? to list commands')
+            return False
+
+        #
+        # Sanity check
+        #
+
+        if templates == '':            
+            self.generate_feedback('Error','Templates information is empty')
+            return False
+
+        if hostnames == '':
+            self.generate_feedback('Error','Hostnames information is empty')
+            return False
         
-        * proxy-(prod|test)+d\.example\.org
-          e.g. proxy-prod1.example.org and proxy-test8.example.org 
-               will match this expression.  
+        try:
+
+            #
+            # Generate templates and hosts IDs
+            #
+
+            templates_list = []
+            hostnames_list = []
+            template_ids = ''
+            host_ids = ''
+            
+            for templateid in self.resolve_ids('template',templates.split(','),accept_ids=True):
+                templates_list.append('{"templateid":"' + templateid + '"}')
+
+            template_ids = ','.join(templates_list)
+
+            for hostid in self.resolve_ids('host',hostnames.split(','),accept_ids=True):
+                hostnames_list.append('{"hostid":"' + hostid + '"}')
+        
+            host_ids = ','.join(hostnames_list)
+            
+            #
+            # Generate zabbix query
+            #
+
+            query=ast.literal_eval("{\"templates\":[" + template_ids + "],\"hosts\":[" + host_ids + "]}")
+        
+            #
+            # Link templates to hosts
+            #
+
+            result = self.zapi.template.massadd(**query)
+
+            if self.conf.logging == 'ON':
+                self.logs.logger.info('Templates: %s (%s) linked to these hosts: %s (%s)',templates,template_ids,hostnames,host_ids)
+
+            self.generate_feedback('Done','Templates ' + templates + ' (' + template_ids + ') linked to these hosts: ' + hostnames + ' (' + host_ids + ')')
+
+        except Exception as e:
+
+            if self.conf.logging == 'ON':
+                    self.logs.logger.error('Problems linking templates %s (%s) to hosts %s (%s) - %s',templates,template_ids,hostnames,host_ids,e)
+           
+            self.generate_feedback('Error','Problems linking templates ' + templates + ' (' + template_ids + ') to hosts ' + hostnames + ' (' + host_ids + ') - ' + str(e))
+            return False   
+
+
+    # ############################################
+    # Method do_unlink_template_from_host
+    # ############################################
+
+    def do_unlink_template_from_host(self,args):
+        '''
+        DESCRIPTION:
+        This command unlink one/several templates from
+        one/several hosts
+
+        COMMAND:
+        unlink_template_from_host [templates]
+                                  [hostnames]
+
+        [templates]
+        ------------
+        Templates names or IDs.
+        One can define several values in a comma separated list.
+
+        [hostnames]
+        -----------
+        Hostnames or IDs.
+        One can define several values in a comma separated list.
+
+        '''
+
+        try: 
+            arg_list = shlex.split(args)
+            
+        except ValueError as e:
+            print '\n[ERROR]: ',e,'\n'
+            return False
+
+        #
+        # Command without parameters
+        #
+
+        if len(arg_list) == 0:
+
+            try:
+                print '--------------------------------------------------------'
+                templates = raw_input('# Templates: ').strip()
+                hostnames = raw_input('# Hostnames: ').strip()
+                print '--------------------------------------------------------'
+
+            except Exception as e:
+                print '\n--------------------------------------------------------' 
+                print '\n[Aborted] Command interrupted by the user.\n'
+                return False   
+
+        #
+        # Command without filters attributes
+        #
+
+        elif len(arg_list) == 2:
+
+            templates = arg_list[0].strip()
+            hostnames = arg_list[1].strip()
+
+        #
+        # Command with the wrong number of parameters
+        #
+
+        else:
+            self.generate_feedback('Error',' Wrong number of parameters used.\n          Type help or \? to list commands')
+            return False
+
+        #
+        # Sanity check
+        #
+
+        if templates == '':
+            self.generate_feedback('Error','Templates information is empty')
+            return False
+
+        if hostnames == '':
+            self.generate_feedback('Error','Hostnames information is empty')
+            return False
+
+
+        try:
+
+            #
+            # Generate templates and hosts IDs
+            #
+
+            templates_list = []
+            hostnames_list = []
+            template_ids = ''
+            host_ids = ''
+
+            templates_list = self.resolve_ids('template',templates.split(','),accept_ids=True)
+            template_ids = ','.join(templates_list)
+
+            hostnames_list = self.resolve_ids('host',hostnames.split(','),accept_ids=True)
+            host_ids = ','.join(hostnames_list)
+
+            #
+            # Generate zabbix query
+            #
+            
+            query=ast.literal_eval("{\"hostids\":[" + host_ids + "],\"templateids_clear\":[" + template_ids + "]}")
+        
+            #
+            # Unlink templates from hosts
+            #
+
+            result = self.zapi.host.massremove(**query)
+
+            if self.conf.logging == 'ON':
+                self.logs.logger.info('Templates: %s (%s) unlinked and cleared from these hosts: %s (%s)',templates,template_ids,hostnames,host_ids)
+
+            self.generate_feedback('Done','Templates ' + templates + ' (' + template_ids + ') unlinked and cleared from these hosts: ' + hostnames + ' (' + host_ids + ')')
+
+        except Exception as e:
+            
+            if self.conf.logging == 'ON':
+                    self.logs.logger.error('Problems unlinking and clearing templates %s (%s) from hosts %s (%s) - %s',templates,template_ids,hostnames,host_ids,e)
+           
+            self.generate_feedback('Error','Problems unlinking and clearing templates ' + templates + ' (' + template_ids + ') from hosts ' + hostnames + ' (' + host_ids + ') - ' + str(e))
+            return False   
+            
+
+    # ############################################
+    # Method do_create_usergroup
+    # ############################################
+
+    def do_create_usergroup(self,args):
+        '''
+        DESCRIPTION:
+        This command creates an usergroup.
+
+        COMMAND:
+        create_usergroup [group name]
+                         [GUI access]
+                         [Status]
+
+        [group name]
+        ------------
+        Usergroup name
+
+        [GUI access]
+        ------------
+        0:'System default' [*]
+        1:'Internal'
+        2:'Disable'        
+
+        [Status]
+        --------
+        0:'Enable' [*]
+        1:'Disable'
+
+        '''
+        
+        # Default 0: System default
+        gui_access_default = '0'
+        
+        # Default 0: Enable
+        users_status_default = '0'
+
+        try: 
+            arg_list = shlex.split(args)
+            
+        except ValueError as e:
+            print '\n[ERROR]: ',e,'\n'
+            return False
+
+        #
+        # Command without parameters
+        #
+
+        if len(arg_list) == 0:
+
+            try:
+                print '--------------------------------------------------------'
+                groupname = raw_input('# Name: ').strip()
+                gui_access = raw_input('# GUI access ['+ gui_access_default + ']: ').strip()
+                users_status = raw_input('# Status ['+ users_status_default + ']: ').strip()
+                print '--------------------------------------------------------'
+
+            except Exception as e:
+                print '\n--------------------------------------------------------' 
+                print '\n[Aborted] Command interrupted by the user.\n'
+                return False   
+
+        #
+        # Command without filters attributes
+        #
+
+        elif len(arg_list) == 3:
+
+            groupname = arg_list[0].strip()
+            gui_access = arg_list[1].strip()
+            users_status = arg_list[2].strip()
+
+        #
+        # Command with the wrong number of parameters
+        #
+
+        else:
+            self.generate_feedback('Error',' Wrong number of parameters used.\n          Type help or \? to list commands')
+            return False
+
+
+        #
+        # Sanity check
+        #
+
+        if gui_access == '' or gui_access not in ('0','1','2'):
+            gui_access = gui_access_default
+
+        if users_status == '' or users_status not in ('0','1'):
+            users_status = users_status_default
+
+        #
+        # Check if usergroup exists
+        #
+
+        try:
+            
+            result = self.usergroup_exists(groupname)
+
+            if self.conf.logging == 'ON':
+                self.logs.logger.debug('Cheking if usergroup (%s) exists',groupname)
+
+        except Exception as e:
+
+            if self.conf.logging == 'ON':
+                self.logs.logger.error('Problems checking if usergroup (%s) exists - %s',groupname,e)
+                
+            self.generate_feedback('Error','Problems checking if usergroup (' + groupname + ') exists')
+            return False   
+        
+        #
+        # Create usergroup if it does not exist
+        #
+
+        try:
+
+            if result == True:
+                
+                if self.conf.logging == 'ON':
+                    self.logs.logger.debug('Usergroup (%s) already exists',groupname)
+
+                self.generate_feedback('Warning','This usergroup (' + groupname + ') already exists.')
+                return False   
+                
+            elif result == False:
+                result = self.zapi.usergroup.create(name=groupname,
+                                                    gui_access=gui_access,
+                                                    users_status=users_status)
+                
+                self.cache_object('usergroup',result['usrgrpids'][0],groupname)
+
+                if self.conf.logging == 'ON':
+                    self.logs.logger.info('Usergroup (%s) with ID: %s created',groupname,str(result['usrgrpids'][0]))
+
+                self.generate_feedback('Done','Usergroup (' + groupname + ') with ID: ' + str(result['usrgrpids'][0]) + ' created.')
+        
+        except Exception as e:
+
+            if self.conf.logging == 'ON':
+                    self.logs.logger.error('Problems creating Usergroup (%s) - %s',groupname,e)
+
+            self.generate_feedback('Error','Problems creating usergroup (' + groupname + ')')
+            return False   
+            
+
+    # ############################################
+    # Method do_create_host
+    # ############################################
+
+    def do_create_host(self,args):
+        '''
+        DESCRIPTION:
+        This command creates a host.
+
+        COMMAND:
+        create_host [hostname]
+                    [hostgroups]
+                    [proxy]
+                    [status]
+
+        [hostname]
+        ----------
+        Hostname
+
+        [hostgroups]
+        ------------
+        Hostgroup names or IDs. One can define several values in a
+        comma separated list.
+
+        Remember that the host will get added to all hostgroups
+        defined with the parameter 'default_hostgroup' in the
+        zabbix-cli configuration file 'zabbix-cli.conf'
+
+        This command will fail if both 'default_hostgroup' and
+        [hostgroups] are empty.
+
+        [proxy] 
+        ------- 
+        Proxy server used to monitor this host. One can use regular
+        expressions to define a group of proxy servers from where the
+        system will choose a random proxy.
+
+        If this parameter is not defined, the system will assign a
+        random proxy from the list of all available proxies.
+
+        If the system does not have proxy servers defined, the new
+        host will be monitor by the Zabbix-server.
+
+        e.g. Some regular expressions that can be used:
+        
+        * proxy-(prod|test)+d\.example\.org
+          e.g. proxy-prod1.example.org and proxy-test8.example.org 
+               will match this expression.  
+
+        * .+
+          All proxies will match this expression.
+
+        [Status]
+        --------
+        0:'Monitored' [*]
+        1:'Unmonitored'
+
+        All host created with this command will get assigned a
+        default interface of type 'Agent' using the port 10050.
+
+        '''
+        
+        # Default hostgroups
+        hostgroup_default = self.conf.default_hostgroup.strip()
+
+        # Proxy server to use to monitor this host        
+        proxy_default = '.+'
+
+        # Default 0: Enable
+        host_status_default = '0'
+
+        try: 
+            arg_list = shlex.split(args)
+            
+        except ValueError as e:
+            print '\n[ERROR]: ',e,'\n'
+            return False
+
+        #
+        # Command without parameters
+        #
+
+        if len(arg_list) == 0:
+
+            try:
+                print '--------------------------------------------------------'
+                hostname = raw_input('# Hostname: ').strip()
+                hostgroups = raw_input('# Hostgroups[' + hostgroup_default + ']: ').strip()
+                proxy = raw_input('# Proxy ['+ proxy_default + ']: ').strip()
+                host_status = raw_input('# Status ['+ host_status_default + ']: ').strip()
+                print '--------------------------------------------------------'
+
+            except Exception as e:
+                print '\n--------------------------------------------------------' 
+                print '\n[Aborted] Command interrupted by the user.\n'
+                return False   
+
+        #
+        # Command without filters attributes
+        #
+
+        elif len(arg_list) == 4:
+
+            hostname = arg_list[0].strip()
+            hostgroups = arg_list[1].strip()
+            proxy = arg_list[2].strip()
+            host_status = arg_list[3].strip()
+
+        #
+        # Command with the wrong number of parameters
+        #
+
+        else:
+            self.generate_feedback('Error',' Wrong number of parameters used.\n          Type help or \? to list commands')
+            return False
+
+        #
+        # Sanity check
+        #
+
+        if hostname == '':
+            self.generate_feedback('Error','Hostname value is empty')
+            return False
+
+        if proxy == '':
+            proxy = proxy_default
+
+        if host_status == '' or host_status not in ('0','1'):
+            host_status = host_status_default
+
+        #
+        # Generate the host definition with the hostgroups and proxy
+        # IDs
+        #
+
+        try:
+            query = self.get_host_definition(hostname,hostgroups,proxy,host_status)
+
+        except Exception as e:
+ 
+            if self.conf.logging == 'ON':
+                self.logs.logger.error('%s',e)
+                
+            self.generate_feedback('Error',e)
+            return False
+
+        #
+        # Checking if hostname exists
+        #
+
+        try:
+
+            result = self.host_exists(hostname.strip())
+            
+            if self.conf.logging == 'ON':
+                self.logs.logger.debug('Cheking if host (%s) exists',hostname)
+
+        except Exception as e:
+
+            if self.conf.logging == 'ON':
+                self.logs.logger.error('Problems checking if host (%s) exists - %s',hostname,e)
+
+            self.generate_feedback('Error','Problems checking if host (' + hostname + ') exists')
+            return False   
+        
+        try:
+
+            if result == True:
+
+                if self.conf.logging == 'ON':
+                    self.logs.logger.debug('Host (%s) already exists',hostname)
+
+                self.generate_feedback('Warning','This host (' + hostname + ') already exists.')
+                return False   
+                
+            elif result == False:
+
+                #
+                # Create host via Zabbix-API
+                # 
+
+                result = self.zapi.host.create(**query)
+
+                self.register_created_host(result['hostids'][0],hostname)
+
+        except Exception as e:
+
+            if self.conf.logging == 'ON':
+                self.logs.logger.error('Problems creating host (%s) - %s',hostname,e)
+
+            self.generate_feedback('Error','Problems creating host (' + hostname + ')')
+            return False   
+
+
+    # ############################################
+    # Method get_host_definition
+    # ############################################
+
+    def get_host_definition(self,hostname,hostgroups,proxy,host_status):
+        '''
+        DESCRIPTION:
+        Return the host object used by host.create for a host
+        defined with the parameters of create_host. An exception is
+        raised if a hostgroup does not exist.
+        '''
+
+        # Default hostgroups
+        hostgroup_default = self.conf.default_hostgroup.strip()
+
+        # Generate interface definition. Per default all hosts get a
+        # Zabbix agent and a SNMP interface defined
+
+        interfaces_def = '"interfaces":[' + \
+                         '{"type":1' + \
+                         ',"main":1' + \
+                         ',"useip":0' + \
+                         ',"ip":"' + \
+                         '","dns":"' + hostname + \
+                         '","port":"10050"},' + \
+                         '{"type":2' + \
+                         ',"main":1' + \
+                         ',"useip":0' + \
+                         ',"ip":"' + \
+                         '","dns":"' + hostname + \
+                         '","port":"161"}]'
+
+        #
+        # Generate hostgroups and proxy IDs
+        #
+
+        hostgroups_list = []
+        hostgroup_ids = ''
+
+        hostgroup_names = [hostgroup.strip() for hostgroup in (hostgroup_default + ',' + hostgroups).split(',') if hostgroup.strip() != '']
+                        
+        for hostgroupid in self.resolve_ids('hostgroup',hostgroup_names,accept_ids=True):
+            hostgroups_list.append('{"groupid":"' + hostgroupid + '"}')
+
+        hostgroup_ids = ','.join(set(hostgroups_list))
+
+        try:
+            proxy_id = str(self.get_random_proxyid(proxy.strip()))
+
+            proxy_hostid = "\"proxy_hostid\":\"" + proxy_id + "\","
+
+        except Exception as e:
+ 
+            if self.conf.logging == 'ON':
+                self.logs.logger.debug('Host [%s] - %s',hostname,e)
+                
+            proxy_hostid = ""
+
+        return ast.literal_eval("{\"host\":\"" + hostname + "\"," + "\"groups\":[" + hostgroup_ids + "]," + proxy_hostid + "\"status\":" + host_status + "," + interfaces_def + ",\"inventory_mode\":1,\"inventory\":{\"name\":\"" + hostname +"\"}}")
+
+    # ############################################
+    # Method register_created_host
+    # ############################################
+
+    def register_created_host(self,hostid,hostname):
+        '''
+        DESCRIPTION:
+        Feedback and cache updates after creating a host
+        '''
+
+        #
+        # Update the host cache with the created host. Hosts are
+        # created without a visible name, Zabbix uses the host name.
+        #
+        self.cache_object('host',hostid,hostname,hostname)
+
+        if self.conf.logging == 'ON':
+            self.logs.logger.info('Host (%s) with ID: %s created',hostname,str(hostid))
+                
+        self.generate_feedback('Done','Host (' + hostname + ') with ID: ' + str(hostid) + ' created')
+
+
+    # ############################################
+    # Method create_hosts_bulk
+    # ############################################
+
+    def create_hosts_bulk(self,commands):
+        '''
+        DESCRIPTION:
+        Execute a list of create_host commands [(line number,
+        command), ...] from a bulk execution file with array
+        host.create calls of up to bulk_chunk_size hosts.
+        '''
+
+        #
+        # The hostgroups and proxies are resolved from the caches,
+        # all the hosts of a chunk are created with one API call
+        # and the returned hostids are mapped back to the commands
+        # to generate the same feedback as create_host.
+        #
+        # Commands that would not create a host (wrong parameters,
+        # unknown hostgroups, ...) are executed with create_host to
+        # get the right feedback. If the API call of a chunk fails,
+        # every command of the chunk is executed with create_host,
+        # so the error is reported for the right host.
+        #
+
+        chunk_size = max(1,self.conf.bulk_chunk_size)
+
+        for index in range(0,len(commands),chunk_size):
+
+            chunk = commands[index:index + chunk_size]
+            arguments = {}
+            definitions = {}
+
+            for (line_number,command) in chunk:
+
+                try:
+                    arg_list = shlex.split(command)[1:]
+
+                    if len(arg_list) == 4 and arg_list[0].strip() != '':
+                        arguments[line_number] = [argument.strip() for argument in arg_list]
+
+                except ValueError:
+                    pass
+
+            #
+            # One API call to find the hosts of the chunk that
+            # already exist.
+            #
+
+            existing_hosts = set()
+            already_exists = set()
+
+            if arguments != {}:
+
+                try:
+                    data = self.zapi.host.get(output=['host'],
+                                              filter={'host':[arg_list[0] for arg_list in arguments.values()]})
+
+                    existing_hosts = set(host['host'] for host in data)
+
+                except Exception as e:
+
+                    if self.conf.logging == 'ON':
+                        self.logs.logger.error('Problems checking if hosts exist - %s',e)
+
+                    arguments = {}
+
+            for line_number in sorted(arguments):
+
+                (hostname,hostgroups,proxy,host_status) = arguments[line_number]
+
+                if hostname in existing_hosts:
+                    already_exists.add(line_number)
+                    continue
+
+                if proxy == '':
+                    proxy = '.+'
+
+                if host_status not in ('0','1'):
+                    host_status = '0'
+
+                try:
+                    definitions[line_number] = (hostname,self.get_host_definition(hostname,hostgroups,proxy,host_status))
+                    existing_hosts.add(hostname)
+
+                except Exception as e:
+
+                    if self.conf.logging == 'ON':
+                        self.logs.logger.debug('Line %s executed without batching - %s',line_number,e)
+
+            hostids = {}
+
+            if definitions != {}:
+
+                try:
+                    line_numbers = sorted(definitions)
+                    result = self.zapi.host.create(*[definitions[line_number][1] for line_number in line_numbers])
+
+                    hostids = dict(zip(line_numbers,result['hostids']))
+
+                    if self.conf.logging == 'ON':
+                        self.logs.logger.debug('%s hosts created with one host.create call',len(hostids))
+
+                except Exception as e:
+
+                    if self.conf.logging == 'ON':
+                        self.logs.logger.error('Problems creating %s hosts with one host.create call, creating them one by one - %s',len(definitions),e)
+
+            for (line_number,command) in chunk:
+
+                if line_number in hostids:
+                    self.register_created_host(hostids[line_number],definitions[line_number][0])
+
+                elif line_number in already_exists:
+
+                    if self.conf.logging == 'ON':
+                        self.logs.logger.debug('Host (%s) already exists',arguments[line_number][0])
+
+                    self.generate_feedback('Warning','This host (' + arguments[line_number][0] + ') already exists.')
+
+                else:
+                    self.onecmd(command)
+
+                self.journal_command(line_number,command)
+
+                if self.conf.logging == 'ON':
+                    self.logs.logger.info('Zabbix-cli command [%s] executed via input file',command)
+
+
+    # ############################################
+    # Method journal_command
+    # ############################################
+
+    def journal_command(self,line_number,command):
+        '''
+        DESCRIPTION:
+        Register a command of a bulk execution file in the journal
+        (if any). The command failed if its last feedback was an
+        error.
+        '''
+
+        if self.get_return_code() == 'error':
+            status = 1
+        else:
+            status = 0
+
+        self.reset_return_code()
+
+        if self.journal != None:
+            self.journal.record(line_number,command,status)
+
+
+    # ############################################
+    # Method get_ids_by_name
+    # ############################################
+
+    def get_ids_by_name(self,object_type,names):
+        '''
+        DESCRIPTION:
+        Return a dictionary {name:ID} with the objects of
+        object_type (host, hostgroup, template, proxy, usergroup,
+        user) with a name in 'names'. Names not found are not in the
+        dictionary. The names are resolved with one API call per
+        bulk_chunk_size names.
+        '''
+
+        (id_field,name_field) = {'host':('hostid','host'),
+                                 'hostgroup':('groupid','name'),
+                                 'template':('templateid','host'),
+                                 'proxy':('proxyid','host'),
+                                 'usergroup':('usrgrpid','name'),
+                                 'user':('userid','alias')}[object_type]
+
+        names = sorted(set(names))
+        chunk_size = max(1,self.conf.bulk_chunk_size)
+        ids = {}
+
+        for index in range(0,len(names),chunk_size):
+
+            data = getattr(self.zapi,object_type).get(output=[id_field,name_field],
+                                                      filter={name_field:names[index:index + chunk_size]})
+
+            for item in data:
+                ids[item[name_field]] = item[id_field]
+
+        return ids
+
+
+    # ############################################
+    # Method get_cached_ids_by_name
+    # ############################################
+
+    def get_cached_ids_by_name(self,object_type,names):
+        '''
+        DESCRIPTION:
+        Return a dictionary {name:ID} like get_ids_by_name(), with
+        the IDs of the cache of object_type (see prefetch_names()).
+        Only the names not found in the cache are sent to the API,
+        and the IDs found are saved in the cache.
+        '''
+
+        cache = self.get_cache(object_type,complete=False)
+        ids = {}
+
+        for name in names:
+            objectid = cache.get_id(name)
+
+            if objectid != None:
+                ids[name] = objectid
+
+        unknown_names = [name for name in names if name not in ids]
+
+        if unknown_names != []:
+            found_ids = self.get_ids_by_name(object_type,unknown_names)
+
+            for name,objectid in found_ids.iteritems():
+                cache.add(objectid,name)
+
+            ids.update(found_ids)
+
+        return ids
+
+
+    # ############################################
+    # Method mass_add_bulk
+    # ############################################
+
+    def mass_add_bulk(self,command_name,commands):
+        '''
+        DESCRIPTION:
+        Execute a list of add_host_to_hostgroup or
+        link_template_to_host commands [(line number, command), ...]
+        from a bulk execution file with one chunked
+        hostgroup.massadd/template.massadd call per hostgroup or
+        template.
+        '''
+
+        #
+        # All the host, hostgroup and template names of a chunk of
+        # bulk_chunk_size lines are resolved with set based
+        # queries. The lines are grouped by hostgroup/template and
+        # every target gets one massadd call per bulk_chunk_size
+        # hosts. A line is reported as done when all the calls with
+        # its hosts succeeded.
+        #
+        # Commands with wrong parameters or unknown names, and the
+        # commands with hosts in a failed massadd call, are executed
+        # one by one to get the right feedback.
+        #
+
+        if command_name == 'add_host_to_hostgroup':
+            target_type = 'hostgroup'
+            target_field = 'groupid'
+            target_key = 'groups'
+        else:
+            target_type = 'template'
+            target_field = 'templateid'
+            target_key = 'templates'
 
-        * .+
-          All proxies will match this expression.
+        chunk_size = max(1,self.conf.bulk_chunk_size)
 
-        [Status]
-        --------
-        0:'Monitored' [*]
-        1:'Unmonitored'
+        for index in range(0,len(commands),chunk_size):
 
-        All host created with this command will get assigned a
-        default interface of type 'Agent' using the port 10050.
+            chunk = commands[index:index + chunk_size]
+            arguments = {}
 
-        '''
-        
-        # Default hostgroups
-        hostgroup_default = self.conf.default_hostgroup.strip()
+            for (line_number,command) in chunk:
 
-        # Proxy server to use to monitor this host        
-        proxy_default = '.+'
+                try:
+                    arg_list = [argument.strip() for argument in shlex.split(command)[1:]]
 
-        # Default 0: Enable
-        host_status_default = '0'
+                except ValueError:
+                    continue
 
-        try: 
-            arg_list = shlex.split(args)
-            
-        except ValueError as e:
-            print '\n[ERROR]: ',e,'\n'
-            return False
+                if len(arg_list) != 2 or '' in arg_list:
+                    continue
 
-        #
-        # Command without parameters
-        #
+                if command_name == 'add_host_to_hostgroup':
+                    (hostnames,targets) = arg_list
+                else:
+                    (targets,hostnames) = arg_list
 
-        if len(arg_list) == 0:
+                arguments[line_number] = (hostnames,
+                                          targets,
+                                          [hostname.strip() for hostname in hostnames.split(',')],
+                                          [target.strip() for target in targets.split(',')])
+
+            #
+            # Set based name resolution
+            #
 
             try:
-                print '--------------------------------------------------------'
-                hostname = raw_input('# Hostname: ').strip()
-                hostgroups = raw_input('# Hostgroups[' + hostgroup_default + ']: ').strip()
-                proxy = raw_input('# Proxy ['+ proxy_default + ']: ').strip()
-                host_status = raw_input('# Status ['+ host_status_default + ']: ').strip()
-                print '--------------------------------------------------------'
+                hostid_by_name = self.get_cached_ids_by_name('host',[hostname for argument in arguments.values() for hostname in argument[2] if not hostname.isdigit()])
+                targetid_by_name = self.get_cached_ids_by_name(target_type,[target for argument in arguments.values() for target in argument[3] if not target.isdigit()])
 
             except Exception as e:
-                print '\n--------------------------------------------------------' 
-                print '\n[Aborted] Command interrupted by the user.\n'
-                return False   
 
-        #
-        # Command without filters attributes
-        #
+                if self.conf.logging == 'ON':
+                    self.logs.logger.error('Problems resolving names - %s',e)
 
-        elif len(arg_list) == 4:
+                arguments = {}
 
-            hostname = arg_list[0].strip()
-            hostgroups = arg_list[1].strip()
-            proxy = arg_list[2].strip()
-            host_status = arg_list[3].strip()
+            #
+            # Group the lines by target
+            #
 
-        #
-        # Command with the wrong number of parameters
-        #
+            resolved = {}
+            members = {}
 
-        else:
-            self.generate_feedback('Error',' Wrong number of parameters used.\n          Type help or \? to list commands')
-            return False
+            for line_number in sorted(arguments):
 
-        #
-        # Sanity check
-        #
+                (hostnames,targets,hostname_list,target_list) = arguments[line_number]
 
-        if hostname == '':
-            self.generate_feedback('Error','Hostname value is empty')
-            return False
+                try:
+                    hostids = [hostname if hostname.isdigit() else hostid_by_name[hostname] for hostname in hostname_list]
+                    targetids = [target if target.isdigit() else targetid_by_name[target] for target in target_list]
 
-        if proxy == '':
-            proxy = proxy_default
+                except KeyError:
+                    continue
 
-        if host_status == '' or host_status not in ('0','1'):
-            host_status = host_status_default
+                resolved[line_number] = (hostids,targetids)
 
-        # Generate interface definition. Per default all hosts get a
-        # Zabbix agent and a SNMP interface defined
+                for targetid in targetids:
+                    members.setdefault(targetid,[])
 
-        interfaces_def = '"interfaces":[' + \
-                         '{"type":1' + \
-                         ',"main":1' + \
-                         ',"useip":0' + \
-                         ',"ip":"' + \
-                         '","dns":"' + hostname + \
-                         '","port":"10050"},' + \
-                         '{"type":2' + \
-                         ',"main":1' + \
-                         ',"useip":0' + \
-                         ',"ip":"' + \
-                         '","dns":"' + hostname + \
-                         '","port":"161"}]'
+                    for hostid in hostids:
+                        members[targetid].append((hostid,line_number))
 
-        #
-        # Generate hostgroups and proxy IDs
-        #
+            #
+            # One massadd per target and chunk of hosts
+            #
 
-        try:
-            hostgroups_list = []
-            hostgroup_ids = ''
-                        
-            for hostgroup in hostgroup_default.split(','):
-                
-                if hostgroup != '':
-                    hostgroups_list.append('{"groupid":"' + str(self.get_hostgroup_id(hostgroup)) + '"}')
+            failed = set()
 
-            for hostgroup in hostgroups.split(','):
+            for targetid in sorted(members):
 
-                if hostgroup != '':
-                    if hostgroup.isdigit():
-                        hostgroups_list.append('{"groupid":"' + str(hostgroup).strip() + '"}')
-                    else:
-                        hostgroups_list.append('{"groupid":"' + str(self.get_hostgroup_id(hostgroup.strip())) + '"}')
+                for member_index in range(0,len(members[targetid]),chunk_size):
 
-            hostgroup_ids = ','.join(set(hostgroups_list))
+                    member_chunk = members[targetid][member_index:member_index + chunk_size]
 
-        except Exception as e:
- 
-            if self.conf.logging == 'ON':
-                self.logs.logger.error('%s',e)
-                
-            self.generate_feedback('Error',e)
-            return False
+                    try:
+                        getattr(self.zapi,target_type).massadd(**{target_key:[{target_field:targetid}],
+                                                                  'hosts':[{'hostid':hostid} for hostid in sorted(set(hostid for (hostid,line_number) in member_chunk))]})
 
+                    except Exception as e:
 
-        try:
-            proxy_id = str(self.get_random_proxyid(proxy.strip()))
+                        if self.conf.logging == 'ON':
+                            self.logs.logger.error('Problems with %s.massadd for %s %s, executing the commands one by one - %s',target_type,target_type,targetid,e)
 
-            proxy_hostid = "\"proxy_hostid\":\"" + proxy_id + "\","
+                        failed.update(line_number for (hostid,line_number) in member_chunk)
 
-        except Exception as e:
- 
-            if self.conf.logging == 'ON':
-                self.logs.logger.debug('Host [%s] - %s',hostname,e)
-                
-            proxy_hostid = ""
+            #
+            # Feedback per line, in the same format as the commands
+            #
 
-        #
-        # Checking if hostname exists
-        #
+            for (line_number,command) in chunk:
 
-        try:
+                if line_number in resolved and line_number not in failed:
 
-            result = self.host_exists(hostname.strip())
-            
-            if self.conf.logging == 'ON':
-                self.logs.logger.debug('Cheking if host (%s) exists',hostname)
+                    (hostnames,targets,hostname_list,target_list) = arguments[line_number]
+                    (hostids,targetids) = resolved[line_number]
 
-        except Exception as e:
+                    host_ids = ','.join(['{"hostid":"' + hostid + '"}' for hostid in hostids])
+                    target_ids = ','.join(['{"' + target_field + '":"' + targetid + '"}' for targetid in targetids])
 
-            if self.conf.logging == 'ON':
-                self.logs.logger.error('Problems checking if host (%s) exists - %s',hostname,e)
+                    if command_name == 'add_host_to_hostgroup':
 
-            self.generate_feedback('Error','Problems checking if host (' + hostname + ') exists')
-            return False   
-        
-        try:
+                        if self.conf.logging == 'ON':
+                            self.logs.logger.info('Hosts: %s (%s) added to these groups: %s (%s)',hostnames,host_ids,targets,target_ids)
 
-            if result == True:
+                        self.generate_feedback('Done','Hosts ' + hostnames + ' (' + host_ids + ') added to these groups: ' + targets + ' (' + target_ids + ')')
 
-                if self.conf.logging == 'ON':
-                    self.logs.logger.debug('Host (%s) already exists',hostname)
+                    else:
 
-                self.generate_feedback('Warning','This host (' + hostname + ') already exists.')
-                return False   
-                
-            elif result == False:
+                        if self.conf.logging == 'ON':
+                            self.logs.logger.info('Templates: %s (%s) linked to these hosts: %s (%s)',targets,target_ids,hostnames,host_ids)
 
-                #
-                # Create host via Zabbix-API
-                # 
+                        self.generate_feedback('Done','Templates ' + targets + ' (' + target_ids + ') linked to these hosts: ' + hostnames + ' (' + host_ids + ')')
 
-                query=ast.literal_eval("{\"host\":\"" + hostname + "\"," + "\"groups\":[" + hostgroup_ids + "]," + proxy_hostid + "\"status\":" + host_status + "," + interfaces_def + ",\"inventory_mode\":1,\"inventory\":{\"name\":\"" + hostname +"\"}}")
+                else:
+                    self.onecmd(command)
 
-                result = self.zapi.host.create(**query)
+                self.journal_command(line_number,command)
 
                 if self.conf.logging == 'ON':
-                    self.logs.logger.info('Host (%s) with ID: %s created',hostname,str(result['hostids'][0]))
-                
-                self.generate_feedback('Done','Host (' + hostname + ') with ID: ' + str(result['hostids'][0]) + ' created')
-
-                #
-                # Update the hostid cache with the created host.
-                #
-                self.hostid_cache[result['hostids'][0]] = hostname
-
-        except Exception as e:
-
-            if self.conf.logging == 'ON':
-                self.logs.logger.error('Problems creating host (%s) - %s',hostname,e)
-
-            self.generate_feedback('Error','Problems creating host (' + hostname + ')')
-            return False   
+                    self.logs.logger.info('Zabbix-cli command [%s] executed via input file',command)
 
             
     # ############################################
@@ -2570,17 +3718,17 @@ class zabbixcli(cmd.Cmd):
                 
             result = self.zapi.host.delete(hostid)
 
+            #
+            # Delete the deleted host from the host cache.
+            #
+
+            self.forget_cached_object('host',hostid)
+
             if self.conf.logging == 'ON':
                 self.logs.logger.info('Hosts (%s) with IDs: %s removed',hostname,str(result['hostids'][0]))
 
             self.generate_feedback('Done','Hosts (' + hostname + ') with IDs: ' + str(result['hostids'][0]) + ' removed')
 
-            #
-            # Delete the deleted host from the hostid cache.
-            #
-
-            del self.hostid_cache[hostid]
-
         except Exception as e:
 
             if self.conf.logging == 'ON':
@@ -2959,13 +4107,7 @@ class zabbixcli(cmd.Cmd):
 
         try:
             
-            for usrgrp in usergroup_default.split(','):
-                if usrgrp != '':
-                    usergroup_list.append(str(self.get_usergroup_id(usrgrp.strip())))
-
-            for usrgrp in usrgrps.split(','):
-                if usrgrp != '':
-                    usergroup_list.append(str(self.get_usergroup_id(usrgrp.strip())))
+            usergroup_list = self.resolve_ids('usergroup',[usrgrp for usrgrp in (usergroup_default + ',' + usrgrps).split(',') if usrgrp.strip() != ''])
             
         except Exception as e:
 
@@ -3018,6 +4160,8 @@ class zabbixcli(cmd.Cmd):
                                                autologout=autologout,
                                                usrgrps=usergroup_list)
                 
+                self.cache_object('user',result['userids'][0],alias)
+
                 if self.conf.logging == 'ON':
                     self.logs.logger.info('User (%s) with ID: %s created',alias,str(result['userids'][0]))
                 
@@ -3155,13 +4299,7 @@ class zabbixcli(cmd.Cmd):
 
         try:
             
-            for usrgrp in usergroup_default.split(','):
-                if usrgrp != '':
-                    usergroup_list.append(str(self.get_usergroup_id(usrgrp.strip())))
-
-            for usrgrp in notifications_usergroup_default.split(','):
-                if usrgrp != '':
-                    usergroup_list.append(str(self.get_usergroup_id(usrgrp.strip())))
+            usergroup_list = self.resolve_ids('usergroup',[usrgrp for usrgrp in (usergroup_default + ',' + notifications_usergroup_default).split(',') if usrgrp.strip() != ''])
             
         except Exception as e:
 
@@ -3250,6 +4388,7 @@ class zabbixcli(cmd.Cmd):
                                                ]
                                            )
 
+                self.cache_object('user',result['userids'][0],alias)
                 
                 if self.conf.logging == 'ON':
                     self.logs.logger.info('User (%s) with ID: %s created',alias,str(result['userids'][0]))
@@ -3340,6 +4479,8 @@ class zabbixcli(cmd.Cmd):
                 userid = str(username)
 
             result = self.zapi.user.delete(userid)
+
+            self.forget_cached_object('user',userid)
             
             if self.conf.logging == 'ON':
                 self.logs.logger.info('User (%s) with IDs: %s removed',username,str(result['userids'][0]))
@@ -3436,6 +4577,8 @@ class zabbixcli(cmd.Cmd):
 
                 data = self.zapi.hostgroup.create(name=hostgroup)
                 hostgroupid = data['groupids'][0]
+
+                self.cache_object('hostgroup',hostgroupid,hostgroup)
                 
                 if self.conf.logging == 'ON':
                     self.logs.logger.info('Hostgroup (%s) with ID: %s created',hostgroup,hostgroupid)
@@ -3450,16 +4593,19 @@ class zabbixcli(cmd.Cmd):
 
                 try:
 
-                    for group in admin_usergroup_default.strip().split(','):
-                        usrgrpid = self.get_usergroup_id(group)
+                    admin_usergroups = admin_usergroup_default.strip().split(',')
+                    all_usergroups = all_usergroup_default.strip().split(',')
+
+                    usrgrpids = self.resolve_ids('usergroup',admin_usergroups + all_usergroups)
+
+                    for (group,usrgrpid) in zip(admin_usergroups,usrgrpids[:len(admin_usergroups)]):
 
                         result = self.zapi.usergroup.massadd(usrgrpids=[usrgrpid],rights={'id':hostgroupid,'permission':3})
                     
                         if self.conf.logging == 'ON':
                             self.logs.logger.info('Admin usergroup (%s) has got RW permissions on hostgroup (%s) ',group,hostgroup)
                         
-                    for group in all_usergroup_default.strip().split(','):
-                        usrgrpid = self.get_usergroup_id(group)
+                    for (group,usrgrpid) in zip(all_usergroups,usrgrpids[len(admin_usergroups):]):
 
                         result = self.zapi.usergroup.massadd(usrgrpids=[usrgrpid],rights={'id':hostgroupid,'permission':2})
                     
@@ -3584,8 +4730,9 @@ class zabbixcli(cmd.Cmd):
             usrgrpid = self.get_usergroup_id(usergroup)
             permission_code = self.get_permission_code(permission)
 
-            for group in hostgroups.split(','):
-                hostgroupid = self.get_hostgroup_id(group)                
+            hostgroup_list = hostgroups.split(',')
+
+            for (group,hostgroupid) in zip(hostgroup_list,self.resolve_ids('hostgroup',hostgroup_list)):
 
                 result = self.zapi.usergroup.massadd(usrgrpids=[usrgrpid],rights={'id':hostgroupid,'permission':permission_code})
                 
@@ -3691,8 +4838,9 @@ class zabbixcli(cmd.Cmd):
             usrgrpid = self.get_usergroup_id(usergroup)
             permission_code = self.get_permission_code(permission)
 
-            for group in hostgroups.split(','):
-                hostgroupid = self.get_hostgroup_id(group)                
+            hostgroup_list = hostgroups.split(',')
+
+            for (group,hostgroupid) in zip(hostgroup_list,self.resolve_ids('hostgroup',hostgroup_list)):
 
                 result = self.zapi.usergroup.massupdate(usrgrpids=[usrgrpid],rights={'id':hostgroupid,'permission':permission_code})
                 
@@ -4927,14 +6075,16 @@ class zabbixcli(cmd.Cmd):
     def do_show_triggers(self, args):
         '''
         DESCRIPTION:
-        This command shows triggers that belong to a template
+        This command shows triggers that belong to one or several
+        templates
 
         COMMAND:
-        show_triggers [template]
+        show_triggers [templates]
 
-        [template]
-        ----------
-        Template name or zabbix-templateID
+        [templates]
+        -----------
+        Template names or zabbix-templateIDs. One can define several
+        values in a comma separated list.
 
         '''
 
@@ -4955,7 +6105,7 @@ class zabbixcli(cmd.Cmd):
         if len(arg_list) == 0:
             try:
                 print '--------------------------------------------------------'
-                template = raw_input('# Template: ').strip()
+                templates = raw_input('# Templates: ').strip()
                 print '--------------------------------------------------------'
 
             except Exception as e:
@@ -4968,7 +6118,7 @@ class zabbixcli(cmd.Cmd):
         #
 
         elif len(arg_list) == 1:
-            template = arg_list[0].strip()
+            templates = arg_list[0].strip()
 
         #
         # Command with the wrong number of parameters
@@ -4982,61 +6132,54 @@ class zabbixcli(cmd.Cmd):
         # Sanity check
         #
 
-        if template == '':
+        if templates == '':
             self.generate_feedback('Error','Template value is empty')
             return False
 
         #
-        # Getting template ID
+        # Getting template IDs
         #
 
-        if template.isdigit() == False:
-
-            try:
-                templateid = self.get_template_id(template)
-            
-            except Exception as e:
-
-                if self.conf.logging == 'ON':
-                    self.logs.logger.error('Problems getting templateID - %s',e)
-
-                self.generate_feedback('Error','Problems getting templateID')
-                return False
-                
-        else:
-            templateid = template
-
-        #
-        # Getting triggers
-        #
         try:
-            result = self.zapi.trigger.get(output='triggerid', 
-                                           templateids=templateid,
-                                           sortfield='triggerid',
-                                           sortorder='ASC')
-        
+            templateids = self.resolve_ids('template',[template for template in templates.split(',') if template.strip() != ''],accept_ids=True)
+            
         except Exception as e:
+
             if self.conf.logging == 'ON':
-                self.logs.logger.error('Problems getting trigger list for template (%s) - %s',template,e)
+                self.logs.logger.error('Problems getting templateIDs - %s',e)
 
-            self.generate_feedback('Error','Problems getting trigger list for template (' + template + ')')
+            self.generate_feedback('Error','Problems getting templateIDs - ' + str(e))
             return False
 
         #
-        # Get the columns we want to show from result 
+        # Getting triggers
+        #
+        # All the triggers of all the templates are fetched with the
+        # columns we need, in shards of get_shard_size triggers.
         #
-        
-        for trigger in result:
 
-            trigger_data = self.zapi.trigger.get(output='extend', 
-                                                 expandExpression=1,                                                 
-                                                 triggerids=trigger['triggerid'])
+        try:
+            result = self.zapi.iter_get('trigger',
+                                        shard_size=self.conf.get_shard_size,
+                                        workers=self.conf.get_workers,
+                                        output=['triggerid','expression','description','priority','status'],
+                                        selectHosts=['host'],
+                                        expandExpression=1,
+                                        templateids=templateids,
+                                        sortfield='triggerid',
+                                        sortorder='ASC')
+        
+            #
+            # Get the columns we want to show from result 
+            #
         
+            for data in result:
 
-            for data in trigger_data:
+                template_names = ','.join(sorted(host['host'] for host in data.get('hosts',[])))
 
                 if self.output_format == 'json':
                     result_columns [result_columns_key] = {'triggerid':data['triggerid'],
+                                                           'template':template_names,
                                                            'expression':data['expression'],
                                                            'description':data['description'],
                                                            'priority':self.get_trigger_severity(int(data['priority'])),
@@ -5044,19 +6187,27 @@ class zabbixcli(cmd.Cmd):
                 
                 else:
                     result_columns [result_columns_key] = {'1':data['triggerid'],
-                                                           '2':data['expression'],
-                                                           '3':data['description'],
-                                                           '4':self.get_trigger_severity(int(data['priority'])),
-                                                           '5':self.get_trigger_status(int(data['status']))}
+                                                           '2':template_names,
+                                                           '3':data['expression'],
+                                                           '4':data['description'],
+                                                           '5':self.get_trigger_severity(int(data['priority'])),
+                                                           '6':self.get_trigger_status(int(data['status']))}
 
                 result_columns_key = result_columns_key + 1
+
+        except Exception as e:
+            if self.conf.logging == 'ON':
+                self.logs.logger.error('Problems getting trigger list for templates (%s) - %s',templates,e)
+
+            self.generate_feedback('Error','Problems getting trigger list for templates (' + templates + ')')
+            return False
                 
         #
         # Generate output
         #
         self.generate_output(result_columns,
-                             ['TriggerID','Expression','Description','Priority','Status'],
-                             ['Expression','Description'],
+                             ['TriggerID','Template','Expression','Description','Priority','Status'],
+                             ['Template','Expression','Description'],
                              ['TriggerID'],
                              FRAME)
 
@@ -5209,46 +6360,70 @@ class zabbixcli(cmd.Cmd):
 
             if object_name.lower() == '#all#':
 
+                #
+                # Only the ID and name of the objects are needed. The
+                # objects are fetched in shards and decoded one by one
+                # from the response stream.
+                #
+
                 try:
 
                     if obj_type == 'groups':
 
-                        data = self.zapi.hostgroup.get(output="extend")
+                        data = self.zapi.iter_get('hostgroup',
+                                                  shard_size=self.conf.get_shard_size,
+                                                  workers=self.conf.get_workers,
+                                                  output=['groupid','name'])
                         
                         for object in data:
                             object_name_list[object['groupid']] = object['name']
                         
                     elif obj_type == 'hosts':
 
-                        data = self.zapi.host.get(output="extend")
+                        data = self.zapi.iter_get('host',
+                                                  shard_size=self.conf.get_shard_size,
+                                                  workers=self.conf.get_workers,
+                                                  output=['hostid','host'])
                         
                         for object in data:
                             object_name_list[object['hostid']] = object['host']
 
                     elif obj_type == 'images':
 
-                        data = self.zapi.image.get(output="extend")
+                        data = self.zapi.iter_get('image',
+                                                  shard_size=self.conf.get_shard_size,
+                                                  workers=self.conf.get_workers,
+                                                  output=['imageid','name'])
                         
                         for object in data:
                             object_name_list[object['imageid']] = object['name']
                         
                     elif obj_type == 'maps':
 
-                        data = self.zapi.map.get(output="extend")
+                        data = self.zapi.iter_get('map',
+                                                  shard_size=self.conf.get_shard_size,
+                                                  workers=self.conf.get_workers,
+                                                  output=['sysmapid','name'])
                         
                         for object in data:
                             object_name_list[object['sysmapid']] = object['name']
                         
                     elif obj_type == 'screens':
 
-                        data = self.zapi.screen.get(output="extend")
+                        data = self.zapi.iter_get('screen',
+                                                  shard_size=self.conf.get_shard_size,
+                                                  workers=self.conf.get_workers,
+                                                  output=['screenid','name'])
                         
                         for object in data:
                             object_name_list[object['screenid']] = object['name']
                     
                     elif obj_type == 'templates':
 
-                        data = self.zapi.template.get(output="extend")
+                        data = self.zapi.iter_get('template',
+                                                  shard_size=self.conf.get_shard_size,
+                                                  workers=self.conf.get_workers,
+                                                  output=['templateid','host'])
                         
                         for object in data:
                             object_name_list[object['templateid']] = object['host']
@@ -5268,41 +6443,45 @@ class zabbixcli(cmd.Cmd):
             #
    
             else:
-                for name in object_name.split(','):
-                    
-                    if name.strip().isdigit() == True and name.strip() != '':
-                        object_name_list[str(name).strip()] = str(name).strip()
+                name_list = [name.strip() for name in object_name.split(',') if name.strip() != '']
 
-                    elif name.strip().isdigit() == False and name.strip() != '':
-    
-                        try:
-                            if obj_type == 'groups':
-                                id = str(self.get_hostgroup_id(name.strip()))
+                try:
+                    if obj_type == 'groups':
+                        id_list = self.resolve_ids('hostgroup',name_list,accept_ids=True)
+
+                    elif obj_type == 'hosts':
+                        id_list = self.resolve_ids('host',name_list,accept_ids=True)
+
+                    elif obj_type == 'templates':
+                        id_list = self.resolve_ids('template',name_list,accept_ids=True)
+
+                    else:
+                        id_list = []
+
+                        for name in name_list:
 
-                            elif obj_type == 'hosts':
-                                id = str(self.get_host_id(name.strip()))
+                            if name.isdigit() == True:
+                                id_list.append(name)
 
                             elif obj_type == 'images':
-                                id = str(self.get_image_id(name.strip()))
+                                id_list.append(str(self.get_image_id(name)))
 
                             elif obj_type == 'maps':
-                                id = str(self.get_map_id(name.strip()))
+                                id_list.append(str(self.get_map_id(name)))
 
                             elif obj_type == 'screens':
-                                id = str(self.get_screen_id(name.strip()))
+                                id_list.append(str(self.get_screen_id(name)))
 
-                            elif obj_type == 'templates':
-                                id = str(self.get_template_id(name.strip()))
+                    for (id,name) in zip(id_list,name_list):
+                        object_name_list[id] = name
 
-                            object_name_list[id] = name.strip()
-
-                        except Exception as e:
+                except Exception as e:
 
-                            if self.conf.logging == 'ON':
-                                self.logs.logger.error('Problems getting ID for object type [%s] and object name [%s] - %s',obj_type,name,e)
+                    if self.conf.logging == 'ON':
+                        self.logs.logger.error('Problems getting IDs for object type [%s] and object names [%s] - %s',obj_type,object_name,e)
 
-                            self.generate_feedback('Error','Problems getting ID for object type [' + obj_type + '] and object name [' + name + ']')
-                            return False
+                    self.generate_feedback('Error','Problems getting IDs for object type [' + obj_type + '] - ' + str(e))
+                    return False
 
             
             #
@@ -5581,6 +6760,14 @@ class zabbixcli(cmd.Cmd):
             else:
                 if self.conf.logging == 'ON':
                     self.logs.logger.error('The file %s does not exists',file)
+
+        #
+        # The imported files can create and rename hosts,
+        # hostgroups and templates, we do not know which ones.
+        #
+
+        if total_files_imported > 0:
+            self.reset_caches()
               
         self.generate_feedback('done','Total files Imported ['+ str(total_files_imported) +'] / Not imported [' + str(total_files_not_imported) +']')
 
@@ -5754,18 +6941,15 @@ class zabbixcli(cmd.Cmd):
 
         proxy_list = proxies.split(',')
 
-        for proxy in proxy_list:
-                
-            try:
-                proxyid = self.get_proxy_id(proxy.strip())
-                proxyid_list.append(proxyid)
+        try:
+            proxyid_list = self.resolve_ids('proxy',proxy_list)
 
-            except Exception as e:
-                if self.conf.logging == 'ON':
-                    self.logs.logger.error('Proxy [%s] does not exist - %s',proxy.strip(),e)
+        except Exception as e:
+            if self.conf.logging == 'ON':
+                self.logs.logger.error('Proxies [%s] do not exist - %s',proxies,e)
 
-                self.generate_feedback('Error','Proxy [' + proxy.strip() + '] does not exist')
-                return False
+            self.generate_feedback('Error','Proxies do not exist - ' + str(e))
+            return False
 
         #
         # Getting all host monitored by the proxies defined in
@@ -5775,12 +6959,12 @@ class zabbixcli(cmd.Cmd):
     
         try:
 
-            for proxyid in proxyid_list:
-                result = self.zapi.proxy.get(output='extend',
-                                             proxyids=proxyid,
-                                             selectHosts=['hostid'])
+            result = self.zapi.proxy.get(output=['proxyid'],
+                                         proxyids=proxyid_list,
+                                         selectHosts=['hostid'])
                 
-                for host in result[0]['hosts']:
+            for proxy in result:
+                for host in proxy['hosts']:
                     all_hosts.append(host['hostid'])
         
         except Exception as e:
@@ -6180,6 +7364,8 @@ class zabbixcli(cmd.Cmd):
         Generate feedback messages
         '''
         
+        self.feedback_state.return_code = return_code.lower()
+
         if self.output_format == 'table':
             print '\n[' + return_code.title() + ']: ' + str(message) + '\n'   
             print 
@@ -6202,6 +7388,27 @@ class zabbixcli(cmd.Cmd):
                 sys.exit(1)
 
 
+    # ############################################
+    # Method get_return_code
+    # ############################################
+
+    def get_return_code(self):
+        '''
+        Return code of the last feedback generated by this thread
+        (done|warning|error), None if there is none
+        '''
+
+        return getattr(self.feedback_state,'return_code',None)
+
+
+    # ############################################
+    # Method reset_return_code
+    # ############################################
+
+    def reset_return_code(self):
+        self.feedback_state.return_code = None
+
+
     # ############################################
     # Method do_clear
     # ############################################
@@ -6228,6 +7435,28 @@ class zabbixcli(cmd.Cmd):
         self.generate_feedback('Error',' Unknown command: %s.\n          Type help or \? to list commands' % line)
 
 
+    # ############################################
+    # Method onecmd
+    # ############################################
+
+    def onecmd(self, line):
+        '''
+        Execute a command. A command returning False without any
+        feedback has failed (e.g. the errors printed directly when
+        the parameters cannot be parsed), its return code is
+        'error'.
+        '''
+
+        self.reset_return_code()
+
+        result = cmd.Cmd.onecmd(self, line)
+
+        if result == False and self.get_return_code() == None:
+            self.feedback_state.return_code = 'error'
+
+        return result
+
+
     # ############################################
     # Method emptyline
     # ############################################
@@ -6360,6 +7589,84 @@ class zabbixcli(cmd.Cmd):
         print
 
 
+    # ############################################
+    # Method do_show_api_stats
+    # ############################################
+
+    def do_show_api_stats(self, args):
+        '''
+        DESCRIPTION:
+        This command shows statistics about the Zabbix-API calls
+        executed by this Zabbix-CLI process: number of calls and
+        errors, latency percentiles and bytes sent/received per
+        API method.
+
+        Latency values are in milliseconds and the percentiles are
+        estimated from a latency histogram. Bytes sent/received are
+        the bytes on the wire. The bytes saved by the HTTP
+        compression and the size of the ID/name caches in use are
+        shown after the table.
+
+        COMMAND:
+        show_api_stats
+
+        '''
+
+        result_columns = {}
+        result_columns_key = 0
+        bytes_saved = 0
+
+        for stats in api_stats.get_stats():
+
+            bytes_saved = bytes_saved + stats.bytes_saved
+
+            if self.output_format == 'json':
+                result_columns [result_columns_key] = {'method':stats.method,
+                                                       'calls':stats.count,
+                                                       'errors':stats.errors,
+                                                       'p50_ms':round(stats.percentile(50),1),
+                                                       'p95_ms':round(stats.percentile(95),1),
+                                                       'p99_ms':round(stats.percentile(99),1),
+                                                       'max_ms':round(stats.max_time,1),
+                                                       'total_ms':round(stats.total_time,1),
+                                                       'bytes_sent':stats.bytes_sent,
+                                                       'bytes_received':stats.bytes_received,
+                                                       'bytes_saved':stats.bytes_saved}
+
+            else:
+                result_columns [result_columns_key] = {'1':stats.method,
+                                                       '2':str(stats.count),
+                                                       '3':str(stats.errors),
+                                                       '4':'%.1f' % stats.percentile(50),
+                                                       '5':'%.1f' % stats.percentile(95),
+                                                       '6':'%.1f' % stats.percentile(99),
+                                                       '7':'%.1f' % stats.max_time,
+                                                       '8':str(stats.bytes_sent),
+                                                       '9':str(stats.bytes_received)}
+
+            result_columns_key = result_columns_key + 1
+
+        #
+        # Generate output
+        #
+        self.generate_output(result_columns,
+                             ['Method','Calls','Errors','p50 (ms)','p95 (ms)','p99 (ms)','Max (ms)','Bytes sent','Bytes received'],
+                             ['Method'],
+                             ['Calls','Errors','p50 (ms)','p95 (ms)','p99 (ms)','Max (ms)','Bytes sent','Bytes received'],
+                             FRAME)
+
+        if self.output_format == 'table':
+            print '\nBytes saved by HTTP compression: ' + str(bytes_saved)
+
+            with self.cache_lock:
+                caches = [self.caches[object_type] for object_type in sorted(self.caches)]
+
+            for cache in caches:
+                print 'Cached ' + cache.object_type + ' objects: ' + str(len(cache)) + ' (' + str(cache.size() / 1024) + ' KB)'
+
+            print
+
+
     # ########################################################
     # Method hostgroup_exists
     # ########################################################
@@ -6384,38 +7691,75 @@ class zabbixcli(cmd.Cmd):
 
 
     # ########################################################
-    # Method get_hostgroup_id
+    # Method resolve_ids
     # ########################################################
 
-    def get_hostgroup_id(self, hostgroup):
+    def resolve_ids(self, object_type, names, accept_ids=False):
         '''
         DESCRIPTION:
-        Get the hostgroup_id for a hostgroup
+        Get the IDs of a list of objects of object_type (host,
+        hostgroup, template, usergroup, user, proxy) from their
+        names. The IDs are returned in the same order as the names.
+
+        All the names are resolved with one API call (per
+        bulk_chunk_size names). An exception with all the names not
+        found is raised if some of them do not exist.
+
+        With accept_ids=True, numeric values are considered IDs and
+        used as they are.
         '''
 
-        try:
-            
-            if self.bulk_execution == True:
-                
-                if hostgroup in self.hostgroupname_cache:
-                    hostgroupid = self.hostgroupname_cache[hostgroup]
+        id_label = {'host':'hostID',
+                    'hostgroup':'hostgroupID',
+                    'template':'TemplateID',
+                    'usergroup':'usergroupID',
+                    'user':'userID',
+                    'proxy':'proxyID'}[object_type]
 
-                else:
-                    raise Exception('Could not find hostgroupID for: ' + hostgroup)
+        names = [name.strip() for name in names]
+        unknown_names = [name for name in names if not (accept_ids and name.isdigit())]
+        ids = {}
 
-            else:
-            
-                data = self.zapi.hostgroup.get(filter={'name':hostgroup})
-            
-                if data != []:
-                    hostgroupid = data[0]['groupid']
-                else:
-                    raise Exception('Could not find hostgroupID for: ' + hostgroup)
+        #
+        # In bulk execution mode, the IDs are taken from the caches
+        # (see prefetch_names()) and only the names not found there
+        # are sent to the API. The caches are not populated with all
+        # the objects of the system for this, they have the objects
+        # used so far.
+        #
 
-        except Exception as e:
-            raise e
+        if self.bulk_execution == True:
+            ids = self.get_cached_ids_by_name(object_type,unknown_names)
+
+        elif unknown_names != []:
+            ids = self.get_ids_by_name(object_type,unknown_names)
+
+            with self.cache_lock:
+
+                if object_type in self.caches:
+
+                    for name,objectid in ids.iteritems():
+                        self.caches[object_type].add(objectid,name)
+
+        missing_names = [name for name in unknown_names if name not in ids]
+
+        if missing_names != []:
+            raise Exception('Could not find ' + id_label + ' for: ' + ', '.join(sorted(set(missing_names))))
+
+        return [str(ids.get(name,name)) for name in names]
+
+
+    # ########################################################
+    # Method get_hostgroup_id
+    # ########################################################
+
+    def get_hostgroup_id(self, hostgroup):
+        '''
+        DESCRIPTION:
+        Get the hostgroup_id for a hostgroup
+        '''
 
-        return str(hostgroupid)
+        return self.resolve_ids('hostgroup',[hostgroup])[0]
 
 
 
@@ -6432,20 +7776,27 @@ class zabbixcli(cmd.Cmd):
         try:
 
             if self.bulk_execution == True:
+                cache = self.get_cache('host',complete=False)
 
-                if host in self.hostid_cache.values():
+                if cache.get_id(host) != None:
                     return True
-                else:
-                    return False
 
-            else:
+                # Hosts created or removed by the bulk execution are
+                # added to / removed from the cache.
+                if host in cache.prefetched:
+                    return False
 
-                data = self.zapi.host.get(filter={"host":host})
+            data = self.zapi.host.get(output=['hostid','host'],
+                                      filter={"host":host})
                 
-                if data != []:
-                    return True
-                else:
-                    return False
+            if data != []:
+
+                if self.bulk_execution == True:
+                    self.get_cache('host',complete=False).add(data[0]['hostid'],data[0]['host'])
+
+                return True
+            else:
+                return False
 
         except Exception as e:
             raise e
@@ -6461,19 +7812,7 @@ class zabbixcli(cmd.Cmd):
         Get the hostid for a host
         '''
 
-        try:
-            
-            data = self.zapi.host.get(filter={"host":host})
-                
-            if data != []:
-                hostid = data[0]['hostid']
-            else:
-                raise Exception('Could not find hostID for:' + host)
-
-        except Exception as e:
-            raise e
-
-        return str(hostid)
+        return self.resolve_ids('host',[host])[0]
 
 
     # #################################################
@@ -6489,21 +7828,20 @@ class zabbixcli(cmd.Cmd):
         try:
 
             # 
-            # Return the value if it exists from the dictionary
-            # hostid_cache.
+            # Return the value if it exists in the host cache.
             #
 
-            if hostid in self.hostid_cache:
-                host_name = self.hostid_cache[hostid]
-            
-            else:
+            cache = self.get_cache('host')
+            host_name = cache.get_label(hostid)
 
-                data = self.zapi.host.get(output=['name'],
+            if host_name == None:
+
+                data = self.zapi.host.get(output=['host','name'],
                                           hostids=hostid)
 
                 if data != []:
                     host_name = data[0]['name']
-                    self.hostid_cache[hostid] = host_name
+                    cache.add(hostid,data[0]['host'],host_name)
                 
                 else:
                     raise Exception('Could not find hostname for ID:' + hostid)
@@ -6511,7 +7849,8 @@ class zabbixcli(cmd.Cmd):
         except Exception as e:
             raise e
 
-        return str(host_name)
+        # Visible names can have non-ASCII characters
+        return host_name
 
 
     # #################################################
@@ -6628,18 +7967,7 @@ class zabbixcli(cmd.Cmd):
         Get the templateid for a template
         '''
 
-        try:
-            data = self.zapi.template.get(filter={"host":template})
-            
-            if data != []:
-                templateid = data[0]['templateid']
-            else:
-                raise Exception('Could not find TemplateID for:' + template)
-
-        except Exception as e:
-            raise e
-
-        return str(templateid)
+        return self.resolve_ids('template',[template])[0]
 
 
     # ##########################################
@@ -6675,19 +8003,7 @@ class zabbixcli(cmd.Cmd):
         Get the usergroupid for a usergroup
         '''
 
-        try:
-            data = self.zapi.usergroup.get(output=['usrgrpid'],
-                                           filter={"name":usergroup})
-
-            if data != []:
-                usergroupid = data[0]['usrgrpid']
-            else:
-                raise Exception('Could not find usergroupID for: ' + usergroup)
-
-        except Exception as e:
-            raise e
-
-        return str(usergroupid)
+        return self.resolve_ids('usergroup',[usergroup])[0]
 
 
     # ##########################################
@@ -6700,18 +8016,7 @@ class zabbixcli(cmd.Cmd):
         Get the userid for a user
         '''
 
-        try:
-            data = self.zapi.user.get(filter={'alias':user})
-
-            if data != []:
-                userid = data[0]['userid']
-            else:
-                raise Exception('Could not find userID for: ' + user)
-
-        except Exception as e:
-            raise e
-
-        return str(userid)
+        return self.resolve_ids('user',[user])[0]
 
     
     # ##########################################
@@ -6724,23 +8029,10 @@ class zabbixcli(cmd.Cmd):
         Get the proxyid for a proxy server
         '''
 
-        try:
-            if proxy != '':
-
-                data = self.zapi.proxy.get(filter={"host":proxy})
-
-                if data != []:
-                    proxyid = data[0]['proxyid']
-                else:
-                    raise Exception('Could not find proxyID for:' + proxy)
-
-            else:
-                 raise Exception('Cannot get the proxyID of an empty proxy value')
-
-        except Exception as e:
-            raise e
+        if proxy == '':
+            raise Exception('Cannot get the proxyID of an empty proxy value')
 
-        return str(proxyid)
+        return self.resolve_ids('proxy',[proxy])[0]
 
 
     # ##########################################
@@ -6761,7 +8053,7 @@ class zabbixcli(cmd.Cmd):
 
             if self.bulk_execution == True:
 
-                for proxyid,proxy_name in self.proxyid_cache.iteritems():
+                for proxyid,proxy_name in self.get_cache('proxy').items():
                     if match_pattern.match(proxy_name):
                         proxy_list.append(proxyid)
             
@@ -6787,104 +8079,240 @@ class zabbixcli(cmd.Cmd):
 
 
     # #################################################
-    # Method populate_hostid_cache
+    # Method get_cache
     # #################################################
-    
-    def populate_hostid_cache(self):
+
+    def get_cache(self, object_type, complete=True):
         '''
         DESCRIPTION:
-        Populate hostid cache
+        Return the EntityCache of object_type. With complete=True,
+        the cache is populated with all the objects of the system
+        the first time it is used. With complete=False, the cache
+        has only the objects used so far.
         '''
 
-        # This methos initializes a dictionary when we start
-        # zabbix-cli with all hostid:hostname from hosts that are
-        # monitored. We use this as a cache to get hostname
-        # information for a hostid.
+        # Most commands do not need any cache, we do not want to
+        # pay for fetching all the hosts, proxies, hostgroups,
+        # ... from the Zabbix-API before running them.
         #
-        # This cache is necessary e.g. by the show_alarms to avoid an
-        # API call per active trigger to get the hostname of the host
-        # with the associated trigger because this is a very expensive
-        # operation on big systems with many active triggers.
-        #
-        # This has to be done this way now because with zabbix 3.0 the
-        # API has changed and it is not possible to get the hostname
-        # value via trigger.get(). expandData parameter got
-        # deprecated in 2.4 and removed in 3.0.
+        # The locks are needed because the caches can be populated
+        # by the warm up thread of the interactive shell and by the
+        # workers of a bulk execution. A cache is populated with the
+        # lock of its object type, the lookups in the other caches
+        # do not wait for it.
         #
 
-        try:
-            temp_dict = {}
-            
-            data = self.zapi.host.get(output=['hostid','name'],
-                                      monitored_hosts=True)
+        with self.cache_lock:
 
-            for host in data:
-                temp_dict[host['hostid']] = host['name'] 
+            if object_type not in self.caches:
+                self.caches[object_type] = EntityCache(object_type)
 
-            return temp_dict
-            
-        except Exception as e:
-            raise e
+            cache = self.caches[object_type]
+            populate_lock = self.populate_locks.setdefault(object_type,threading.Lock())
 
+        if complete and not cache.complete:
 
-    # #################################################
-    # Method populate_hostgroupname_cache
-    # #################################################
-    
-    def populate_hostgroupname_cache(self):
+            with populate_lock:
+
+                # Populated by another thread while we waited
+                if not cache.complete:
+
+                    if self.conf.logging == 'ON':
+                        self.logs.logger.debug('Populating %s cache',object_type)
+
+                    self.populate_cache(cache)
+
+                    if self.conf.logging == 'ON':
+                        self.logs.logger.debug('%s cache populated: %s objects, %s bytes',object_type,len(cache),cache.size())
+
+        return cache
+
+
+    def reset_caches(self):
         '''
         DESCRIPTION:
-        Populate hostgroupname cache
+        Forget all the caches. They are populated again the next
+        time they are used.
         '''
 
-        # This method initializes a dictionary with all hostgroups in
-        # the system.
-        #
-        # This will help the performance of creating a host via bulk
-        # executions because we avoid an extra call to the zabbix-API.
-        #
+        with self.cache_lock:
+            self.caches = {}
+
+
+    def cache_object(self, object_type, objectid, name, label=None):
+        '''
+        DESCRIPTION:
+        Write-through of an object created by a command: save it in
+        the cache of object_type (if it is in use) and in the
+        entity cache file. label is the visible name of a host.
+        '''
+
+        with self.cache_lock:
+
+            if object_type in self.caches:
+                self.caches[object_type].add(objectid,name,label)
+
+        if self.entity_store != None:
 
+            #
+            # The entity cache file has the visible names of the
+            # hosts (EntityStore.ENTITIES). A host without a known
+            # visible name is saved by the next refresh of the file.
+            #
+
+            if object_type == 'host':
+                name = label
+
+            if name != None:
+                self.entity_store.store(object_type,str(objectid),name)
+
+
+    def forget_cached_object(self, object_type, objectid):
+        '''
+        DESCRIPTION:
+        Write-through of an object deleted by a command: remove it
+        from the cache of object_type (if it is in use) and from the
+        entity cache file.
+        '''
+
+        with self.cache_lock:
+
+            if object_type in self.caches:
+                self.caches[object_type].remove(objectid)
+
+        if self.entity_store != None:
+            self.entity_store.remove(object_type,str(objectid))
+
+
+    def prefetch_names(self, names):
+        '''
+        DESCRIPTION:
+        Resolve the names in names {object type:set(names)} with
+        one set based query per object type (and bulk_chunk_size
+        names), and save the IDs in the caches used by the
+        get_*_id methods in bulk execution mode.
+        '''
+
+        for object_type in sorted(names):
+
+            if names[object_type] == set():
+                continue
+
+            #
+            # The proxy names are regular expressions in some
+            # commands, get_random_proxyid() needs all of them.
+            #
+
+            if object_type == 'proxy':
+                self.get_cache('proxy')
+                continue
+
+            ids = self.get_ids_by_name(object_type,names[object_type])
+            cache = self.get_cache(object_type,complete=False)
+
+            for name,objectid in ids.iteritems():
+                cache.add(objectid,name)
+
+            cache.prefetched.update(names[object_type])
+
+            if self.conf.logging == 'ON':
+                self.logs.logger.debug('%s of %s %s names prefetched',len(ids),len(names[object_type]),object_type)
+
+
+    # #################################################
+    # Method warm_up_caches
+    # #################################################
+
+    def warm_up_caches(self):
+        '''
+        DESCRIPTION:
+        Populate all the caches. Used by the warm up thread of the
+        interactive shell.
+        '''
 
         try:
-            temp_dict = {}
-            
-            data = self.zapi.hostgroup.get(output=['groupid','name'])
-            
-            for hostgroup in data:
-                temp_dict[hostgroup['name']] = hostgroup['groupid'] 
+            for object_type in ['host','proxy','hostgroup','template','usergroup','user']:
+                self.get_cache(object_type)
+
+            if self.conf.logging == 'ON':
+                self.logs.logger.debug('Caches populated in the background')
 
-            return temp_dict
-            
         except Exception as e:
-            raise e
+
+            if self.conf.logging == 'ON':
+                self.logs.logger.error('Problems populating the caches in the background - %s',e)
 
 
     # #################################################
-    # Method populate_proxyid_cache
+    # Method populate_cache
     # #################################################
     
-    def populate_proxyid_cache(self):
+    def populate_cache(self, cache):
         '''
         DESCRIPTION:
-        Populate proxyid cache
+        Populate an EntityCache with all the objects of its type
         '''
 
-        # This method initializes a dictionary with all active proxies
-        # in the system.
+        # The host cache is used by get_host_name() to avoid an API
+        # call per hostID when showing many objects. Commands getting
+        # objects with their hosts should rather ask for the host
+        # names with selectHosts (see show_alarms).
         #
-        # This will help the performance of creating a host via bulk
-        # executions because we avoid an extra call to the zabbix-API.
+        # The other caches help the performance of bulk executions
+        # because we avoid an extra call to the zabbix-API per
+        # command.
         #
 
+        (id_field,name_field) = {'host':('hostid','host'),
+                                 'proxy':('proxyid','host'),
+                                 'hostgroup':('groupid','name'),
+                                 'template':('templateid','host'),
+                                 'usergroup':('usrgrpid','name'),
+                                 'user':('userid','alias')}[cache.object_type]
+
         try:
-            temp_dict = {}
 
-            data = self.zapi.proxy.get(output=['proxyid','host'])
+            #
+            # The entity cache file only has the visible name of the
+            # hosts. They are used as labels, the technical names are
+            # cached when they are used.
+            #
+
+            if self.entity_store != None:
 
-            for proxy in data:
-                temp_dict[proxy['proxyid']] = proxy['host'] 
+                for objectid,name in self.entity_store.get_map(cache.object_type).iteritems():
 
-            return temp_dict
+                    if cache.object_type == 'host':
+                        cache.add(objectid,None,name)
+                    else:
+                        cache.add(objectid,name)
+
+            elif cache.object_type == 'host':
+
+                #
+                # The hosts are fetched in shards and decoded host by
+                # host from the response stream, to avoid big requests
+                # and having the complete list in memory several times
+                # on big systems.
+                #
+
+                data = self.zapi.iter_get('host',
+                                          shard_size=self.conf.get_shard_size,
+                                          workers=self.conf.get_workers,
+                                          output=['hostid','host','name'],
+                                          monitored_hosts=True)
+
+                for host in data:
+                    cache.add(host['hostid'],host['host'],host['name'])
+
+            else:
+
+                data = getattr(self.zapi,cache.object_type).get(output=[id_field,name_field])
+
+                for item in data:
+                    cache.add(item[id_field],item[name_field])
+
+            cache.complete = True
             
         except Exception as e:
             raise e
@@ -6904,6 +8332,16 @@ class zabbixcli(cmd.Cmd):
         self._locals  = {}      ## Initialize execution namespace for user
         self._globals = {}
 
+        #
+        # Populate the caches in the background while the user
+        # writes the first command.
+        #
+
+        if self.conf.cache_warmup == 'ON':
+            warm_up_thread = threading.Thread(target=self.warm_up_caches)
+            warm_up_thread.daemon = True
+            warm_up_thread.start()
+
 
     # ############################################
     # Method help_shortcuts
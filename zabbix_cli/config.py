@@ -39,6 +39,16 @@ class configuration():
 
         # Zabbix API section
         self.zabbix_api_url = ''
+        self.get_shard_size = 1000
+        self.get_workers = 1
+        self.cache_ttl = 0
+        self.cache_size = 1000
+        self.pool_connections = 10
+        self.pool_maxsize = 10
+        self.keep_alive = 'ON'
+        self.compress_responses = 'ON'
+        self.compress_requests = 'OFF'
+        self.compress_min_size = 1024
 
         # Zabbix_config section
         self.system_id = 'zabbix-ID' 
@@ -51,6 +61,18 @@ class configuration():
         self.include_timestamp_export_filename = 'ON'
         self.use_colors = 'ON'
         self.use_auth_token_file = 'OFF'
+        self.entity_cache = 'OFF'
+        self.entity_cache_file = os.getenv('HOME') + '/.zabbix-cli_cache.db'
+        self.entity_cache_ttl = 300
+        self.entity_cache_full_refresh = 86400
+        self.cache_warmup = 'OFF'
+        self.daemon_socket = os.getenv('HOME') + '/.zabbix-cli_daemon.sock'
+        self.use_daemon = 'OFF'
+        self.daemon_keepalive = 60
+        self.bulk_workers = 1
+        self.bulk_chunk_size = 500
+        self.events_cursor_file = os.getenv('HOME') + '/.zabbix-cli_events_cursor'
+        self.events_settle_time = 60
 
         # Logging section
         self.logging = 'OFF'
@@ -99,6 +121,36 @@ class configuration():
             
             if config.has_option('zabbix_api','zabbix_api_url'):
                 self.zabbix_api_url = config.get('zabbix_api','zabbix_api_url')
+
+            if config.has_option('zabbix_api','get_shard_size'):
+                self.get_shard_size = config.getint('zabbix_api','get_shard_size')
+
+            if config.has_option('zabbix_api','get_workers'):
+                self.get_workers = config.getint('zabbix_api','get_workers')
+
+            if config.has_option('zabbix_api','cache_ttl'):
+                self.cache_ttl = config.getint('zabbix_api','cache_ttl')
+
+            if config.has_option('zabbix_api','cache_size'):
+                self.cache_size = config.getint('zabbix_api','cache_size')
+
+            if config.has_option('zabbix_api','pool_connections'):
+                self.pool_connections = config.getint('zabbix_api','pool_connections')
+
+            if config.has_option('zabbix_api','pool_maxsize'):
+                self.pool_maxsize = config.getint('zabbix_api','pool_maxsize')
+
+            if config.has_option('zabbix_api','keep_alive'):
+                self.keep_alive = config.get('zabbix_api','keep_alive')
+
+            if config.has_option('zabbix_api','compress_responses'):
+                self.compress_responses = config.get('zabbix_api','compress_responses')
+
+            if config.has_option('zabbix_api','compress_requests'):
+                self.compress_requests = config.get('zabbix_api','compress_requests')
+
+            if config.has_option('zabbix_api','compress_min_size'):
+                self.compress_min_size = config.getint('zabbix_api','compress_min_size')
                  
             #
             # Zabbix configuration
@@ -139,6 +191,42 @@ class configuration():
             if config.has_option('zabbix_config','use_auth_token_file'):
                 self.use_auth_token_file = config.get('zabbix_config','use_auth_token_file')
 
+            if config.has_option('zabbix_config','entity_cache'):
+                self.entity_cache = config.get('zabbix_config','entity_cache')
+
+            if config.has_option('zabbix_config','entity_cache_file'):
+                self.entity_cache_file = config.get('zabbix_config','entity_cache_file')
+
+            if config.has_option('zabbix_config','entity_cache_ttl'):
+                self.entity_cache_ttl = config.getint('zabbix_config','entity_cache_ttl')
+
+            if config.has_option('zabbix_config','entity_cache_full_refresh'):
+                self.entity_cache_full_refresh = config.getint('zabbix_config','entity_cache_full_refresh')
+
+            if config.has_option('zabbix_config','cache_warmup'):
+                self.cache_warmup = config.get('zabbix_config','cache_warmup')
+
+            if config.has_option('zabbix_config','daemon_socket'):
+                self.daemon_socket = config.get('zabbix_config','daemon_socket')
+
+            if config.has_option('zabbix_config','use_daemon'):
+                self.use_daemon = config.get('zabbix_config','use_daemon')
+
+            if config.has_option('zabbix_config','daemon_keepalive'):
+                self.daemon_keepalive = config.getint('zabbix_config','daemon_keepalive')
+
+            if config.has_option('zabbix_config','bulk_workers'):
+                self.bulk_workers = config.getint('zabbix_config','bulk_workers')
+
+            if config.has_option('zabbix_config','bulk_chunk_size'):
+                self.bulk_chunk_size = config.getint('zabbix_config','bulk_chunk_size')
+
+            if config.has_option('zabbix_config','events_cursor_file'):
+                self.events_cursor_file = config.get('zabbix_config','events_cursor_file')
+
+            if config.has_option('zabbix_config','events_settle_time'):
+                self.events_settle_time = config.getint('zabbix_config','events_settle_time')
+
             #
             # Logging section
             #
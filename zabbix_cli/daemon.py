@@ -0,0 +1,373 @@
+#!/usr/bin/env python
+#
+# Authors:
+# rafael@postgresql.org.es / http://www.postgresql.org.es/
+#
+# Copyright (c) 2014-2015 USIT-University of Oslo
+#
+# This file is part of Zabbix-CLI
+# https://github.com/rafaelma/zabbix-cli
+#
+# Zabbix-CLI is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Zabbix-CLI is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Zabbix-CLI.  If not, see <http://www.gnu.org/licenses/>.
+
+#
+# Zabbix-CLI daemon mode.
+#
+# A long running zabbix-cli process keeps an authenticated zabbixcli
+# instance with warm caches and executes the commands received via
+# a local Unix socket.
+#
+# Protocol (one JSON document per line):
+#
+# client -> daemon: {"command": "show_alarms ...", "output_format": "json"}
+# daemon -> client: {"output": "..."}   (0 or more, as the command writes)
+# daemon -> client: {"status": 0}       (exit status of the command)
+#
+# This module does not import zabbix_cli.cli, so the client side
+# starts as fast as possible.
+#
+
+import os
+import sys
+import time
+import json
+import socket
+import SocketServer
+
+
+# ############################################
+# Function run_client
+# ############################################
+
+def run_client(socket_file, command, output_format='table', out=None):
+    '''
+    Send a command to a zabbix-cli daemon and write its output to
+    out (default: sys.stdout).
+
+    Return the exit status of the command, or None if the daemon is
+    not running.
+    '''
+
+    if out is None:
+        out = sys.stdout
+
+    client = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+
+    try:
+        client.connect(socket_file)
+
+    except socket.error:
+        client.close()
+        return None
+
+    try:
+        client.sendall(json.dumps({'command': command,
+                                   'output_format': output_format}) + '\n')
+
+        for line in client.makefile('r'):
+            message = json.loads(line)
+
+            if 'output' in message:
+                out.write(message['output'].encode('utf-8'))
+                out.flush()
+
+            elif 'status' in message:
+                return message['status']
+
+    finally:
+        client.close()
+
+    # The connection was closed before we got the status
+    return 1
+
+
+# ############################################
+# class ZabbixCLIDaemonStop
+# ############################################
+
+class ZabbixCLIDaemonStop(BaseException):
+    '''
+    Raised by ZabbixCLIDaemon.stop(). It is not an Exception, so the
+    commands (and their 'except Exception') do not catch it.
+    '''
+
+
+# ############################################
+# class ZabbixCLIDaemonOutput
+# ############################################
+
+class ZabbixCLIDaemonOutput(object):
+    '''
+    File-like object used as sys.stdout while a command runs. The
+    output is sent to the client as soon as the command writes it.
+    '''
+
+    def __init__(self, connection):
+        self.connection = connection
+
+    def write(self, data):
+        if isinstance(data, str):
+            data = data.decode('utf-8', 'replace')
+
+        if data:
+            self.connection.sendall(json.dumps({'output': data}) + '\n')
+
+    def flush(self):
+        pass
+
+
+# ############################################
+# class ZabbixCLIDaemonHandler
+# ############################################
+
+class ZabbixCLIDaemonHandler(SocketServer.StreamRequestHandler):
+    '''
+    Execute one command received via the Unix socket
+    '''
+
+    def handle(self):
+
+        line = self.rfile.readline()
+
+        if not line:
+            return
+
+        try:
+            request = json.loads(line)
+            command = request['command']
+            output_format = request.get('output_format', 'table')
+
+        except (ValueError, KeyError, TypeError):
+            self.wfile.write(json.dumps({'output': '\n[ERROR]: Invalid request\n\n'}) + '\n')
+            self.wfile.write(json.dumps({'status': 1}) + '\n')
+            return
+
+        status = self.server.run_command(command, output_format, ZabbixCLIDaemonOutput(self.connection))
+
+        self.wfile.write(json.dumps({'status': status}) + '\n')
+
+
+# ############################################
+# class ZabbixCLIDaemon
+# ############################################
+
+class ZabbixCLIDaemon(SocketServer.UnixStreamServer):
+    '''
+    Unix socket server executing zabbix-cli commands with one
+    zabbixcli instance.
+
+    Commands are executed one by one, in the order they arrive:
+    the zabbixcli instance writes to sys.stdout and keeps state
+    (output_format) between commands.
+    '''
+
+    def __init__(self, socket_file, cli, logs=None, keepalive=60, cache_ttl=300):
+
+        self.socket_file = socket_file
+        self.cli = cli
+        self.logs = logs
+        self.keepalive = keepalive
+        self.cache_ttl = cache_ttl
+        self.cache_time = time.time()
+        self.commands = 0
+        self.stopping = False
+
+        self.remove_stale_socket()
+
+        # Only the owner can connect to the socket
+        old_umask = os.umask(0177)
+
+        try:
+            SocketServer.UnixStreamServer.__init__(self, socket_file, ZabbixCLIDaemonHandler)
+        finally:
+            os.umask(old_umask)
+
+        os.chmod(socket_file, 0600)
+
+        # handle_timeout() is called when we do not get any command
+        # during 'keepalive' seconds
+        self.timeout = keepalive
+
+
+    # ############################################
+    # Method remove_stale_socket
+    # ############################################
+
+    def remove_stale_socket(self):
+        '''
+        Remove the socket file of a daemon that is not running
+        anymore. Abort if a daemon is using it.
+        '''
+
+        if not os.path.exists(self.socket_file):
+            return
+
+        client = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+
+        try:
+            client.connect(self.socket_file)
+
+        except socket.error:
+            os.remove(self.socket_file)
+            return
+
+        finally:
+            client.close()
+
+        raise Exception('A zabbix-cli daemon is already running with socket ' + self.socket_file)
+
+
+    # ############################################
+    # Method run_command
+    # ############################################
+
+    def run_command(self, command, output_format, output):
+        '''
+        Execute a command with the output sent to 'output'. Return
+        the exit status of the command.
+        '''
+
+        #
+        # The caches are populated again (lazily) when they are
+        # older than cache_ttl. Objects created or deleted by other
+        # clients of the Zabbix-API would not show up otherwise.
+        #
+
+        if self.cache_ttl > 0 and time.time() - self.cache_time >= self.cache_ttl:
+            self.cli.reset_caches()
+            self.cache_time = time.time()
+
+        status = 0
+
+        stdout = sys.stdout
+        stdin = sys.stdin
+
+        sys.stdout = output
+        sys.stdin = open(os.devnull, 'r')
+
+        try:
+            self.cli.output_format = output_format
+            self.cli.onecmd(command)
+
+        except SystemExit as e:
+
+            if e.code is None:
+                status = 0
+            elif isinstance(e.code, int):
+                status = e.code
+            else:
+                status = 1
+
+        except socket.error:
+
+            # The client is gone
+            status = 1
+
+        except Exception as e:
+
+            status = 1
+
+            try:
+                output.write('\n[ERROR]: ' + str(e) + '\n\n')
+            except socket.error:
+                pass
+
+        finally:
+            sys.stdin.close()
+            sys.stdout = stdout
+            sys.stdin = stdin
+
+        # The command could have caught ZabbixCLIDaemonStop
+        if self.stopping:
+            raise ZabbixCLIDaemonStop()
+
+        self.commands += 1
+
+        if self.logs != None:
+            self.logs.logger.info('Zabbix-cli command [%s] executed via daemon (status %s)',command,status)
+
+        return status
+
+
+    # ############################################
+    # Method handle_timeout
+    # ############################################
+
+    def handle_timeout(self):
+        '''
+        Keep the API session alive when we are idle
+        '''
+
+        # do_request() bypasses the read cache of the API client,
+        # the request has to reach the frontend.
+
+        try:
+            self.cli.zapi.do_request('user.get', {'output': ['userid'], 'limit': 1})
+
+        except Exception as e:
+
+            if self.logs != None:
+                self.logs.logger.error('Problems keeping the API session alive - %s',e)
+
+
+    # ############################################
+    # Method stop
+    # ############################################
+
+    def stop(self, signum=None, frame=None):
+        '''
+        Signal handler (SIGTERM) stopping the daemon, also in the
+        middle of a command
+        '''
+
+        self.stopping = True
+        raise ZabbixCLIDaemonStop()
+
+
+    # ############################################
+    # Method handle_error
+    # ############################################
+
+    def handle_error(self, request, client_address):
+
+        # SocketServer catches everything raised while a request is
+        # handled, run() checks self.stopping after every request.
+        if self.stopping:
+            return
+
+        SocketServer.UnixStreamServer.handle_error(self, request, client_address)
+
+
+    # ############################################
+    # Method run
+    # ############################################
+
+    def run(self):
+        '''
+        Serve commands until the process is interrupted or stop()
+        is called
+        '''
+
+        try:
+            while not self.stopping:
+                self.handle_request()
+
+        except ZabbixCLIDaemonStop:
+            pass
+
+        finally:
+            self.server_close()
+
+            if os.path.exists(self.socket_file):
+                os.remove(self.socket_file)
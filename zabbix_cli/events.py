@@ -0,0 +1,153 @@
+#!/usr/bin/env python
+#
+# Authors:
+# rafael@postgresql.org.es / http://www.postgresql.org.es/
+#
+# Copyright (c) 2014-2015 USIT-University of Oslo
+#
+# This file is part of Zabbix-CLI
+# https://github.com/rafaelma/zabbix-cli
+#
+# Zabbix-CLI is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Zabbix-CLI is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Zabbix-CLI.  If not, see <http://www.gnu.org/licenses/>.
+
+#
+# Cursor and output files of the tail_events command.
+#
+# The cursor file has the ID of the last settled event (all the
+# events with a lower ID have been shown) and the IDs of the events
+# after it that have been shown already:
+#
+# {"eventid": 1201433, "seen": [1201435, 1201436]}
+#
+# Older cursor files with only an eventID are also accepted.
+#
+
+import os
+import json
+
+
+# ############################################
+# Function read_events_cursor
+# ############################################
+
+def read_events_cursor(cursor_file):
+    '''
+    Return (eventID, set(eventIDs shown after it)) from cursor_file,
+    (0, set()) if it does not exist.
+    '''
+
+    if not os.path.exists(cursor_file):
+        return (0, set())
+
+    with open(cursor_file, 'r') as file:
+        value = file.read().strip()
+
+    if value.isdigit():
+        return (int(value), set())
+
+    try:
+        cursor = json.loads(value)
+        return (int(cursor['eventid']), set(int(eventid) for eventid in cursor.get('seen', [])))
+
+    except (ValueError, KeyError, TypeError):
+        raise Exception('The cursor file ' + cursor_file + ' does not have a valid eventID')
+
+
+# ############################################
+# Function save_events_cursor
+# ############################################
+
+def save_events_cursor(cursor_file, eventid, seen):
+    '''
+    Save eventid and seen in cursor_file. The file is replaced
+    atomically, it always has a complete cursor.
+    '''
+
+    temp_file = cursor_file + '.tmp'
+
+    with open(temp_file, 'w') as file:
+        file.write(json.dumps({'eventid': eventid, 'seen': sorted(seen)}) + '\n')
+        file.flush()
+        os.fsync(file.fileno())
+
+    os.rename(temp_file, cursor_file)
+
+
+# ############################################
+# Function get_last_eventids_in_file
+# ############################################
+
+def get_last_eventids_in_file(output_file, count, block_size=65536):
+    '''
+    Return the eventIDs of the last count complete events written
+    to output_file by tail_events, in the order they were written.
+    '''
+
+    if count <= 0 or not os.path.exists(output_file):
+        return []
+
+    with open(output_file, 'rb') as file:
+        file.seek(0, os.SEEK_END)
+        position = file.tell()
+        data = ''
+
+        # Read blocks from the end until we have count lines
+        while position > 0 and data.count('\n') <= count:
+            size = min(block_size, position)
+            position -= size
+            file.seek(position)
+            data = file.read(size) + data
+
+    lines = data.split('\n')
+
+    # The last line is empty, or incomplete if we died while writing
+    # it. The first one can be incomplete if we did not read the
+    # complete file.
+
+    lines = lines[:-1]
+
+    if position > 0:
+        lines = lines[1:]
+
+    eventids = []
+
+    for line in lines[-count:]:
+
+        try:
+            eventids.append(int(json.loads(line)['eventid']))
+        except (ValueError, KeyError, TypeError):
+            continue
+
+    return eventids
+
+
+# ############################################
+# Function remove_incomplete_line
+# ############################################
+
+def remove_incomplete_line(file, block_size=65536):
+    '''
+    Remove the incomplete line at the end of file (opened with 'a+'),
+    written by a process that died while writing it.
+    '''
+
+    file.seek(0, os.SEEK_END)
+    size = file.tell()
+
+    start = max(0, size - block_size)
+    file.seek(start)
+    end = file.read().rfind('\n') + 1
+
+    if end > 0 or start == 0:
+        file.truncate(start + end)
@@ -14,6 +14,28 @@ from __future__ import unicode_literals
 import logging
 import requests
 import json
+import codecs
+import threading
+import time
+import copy
+import zlib
+
+from requests.adapters import HTTPAdapter
+
+from multiprocessing.pool import ThreadPool
+
+#
+# Use a faster JSON library for the requests and responses if one is
+# installed. We fall back to the standard json module.
+#
+
+try:
+    import ujson as fast_json
+except ImportError:
+    try:
+        import simplejson as fast_json
+    except ImportError:
+        fast_json = None
 
 
 class _NullHandler(logging.Handler):
@@ -33,40 +55,600 @@ class ZabbixAPIException(Exception):
     pass
 
 
+class ZabbixAPIJSONCodec(object):
+    """
+    JSON encoder/decoder used for the JSON-RPC requests and
+    responses. Responses are decoded straight from the response
+    bytes (UTF-8).
+    """
+
+    def __init__(self, module=None):
+        if module is None:
+            module = fast_json or json
+
+        self.module = module
+        self.name = module.__name__
+
+    def dumps(self, obj):
+        return self.module.dumps(obj)
+
+    def loads(self, data):
+        if isinstance(data, bytes) and self.module is json:
+            # The standard json module in python3 < 3.6 does not decode bytes
+            data = data.decode('utf-8')
+
+        return self.module.loads(data)
+
+
+# Default codec shared by all ZabbixAPI instances
+json_codec = ZabbixAPIJSONCodec()
+
+
+# Methods that only read data
+READ_METHODS = ('get', 'getobjects')
+
+
+def is_read_method(method):
+    """Find out if an API method (ie: host.get) only reads data"""
+    return method.split('.')[-1] in READ_METHODS
+
+
+def request_key(method, params):
+    """Canonical key for a request, equal for equal method and parameters"""
+    return json.dumps([method, params], sort_keys=True)
+
+
+class ZabbixAPIMethodStats(object):
+    """
+    Counters and latency histogram for one API method. Latencies are
+    kept in milliseconds.
+    """
+
+    # Upper bounds of the latency histogram buckets (ms). The last
+    # bucket holds everything above the last bound.
+    BUCKETS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000, 60000)
+
+    def __init__(self, method):
+        self.method = method
+        self.count = 0
+        self.errors = 0
+        self.total_time = 0.0
+        self.min_time = None
+        self.max_time = 0.0
+        self.bytes_sent = 0
+        self.bytes_received = 0
+        self.bytes_saved = 0
+        self.histogram = [0] * (len(self.BUCKETS) + 1)
+
+    def record(self, elapsed, bytes_sent, bytes_received, error, bytes_saved=0):
+        self.count += 1
+        self.total_time += elapsed
+        self.max_time = max(self.max_time, elapsed)
+
+        if self.min_time is None or elapsed < self.min_time:
+            self.min_time = elapsed
+
+        self.bytes_sent += bytes_sent
+        self.bytes_received += bytes_received
+        self.bytes_saved += bytes_saved
+
+        if error:
+            self.errors += 1
+
+        for index, bound in enumerate(self.BUCKETS):
+            if elapsed <= bound:
+                self.histogram[index] += 1
+                break
+        else:
+            self.histogram[-1] += 1
+
+    def percentile(self, percent):
+        """
+        Estimate a latency percentile (ms) from the histogram,
+        interpolating linearly inside the bucket where it falls.
+        """
+
+        if self.count == 0:
+            return 0.0
+
+        rank = self.count * percent / 100.0
+        cumulative = 0
+        lower = self.min_time
+
+        for index, hits in enumerate(self.histogram):
+
+            if index < len(self.BUCKETS):
+                upper = min(float(self.BUCKETS[index]), self.max_time)
+            else:
+                upper = self.max_time
+
+            if hits and cumulative + hits >= rank:
+                return lower + (upper - lower) * (rank - cumulative) / hits
+
+            cumulative += hits
+            lower = max(upper, self.min_time)
+
+        return self.max_time
+
+
+class ZabbixAPIStats(object):
+    """
+    In-process registry with per-method statistics of all the
+    requests sent to the Zabbix API.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.methods = {}
+
+    def record(self, method, elapsed, bytes_sent=0, bytes_received=0, error=False, bytes_saved=0):
+        """
+        Record one request. bytes_sent and bytes_received are the
+        bytes on the wire, bytes_saved the bytes saved by the HTTP
+        compression of the request and response bodies.
+        """
+
+        with self.lock:
+            if method not in self.methods:
+                self.methods[method] = ZabbixAPIMethodStats(method)
+
+            self.methods[method].record(elapsed, bytes_sent, bytes_received, error, bytes_saved)
+
+    def record_error(self, method):
+        """Count a JSON-RPC error for a request already recorded"""
+
+        with self.lock:
+            if method in self.methods:
+                self.methods[method].errors += 1
+
+    def get_stats(self):
+        """Return the per-method statistics sorted by method name"""
+
+        with self.lock:
+            return [self.methods[method] for method in sorted(self.methods)]
+
+    def reset(self):
+        with self.lock:
+            self.methods = {}
+
+
+# Default registry shared by all ZabbixAPI instances
+api_stats = ZabbixAPIStats()
+
+
+class ZabbixAPICache(object):
+    """
+    Read-through cache for the results of read calls (ie:
+    hostgroup.get). Entries are indexed by method and canonicalized
+    parameters, expire after ttl seconds and the least recently used
+    entries are dropped when the cache has more than size entries.
+
+    Every entry is tagged with the object types its result depends
+    on: the object type of the call plus the ones referenced by
+    select* and *ids parameters. A write call (create, update,
+    delete, mass*, ...) on an object type removes all the entries
+    tagged with it, so we never get stale data after our own writes.
+    """
+
+    # Calls that do not change any object
+    NO_INVALIDATION = ('user.login', 'user.logout', 'user.authenticate',
+                       'user.checkauthentication', 'apiinfo.version')
+
+    # Parameters that make a result depend on other object types
+    RELATED_PARAMS = {
+        'groupids': 'hostgroup',
+        'hostids': 'host',
+        'templateids': 'template',
+        'proxyids': 'proxy',
+        'usrgrpids': 'usergroup',
+        'userids': 'user',
+        'triggerids': 'trigger',
+        'itemids': 'item',
+        'selectGroups': 'hostgroup',
+        'selectHosts': 'host',
+        'selectTemplates': 'template',
+        'selectParentTemplates': 'template',
+        'selectInterfaces': 'hostinterface',
+        'selectMacros': 'usermacro',
+        'selectUsers': 'user',
+        'selectUsrgrps': 'usergroup',
+        'selectTriggers': 'trigger',
+        'selectItems': 'item',
+        'selectApplications': 'application',
+        'selectLastEvent': 'event',
+    }
+
+    def __init__(self, ttl=60, size=1000):
+        self.ttl = ttl
+        self.size = size
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+        # key: link of the recency list. The links are [previous
+        # link, next link, key, (expiration time, tags, result)] in
+        # a circular doubly linked list from the least to the most
+        # recently used entry, OrderedDict is not available in
+        # Python 2.6.
+        self.entries = {}
+        self.root = []
+        self.root[:] = [self.root, self.root, None, None]
+
+    def _unlink(self, link):
+        (previous, next) = link[:2]
+        previous[1] = next
+        next[0] = previous
+
+    def _append(self, link):
+        last = self.root[0]
+        link[0] = last
+        link[1] = self.root
+        last[1] = link
+        self.root[0] = link
+
+    def _remove(self, key):
+        self._unlink(self.entries.pop(key))
+
+    def lookup(self, key):
+        """Return (True, result) for a valid entry, (False, None) otherwise"""
+
+        with self.lock:
+            link = self.entries.get(key)
+
+            if link is None or link[3][0] < time.time():
+                if link is not None:
+                    self._remove(key)
+
+                self.misses += 1
+                return False, None
+
+            # Most recently used entry
+            self._unlink(link)
+            self._append(link)
+
+            result = link[3][2]
+            self.hits += 1
+
+        return True, copy.deepcopy(result)
+
+    @classmethod
+    def tags(cls, method, params):
+        """Return the object types the result of a read call depends on"""
+
+        tags = set([method.split('.')[0]])
+
+        if isinstance(params, dict):
+            for param in params:
+                if param in cls.RELATED_PARAMS:
+                    tags.add(cls.RELATED_PARAMS[param])
+
+        return tags
+
+    def store(self, key, method, params, result):
+        tags = self.tags(method, params)
+        value = (time.time() + self.ttl, tags, copy.deepcopy(result))
+
+        with self.lock:
+            if key in self.entries:
+                self._remove(key)
+
+            link = [None, None, key, value]
+            self._append(link)
+            self.entries[key] = link
+
+            # Drop the least recently used entries
+            while len(self.entries) > self.size:
+                self._remove(self.root[1][2])
+
+    def invalidate(self, method):
+        """Remove the entries affected by a write call"""
+
+        if method.lower() in self.NO_INVALIDATION or is_read_method(method):
+            return
+
+        object_type = method.split('.')[0]
+
+        with self.lock:
+            if object_type == 'configuration':
+                self._clear()
+                return
+
+            for key in [key for key, link in self.entries.items() if object_type in link[3][1]]:
+                self._remove(key)
+
+    def _clear(self):
+        self.entries.clear()
+        self.root[:] = [self.root, self.root, None, None]
+
+    def clear(self):
+        with self.lock:
+            self._clear()
+
+
 class ZabbixAPI(object):
+
+    # ID field of the API object types. Used to split get requests
+    # in shards of IDs.
+    OBJECT_IDS = {
+        'action': 'actionid',
+        'alert': 'alertid',
+        'application': 'applicationid',
+        'discoveryrule': 'itemid',
+        'event': 'eventid',
+        'graph': 'graphid',
+        'host': 'hostid',
+        'hostgroup': 'groupid',
+        'hostinterface': 'interfaceid',
+        'image': 'imageid',
+        'item': 'itemid',
+        'maintenance': 'maintenanceid',
+        'map': 'sysmapid',
+        'mediatype': 'mediatypeid',
+        'proxy': 'proxyid',
+        'screen': 'screenid',
+        'template': 'templateid',
+        'trigger': 'triggerid',
+        'user': 'userid',
+        'usergroup': 'usrgrpid',
+        'usermacro': 'hostmacroid',
+    }
+
+    # Field used to sort the IDs of the API object types by ID. Not
+    # every get method accepts its ID field as sortfield (template
+    # and proxy IDs are host IDs), and map.get and usermacro.get
+    # cannot sort by ID at all.
+    SORT_FIELDS = {
+        'action': 'actionid',
+        'alert': 'alertid',
+        'application': 'applicationid',
+        'discoveryrule': 'itemid',
+        'event': 'eventid',
+        'graph': 'graphid',
+        'host': 'hostid',
+        'hostgroup': 'groupid',
+        'hostinterface': 'interfaceid',
+        'image': 'imageid',
+        'item': 'itemid',
+        'maintenance': 'maintenanceid',
+        'mediatype': 'mediatypeid',
+        'proxy': 'hostid',
+        'screen': 'screenid',
+        'template': 'hostid',
+        'trigger': 'triggerid',
+        'user': 'userid',
+        'usergroup': 'usrgrpid',
+    }
+
     def __init__(self,
                  server='http://localhost/zabbix',
                  session=None,
                  use_authenticate=False,
-                 timeout=None):
+                 timeout=None,
+                 thread_safe=False,
+                 stats=None,
+                 cache_ttl=0,
+                 cache_size=1000,
+                 coalesce_reads=True,
+                 codec=None,
+                 pool_connections=10,
+                 pool_maxsize=10,
+                 keep_alive=True,
+                 compress_responses=True,
+                 compress_requests=False,
+                 compress_min_size=1024):
         """
         Parameters:
             server: Base URI for zabbix web interface (omitting /api_jsonrpc.php)
             session: optional pre-configured requests.Session instance
             use_authenticate: Use old (Zabbix 1.8) style authentication
             timeout: optional connect and read timeout in seconds, default: None (if you're using Requests >= 2.4 you can set it as tuple: "(connect, read)" which is used to set individual connect and read timeouts.)
+            thread_safe: Share this instance between threads. Every thread gets its own keep-alive session, request ids are generated atomically and the auth token is shared.
+            stats: optional ZabbixAPIStats registry, default: the module registry api_stats
+            cache_ttl: cache the results of read calls (*.get) for cache_ttl seconds, default: 0 (no cache)
+            cache_size: maximum number of results in the cache
+            coalesce_reads: in thread_safe mode, identical read calls running at the same time share one HTTP request
+            codec: optional ZabbixAPIJSONCodec, default: the module codec json_codec (ujson or simplejson if installed, json otherwise)
+            pool_connections: number of connection pools cached by the HTTP adapter of every session
+            pool_maxsize: maximum number of connections saved in every connection pool
+            keep_alive: reuse the HTTP connections between requests, default: True
+            compress_responses: ask the server for gzip/deflate compressed responses, default: True
+            compress_requests: send request bodies gzip compressed (Content-Encoding: gzip), default: False. The web server in front of the Zabbix frontend has to decompress them.
+            compress_min_size: only compress request bodies bigger than compress_min_size bytes
         """
 
+        # These attributes have to be defined before anything else,
+        # __getattr__ would create an object class for them otherwise.
+        self.thread_safe = thread_safe
+        self._local = threading.local()
+        self._id_lock = threading.Lock()
+
+        self.pool_connections = pool_connections
+        self.pool_maxsize = pool_maxsize
+        self.compress_requests = compress_requests
+        self.compress_min_size = compress_min_size
+
         if session:
-            self.session = session
+            self._session = session
         else:
-            self.session = requests.Session()
-            
+            self._session = requests.Session()
+
+        self.mount_adapters(self._session)
+
         # Default headers for all requests
-        self.session.headers.update({
+        self._session.headers.update({
             'Content-Type': 'application/json-rpc',
             'User-Agent': 'python/pyzabbix',
-            'Cache-Control': 'no-cache'
+            'Cache-Control': 'no-cache',
+            'Accept-Encoding': 'gzip, deflate' if compress_responses else 'identity',
+            'Connection': 'keep-alive' if keep_alive else 'close'
         })
 
+        # The thread creating this instance uses the main session
+        self._local.session = self._session
+
         self.use_authenticate = use_authenticate
         self.auth = ''
         self.id = 0
 
+        # Active ZabbixAPIBatch, if any
+        self.current_batch = None
+
         self.timeout = timeout
 
+        if stats is None:
+            self.stats = api_stats
+        else:
+            self.stats = stats
+
+        if cache_ttl > 0:
+            self.cache = ZabbixAPICache(cache_ttl, cache_size)
+        else:
+            self.cache = None
+
+        # Read calls in flight, indexed by request_key()
+        self.coalesce_reads = coalesce_reads
+        self.coalesced_calls = 0
+        self._inflight = {}
+        self._inflight_lock = threading.Lock()
+        self._writes = 0
+
+        if codec is None:
+            self.codec = json_codec
+        else:
+            self.codec = codec
+
         self.url = server + '/api_jsonrpc.php'
         logger.info("JSON-RPC Server Endpoint: %s", self.url)
+        logger.info("JSON codec: %s", self.codec.name)
+
+    @property
+    def session(self):
+        """
+        The requests.Session used by the calling thread. In thread_safe
+        mode every thread gets its own session, a copy of the main
+        session configuration, so each worker keeps its own keep-alive
+        connection.
+        """
+
+        if not self.thread_safe:
+            return self._session
+
+        session = getattr(self._local, 'session', None)
+
+        if session is None:
+            session = self.new_session()
+            self._local.session = session
+
+        return session
+
+    @session.setter
+    def session(self, session):
+        self._session = session
+        self._local.session = session
+
+    @property
+    def current_batch(self):
+        """The ZabbixAPIBatch collecting calls in the calling thread"""
+
+        if not self.thread_safe:
+            return self._batch
+
+        return getattr(self._local, 'batch', None)
+
+    @current_batch.setter
+    def current_batch(self, batch):
+        if not self.thread_safe:
+            self._batch = batch
+        else:
+            self._local.batch = batch
+
+    def new_session(self):
+        """Create a new session with the same configuration as the main session"""
+
+        session = requests.Session()
+        self.mount_adapters(session)
+        session.headers.update(self._session.headers)
+        session.auth = self._session.auth
+        session.verify = self._session.verify
+        session.cert = self._session.cert
+        session.proxies.update(self._session.proxies)
+        session.trust_env = self._session.trust_env
+
+        return session
+
+    def mount_adapters(self, session):
+        """Mount HTTP adapters with the configured pool sizes in a session"""
+
+        for prefix in ('http://', 'https://'):
+            session.mount(prefix, HTTPAdapter(pool_connections=self.pool_connections,
+                                              pool_maxsize=self.pool_maxsize))
+
+    def encode_body(self, request_json):
+        """
+        Encode a request, gzip compressed if compress_requests is
+        active and the body is big enough. Return the body, the
+        extra headers for the request and the bytes saved.
+        """
+
+        data = self.codec.dumps(request_json)
+
+        if not isinstance(data, bytes):
+            data = data.encode('utf-8')
+
+        if not self.compress_requests or len(data) < self.compress_min_size:
+            return data, None, 0
+
+        # wbits=31: zlib stream with a gzip header and trailer
+        compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+        body = compressor.compress(data) + compressor.flush()
+
+        return body, {'Content-Encoding': 'gzip'}, len(data) - len(body)
+
+    def wire_size(self, response, size):
+        """
+        Bytes received on the wire for a response of 'size' bytes
+        after content decoding.
+        """
+
+        if not response.headers.get('Content-Encoding'):
+            return size
+
+        try:
+            wire_size = response.raw.tell()
+        except Exception:
+            wire_size = 0
+
+        if not wire_size:
+            try:
+                wire_size = int(response.headers.get('Content-Length', size))
+            except ValueError:
+                wire_size = size
+
+        return wire_size
+
+    def parallel_map(self, function, items, workers=4):
+        """
+        Run function(item) for every item in a pool of worker threads
+        and return the results in the same order as items.
+
+        This instance has to be created with thread_safe=True.
+        """
+
+        if not self.thread_safe:
+            raise ZabbixAPIException("parallel_map() needs a thread_safe ZabbixAPI instance")
+
+        items = list(items)
+
+        if workers <= 1 or len(items) <= 1:
+            return [function(item) for item in items]
+
+        pool = ThreadPool(min(workers, len(items)))
+
+        try:
+            return pool.map(function, items)
+        finally:
+            pool.close()
+            pool.join()
 
     def login(self, user='', password='', auth_token=''):
         """
@@ -101,95 +683,447 @@ class ZabbixAPI(object):
         """Alias for configuration.import because it clashes with
            Python's import reserved keyword"""
 
-        return self.do_request(
-            method="configuration.import",
-            params={"format": format, "source": source, "rules": rules}
-        )['result']
+        return self.call(
+            "configuration.import",
+            {"format": format, "source": source, "rules": rules}
+        )
 
     def api_version(self):
         return self.apiinfo.version()
 
-    def do_request(self, method, params=None):
+    def batch(self, max_size=None):
+        """
+        Return a ZabbixAPIBatch context manager. Calls made through
+        the dynamic object classes (ie: zapi.host.get(...)) inside the
+        'with' block are queued and return a ZabbixAPIFuture. All
+        queued calls are sent as JSON-RPC 2.0 batch requests when the
+        block is left.
+
+        Parameters:
+            max_size: optional maximum number of calls per HTTP request
+        """
+
+        return ZabbixAPIBatch(self, max_size)
+
+    def next_id(self):
+        """Return a new request id. Safe to use from several threads"""
+
+        with self._id_lock:
+            request_id = self.id
+            self.id += 1
+
+        return request_id
+
+    def build_request(self, method, params=None):
         request_json = {
             'jsonrpc': '2.0',
             'method': method,
             'params': params or {},
-            'id': self.id,
+            'id': self.next_id(),
         }
 
         # We don't have to pass the auth token if asking for the apiinfo.version
         if self.auth and method != 'apiinfo.version':
             request_json['auth'] = self.auth
 
+        return request_json
 
-        logger.debug("Sending: %s", json.dumps(request_json,
-                                               indent=4,
-                                               separators=(',', ': ')))
-       
-        response = self.session.post(
-            self.url,
-            data=json.dumps(request_json),
-            timeout=self.timeout
-        )
+    def post_request(self, request_json, method=None):
+        """
+        Send a request (or a list of requests) and return the decoded
+        response. Wall time and sizes are recorded in self.stats under
+        method, 'batch' for lists of requests.
+        """
+
+        if method is None:
+            if isinstance(request_json, list):
+                method = 'batch'
+            else:
+                method = request_json['method']
 
-        logger.debug("Response Code: %s", str(response.status_code))
+        # Pretty-printing big requests/responses is expensive, we only
+        # do it when the debug output is going to be used.
+        debug = logger.isEnabledFor(logging.DEBUG)
 
-        # NOTE: Getting a 412 response code means the headers are not in the
-        # list of allowed headers.
-        response.raise_for_status()
+        if debug:
+            logger.debug("Sending: %s", json.dumps(request_json,
+                                                   indent=4,
+                                                   separators=(',', ': ')))
 
-        if not len(response.text):
-            raise ZabbixAPIException("Received empty response")
+        data, headers, bytes_saved = self.encode_body(request_json)
+        response_size = 0
+        start_time = time.time()
 
         try:
-            response_json = json.loads(response.text)
-        except ValueError:
-            raise ZabbixAPIException(
-                "Unable to parse json: %s" % response.text
+            response = self.session.post(
+                self.url,
+                data=data,
+                headers=headers,
+                timeout=self.timeout
             )
-        logger.debug("Response Body: %s", json.dumps(response_json,
-                                                     indent=4,
-                                                     separators=(',', ': ')))
 
-        self.id += 1
+            response_size = self.wire_size(response, len(response.content))
+            bytes_saved += len(response.content) - response_size
+
+            logger.debug("Response Code: %s", str(response.status_code))
+
+            # NOTE: Getting a 412 response code means the headers are not in the
+            # list of allowed headers.
+            response.raise_for_status()
+
+            if not len(response.content):
+                raise ZabbixAPIException("Received empty response")
+
+            try:
+                response_json = self.codec.loads(response.content)
+            except ValueError:
+                raise ZabbixAPIException(
+                    "Unable to parse json: %s" % response.text
+                )
+
+        except Exception:
+            self.stats.record(method, (time.time() - start_time) * 1000,
+                              len(data), response_size, error=True,
+                              bytes_saved=bytes_saved)
+            raise
+
+        self.stats.record(method, (time.time() - start_time) * 1000,
+                          len(data), response_size, bytes_saved=bytes_saved)
+
+        if debug:
+            logger.debug("Response Body: %s", json.dumps(response_json,
+                                                         indent=4,
+                                                         separators=(',', ': ')))
+
+        return response_json
+
+    def do_request(self, method, params=None):
+        request_json = self.build_request(method, params)
+        response_json = self.post_request(request_json)
 
         if 'error' in response_json:  # some exception
+            self.stats.record_error(method)
+            raise self.api_exception(response_json['error'], request_json)
+
+        return response_json
+
+    def iter_request(self, method, params=None, chunk_size=65536):
+        """
+        Send a request and return a generator with the elements of
+        the 'result' array, decoded one by one from the response
+        stream. Big results (ie: host.get over all hosts) can be
+        processed in bounded memory because the complete response is
+        never held in memory.
+        """
+
+        request_json = self.build_request(method, params)
+
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("Sending (streaming response): %s", json.dumps(request_json,
+                                                                       indent=4,
+                                                                       separators=(',', ': ')))
+
+        data, headers, bytes_saved = self.encode_body(request_json)
+        start_time = time.time()
+        error = True
+        response = None
+        stream = None
+
+        try:
+            response = self.session.post(
+                self.url,
+                data=data,
+                headers=headers,
+                timeout=self.timeout,
+                stream=True
+            )
+
+            logger.debug("Response Code: %s", str(response.status_code))
+            response.raise_for_status()
+
+            stream = ZabbixAPIResponseStream(response.iter_content(chunk_size))
+
+            for item in stream.iter_result():
+                yield item
+
+            if 'error' in stream.members:
+                raise self.api_exception(stream.members['error'], request_json)
+
+            error = False
+
+        finally:
+            if stream is not None:
+                response_size = self.wire_size(response, stream.bytes_received)
+                bytes_saved += stream.bytes_received - response_size
+            else:
+                response_size = 0
+
+            if response is not None:
+                response.close()
+
+            self.stats.record(method, (time.time() - start_time) * 1000,
+                              len(data), response_size, error=error,
+                              bytes_saved=bytes_saved)
+
+    def iter_get(self, object_type, shard_size=1000, workers=1, **params):
+        """
+        Generator with the result of <object_type>.get(**params),
+        fetched in shards so the frontend never has to build the
+        complete result in one PHP request.
+
+        The IDs of all matching objects are fetched first (with the
+        same filters and sort order, but without the extra output and
+        select* parameters). The objects are then fetched in shards
+        of shard_size IDs, using up to 'workers' concurrent requests
+        if this instance is thread_safe. The result keeps the order of
+        the ID query.
+        """
+
+        if object_type not in self.OBJECT_IDS:
+            raise ZabbixAPIException("iter_get() does not support object type: %s" % object_type)
+
+        id_field = self.OBJECT_IDS[object_type]
+        method = object_type + '.get'
+
+        id_params = {}
+
+        for key, value in params.items():
+            if not key.startswith('select') and key not in ('output', 'expandDescription',
+                                                            'expandExpression', 'expandComment'):
+                id_params[key] = value
+
+        id_params['output'] = [id_field]
+
+        sort_ids = False
+
+        if 'sortfield' not in id_params:
+            sort_field = self.SORT_FIELDS.get(object_type)
+
+            if sort_field is not None:
+                id_params['sortfield'] = sort_field
+                params = dict(params, sortfield=sort_field)
+            else:
+                sort_ids = True
+
+        ids = [item[id_field] for item in self.iter_request(method, id_params)]
+
+        # The server could not sort them, the shards are ranges of
+        # IDs anyway.
+        if sort_ids:
+            ids.sort(key=int)
+
+        shard_params = dict(params)
+        shard_params.pop('limit', None)
+
+        shards = []
+
+        for index in range(0, len(ids), shard_size):
+            shards.append(dict(shard_params, **{id_field + 's': ids[index:index + shard_size]}))
+
+        def get_shard(shard):
+            return list(self.iter_request(method, shard))
+
+        if not self.thread_safe or workers < 1:
+            workers = 1
+
+        #
+        # Fetch 'workers' shards at a time, so no more than
+        # workers * shard_size objects are held in memory.
+        #
+
+        for index in range(0, len(shards), workers):
+            window = shards[index:index + workers]
+
+            if workers > 1:
+                results = self.parallel_map(get_shard, window, workers)
+            else:
+                results = [get_shard(shard) for shard in window]
+
+            for result in results:
+                for item in result:
+                    yield item
+
+    def call(self, method, params=None):
+        """
+        Send a request and return its result, using the response
+        cache and coalescing identical reads if they are active.
+        """
+
+        if is_read_method(method):
+
+            if self.cache is None:
+                return self.read(method, params)
+
+            key = request_key(method, params)
+            hit, result = self.cache.lookup(key)
+
+            if hit:
+                return result
 
-            if 'data' not in response_json['error']: # some errors don't contain 'data': workaround for ZBX-9340
-                response_json['error']['data'] = "No data"
-            
             #
-            # We do not want to get the password value in the error
-            # message if the user uses a not valid username or
-            # password.
+            # A result is not saved if there was a write while we
+            # were reading, it could be from before the write.
             #
 
-            if response_json['error']['data'] == 'Login name or password is incorrect.':
-                
-                msg = "Error {code}: {message}: {data}".format(
-                    code=response_json['error']['code'],
-                    message=response_json['error']['message'],
-                    data=response_json['error']['data'])
+            writes = self._writes
+            result = self.read(method, params)
+
+            if writes == self._writes:
+                self.cache.store(key, method, params, result)
+
+            return result
+
+        #
+        # Invalidate before and after the write, results of reads
+        # running in other threads during the write could be stale.
+        #
+
+        self.invalidate(method)
+
+        try:
+            return self.do_request(method, params)['result']
+        finally:
+            self.invalidate(method)
+
+    def invalidate(self, method):
+        """
+        Forget the cached results and the in-flight reads affected
+        by a write call. Reads sent after the write never get the
+        result of a read sent before it.
+        """
+
+        if method.lower() in ZabbixAPICache.NO_INVALIDATION or is_read_method(method):
+            return
+
+        object_type = method.split('.')[0]
+
+        with self._inflight_lock:
+            self._writes += 1
+
+            for key, inflight in self._inflight.items():
+                if object_type == 'configuration' or object_type in inflight.tags:
+                    del self._inflight[key]
+
+        if self.cache is not None:
+            self.cache.invalidate(method)
+
+    def read(self, method, params=None):
+        """
+        Send a read request and return its result. In thread_safe
+        mode, threads asking for the same method and parameters while
+        a request is in flight wait for it and get a copy of its
+        result instead of sending their own request.
+        """
 
-            elif response_json['error']['data'] == 'Not authorized':
+        if not self.thread_safe or not self.coalesce_reads:
+            return self.do_request(method, params)['result']
 
-                msg = "Error {code}: {data}: {message}".format(
-                    code=response_json['error']['code'],
-                    data=response_json['error']['data'],
-                    message=response_json['error']['message'] + '\n\n* Your API-auth-token has probably expired.\n' +
-                    '* Try to login again with your username and password')
+        key = request_key(method, params)
+
+        with self._inflight_lock:
+            inflight = self._inflight.get(key)
+
+            if inflight is None:
+                inflight = ZabbixAPIFuture(method, params, blocking=True)
+                inflight.waiters = 0
+                inflight.tags = ZabbixAPICache.tags(method, params)
+                self._inflight[key] = inflight
+                owner = True
 
             else:
+                inflight.waiters += 1
+                self.coalesced_calls += 1
+                owner = False
 
-                msg = "Error {code}: {message}: {data} while sending {json}".format(
-                    code=response_json['error']['code'],
-                    message=response_json['error']['message'],
-                    data=response_json['error']['data'],
-                    json=str(request_json))
+        if not owner:
+            return copy.deepcopy(inflight.result())
 
-            raise ZabbixAPIException(msg, response_json['error']['code'])
+        try:
+            inflight.set_result(self.do_request(method, params)['result'])
 
-        return response_json
+        except Exception as e:
+            inflight.set_exception(e)
+
+        finally:
+            # A write can have replaced us already (see invalidate())
+            with self._inflight_lock:
+                if self._inflight.get(key) is inflight:
+                    del self._inflight[key]
+
+        #
+        # The waiters copy the result, we have to return a copy too
+        # if somebody else is using it.
+        #
+
+        if inflight.waiters > 0 and inflight.exception() is None:
+            return copy.deepcopy(inflight.result())
+
+        return inflight.result()
+
+    def do_batch_request(self, requests_json):
+        """
+        Send a list of requests built with build_request() in one
+        JSON-RPC 2.0 batch and return a dictionary with the responses
+        indexed by request id.
+        """
+
+        response_json = self.post_request(requests_json)
+
+        #
+        # The whole batch is answered with a single error object if
+        # the server could not process the request at all.
+        #
+
+        if isinstance(response_json, dict):
+            if 'error' in response_json:
+                self.stats.record_error('batch')
+                raise self.api_exception(response_json['error'], requests_json)
+
+            response_json = [response_json]
+
+        responses = {}
+
+        for response in response_json:
+            responses[response.get('id')] = response
+
+        return responses
+
+    def api_exception(self, error, request_json):
+        """Generate a ZabbixAPIException from a JSON-RPC error object"""
+
+        if 'data' not in error: # some errors don't contain 'data': workaround for ZBX-9340
+            error['data'] = "No data"
+
+        #
+        # We do not want to get the password value in the error
+        # message if the user uses a not valid username or
+        # password.
+        #
+
+        if error['data'] == 'Login name or password is incorrect.':
+
+            msg = "Error {code}: {message}: {data}".format(
+                code=error['code'],
+                message=error['message'],
+                data=error['data'])
+
+        elif error['data'] == 'Not authorized':
+
+            msg = "Error {code}: {data}: {message}".format(
+                code=error['code'],
+                data=error['data'],
+                message=error['message'] + '\n\n* Your API-auth-token has probably expired.\n' +
+                '* Try to login again with your username and password')
+
+        else:
+
+            msg = "Error {code}: {message}: {data} while sending {json}".format(
+                code=error['code'],
+                message=error['message'],
+                data=error['data'],
+                json=str(request_json))
+
+        return ZabbixAPIException(msg, error['code'])
 
     def __getattr__(self, attr):
         """Dynamically create an object class (ie: host)"""
@@ -208,9 +1142,385 @@ class ZabbixAPIObjectClass(object):
             if args and kwargs:
                 raise TypeError("Found both args and kwargs")
 
-            return self.parent.do_request(
+            if self.parent.current_batch is not None:
+                return self.parent.current_batch.add(
+                    '{0}.{1}'.format(self.name, attr),
+                    args or kwargs
+                )
+
+            return self.parent.call(
+                '{0}.{1}'.format(self.name, attr),
+                args or kwargs
+            )
+
+        return fn
+
+
+class ZabbixAPIResponseStream(object):
+    """
+    Incremental decoder for a JSON-RPC response read from a stream
+    of byte chunks. The elements of the 'result' array are decoded
+    and returned one by one; the other members of the response
+    object (ie: 'error', 'id') are saved in self.members.
+    """
+
+    WHITESPACE = ' \t\n\r'
+    NUMBER_CHARS = '0123456789.eE+-'
+
+    def __init__(self, chunks):
+        self.chunks = iter(chunks)
+        self.decoder = json.JSONDecoder()
+        self.text_decoder = codecs.getincrementaldecoder('utf-8')()
+        self.buffer = ''
+        self.pos = 0
+        self.eof = False
+        self.bytes_received = 0
+        self.members = {}
+
+    def _fill(self):
+        """Read the next chunk into the buffer. Return False at end of stream"""
+
+        if self.eof:
+            return False
+
+        try:
+            chunk = next(self.chunks)
+            self.bytes_received += len(chunk)
+            text = self.text_decoder.decode(chunk)
+
+        except StopIteration:
+            self.eof = True
+            text = self.text_decoder.decode(b'', True)
+
+        # Drop the part of the buffer already decoded
+        self.buffer = self.buffer[self.pos:] + text
+        self.pos = 0
+
+        return True
+
+    def _peek(self):
+        """Skip whitespace and return the next character, '' at end of stream"""
+
+        while True:
+            while self.pos < len(self.buffer) and self.buffer[self.pos] in self.WHITESPACE:
+                self.pos += 1
+
+            if self.pos < len(self.buffer):
+                return self.buffer[self.pos]
+
+            if not self._fill():
+                return ''
+
+    def _expect(self, chars):
+        char = self._peek()
+
+        if char == '' or char not in chars:
+            raise ZabbixAPIException("Unable to parse json: unexpected '%s' in response stream" % char)
+
+        self.pos += 1
+        return char
+
+    def _value(self):
+        """Decode the next JSON value in the stream"""
+
+        self._peek()
+
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.buffer, self.pos)
+
+                # A number or literal at the end of the buffer could
+                # continue in the next chunk. A number followed by a
+                # '.', an exponent or more digits was split too
+                # (ie: '-1500' + '.0').
+                if (self.eof or self.buffer[self.pos] in '"{[' or
+                        (end < len(self.buffer) and self.buffer[end] not in self.NUMBER_CHARS)):
+                    self.pos = end
+                    return value
+
+            except ValueError:
+                if self.eof:
+                    raise ZabbixAPIException("Unable to parse json: truncated response stream")
+
+            #
+            # Read at least as much data as we already have before
+            # trying again, so a big value is not re-parsed once per
+            # chunk.
+            #
+
+            wanted = 2 * (len(self.buffer) - self.pos)
+
+            while self._fill() and len(self.buffer) - self.pos < wanted:
+                pass
+
+    def iter_result(self):
+        """Generator with the elements of the 'result' array"""
+
+        self._expect('{')
+
+        if self._peek() == '}':
+            self.pos += 1
+            return
+
+        while True:
+            key = self._value()
+            self._expect(':')
+
+            if key == 'result' and self._peek() == '[':
+                self.pos += 1
+
+                if self._peek() == ']':
+                    self.pos += 1
+
+                else:
+                    while True:
+                        yield self._value()
+
+                        if self._expect(',]') == ']':
+                            break
+
+            elif key == 'result':
+                # Not an array, return it as a single element
+                yield self._value()
+
+            else:
+                self.members[key] = self._value()
+
+            if self._expect(',}') == '}':
+                break
+
+
+class ZabbixAPIFuture(object):
+    """
+    Placeholder for the result of a call queued in a
+    ZabbixAPIBatch. The result is available after the batch has been
+    sent.
+    """
+
+    def __init__(self, method, params, blocking=False):
+        self.method = method
+        self.params = params
+        self.blocking = blocking
+        self._done = False
+        self._result = None
+        self._exception = None
+        self._event = threading.Event()
+
+    def set_result(self, result):
+        self._result = result
+        self._done = True
+        self._event.set()
+
+    def set_exception(self, exception):
+        self._exception = exception
+        self._done = True
+        self._event.set()
+
+    def done(self):
+        return self._done
+
+    def exception(self):
+        return self._exception
+
+    def result(self, timeout=None):
+        """
+        Return the result of the call or raise its exception. Blocking
+        futures wait up to timeout seconds for the call to finish.
+        """
+
+        if not self._done and self.blocking:
+            self._event.wait(timeout)
+
+        if not self._done:
+            raise ZabbixAPIException("The call %s has not finished yet" % self.method)
+
+        if self._exception is not None:
+            raise self._exception
+
+        return self._result
+
+
+class ZabbixAPIBatch(object):
+    """
+    Collect JSON-RPC calls and send them in as few HTTP requests as
+    possible. Responses are mapped back to their calls by request id
+    and every call gets its own result or exception.
+    """
+
+    def __init__(self, parent, max_size=None):
+        self.parent = parent
+        self.max_size = max_size
+        self.calls = []
+
+    def __enter__(self):
+        if self.parent.current_batch is not None:
+            raise ZabbixAPIException("Nested batches are not supported")
+
+        self.parent.current_batch = self
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.parent.current_batch = None
+
+        if exc_type is None:
+            self.send()
+
+        return False
+
+    def add(self, method, params=None):
+        """Queue a call and return its ZabbixAPIFuture"""
+
+        future = ZabbixAPIFuture(method, params)
+        self.calls.append(future)
+
+        return future
+
+    def send(self):
+        """Send all queued calls and resolve their futures"""
+
+        calls = self.calls
+        self.calls = []
+
+        if self.max_size:
+            chunk_size = self.max_size
+        else:
+            chunk_size = len(calls) or 1
+
+        for index in range(0, len(calls), chunk_size):
+            self._send_chunk(calls[index:index + chunk_size])
+
+        return calls
+
+    def _invalidate_cache(self, calls):
+        for future in calls:
+            self.parent.invalidate(future.method)
+
+    def _send_chunk(self, calls):
+        requests_json = []
+
+        for future in calls:
+            requests_json.append(self.parent.build_request(future.method, future.params))
+
+        self._invalidate_cache(calls)
+
+        try:
+            responses = self.parent.do_batch_request(requests_json)
+
+        except Exception as e:
+            for future in calls:
+                future.set_exception(e)
+            return
+
+        finally:
+            self._invalidate_cache(calls)
+
+        for future, request_json in zip(calls, requests_json):
+            response = responses.get(request_json['id'])
+
+            if response is None:
+                future.set_exception(ZabbixAPIException(
+                    "No response received for request id %s (%s)" % (request_json['id'], future.method)))
+
+            elif 'error' in response:
+                self.parent.stats.record_error('batch')
+                future.set_exception(self.parent.api_exception(response['error'], request_json))
+
+            else:
+                future.set_result(response['result'])
+
+
+class AsyncZabbixAPI(object):
+    """
+    Asynchronous front-end for ZabbixAPI.
+
+    It keeps the dynamic obj.method(**params) interface but every
+    call returns a blocking ZabbixAPIFuture at once. Calls are
+    executed by a pool of max_concurrency worker threads sharing a
+    thread_safe ZabbixAPI instance, so at most max_concurrency
+    requests are in flight and every worker reuses its own
+    keep-alive connection.
+
+    e.g.:
+        azapi = AsyncZabbixAPI(zapi, max_concurrency=32)
+        futures = [azapi.host.get(filter={'host':name}) for name in names]
+        results = azapi.gather(futures)
+    """
+
+    def __init__(self, zapi=None, max_concurrency=16, **kwargs):
+        """
+        Parameters:
+            zapi: optional ZabbixAPI instance created with thread_safe=True
+            max_concurrency: maximum number of requests in flight
+            kwargs: ZabbixAPI parameters used if zapi is not defined
+        """
+
+        if zapi is None:
+            kwargs['thread_safe'] = True
+            zapi = ZabbixAPI(**kwargs)
+
+        elif not zapi.thread_safe:
+            raise ZabbixAPIException("AsyncZabbixAPI needs a thread_safe ZabbixAPI instance")
+
+        self.zapi = zapi
+        self.max_concurrency = max_concurrency
+        self.pool = ThreadPool(max_concurrency)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+        return False
+
+    def login(self, user='', password='', auth_token=''):
+        return self.zapi.login(user, password, auth_token)
+
+    def submit(self, method, params=None):
+        """Queue a call and return a blocking ZabbixAPIFuture"""
+
+        future = ZabbixAPIFuture(method, params, blocking=True)
+        self.pool.apply_async(self._run, (future,))
+
+        return future
+
+    def _run(self, future):
+        try:
+            future.set_result(self.zapi.call(future.method, future.params))
+
+        except Exception as e:
+            future.set_exception(e)
+
+    def gather(self, futures, timeout=None):
+        """Wait for all futures and return their results in order"""
+
+        return [future.result(timeout) for future in futures]
+
+    def close(self):
+        """Wait for the queued calls and stop the worker threads"""
+
+        self.pool.close()
+        self.pool.join()
+
+    def __getattr__(self, attr):
+        """Dynamically create an object class (ie: host)"""
+        return AsyncZabbixAPIObjectClass(attr, self)
+
+
+class AsyncZabbixAPIObjectClass(object):
+    def __init__(self, name, parent):
+        self.name = name
+        self.parent = parent
+
+    def __getattr__(self, attr):
+        """Dynamically create a method (ie: get) returning a future"""
+
+        def fn(*args, **kwargs):
+            if args and kwargs:
+                raise TypeError("Found both args and kwargs")
+
+            return self.parent.submit(
                 '{0}.{1}'.format(self.name, attr),
                 args or kwargs
-            )['result']
+            )
 
         return fn